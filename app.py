@@ -1,22 +1,63 @@
-from dash import Dash, html, dcc, Input, Output
-import plotly.express as px
-import pandas as pd
+from __future__ import annotations
+
+from dash import Dash, html, dcc, Input, Output, State, ALL, MATCH, ctx
+# pandas and plotly.express are imported on first use - keeps them out of the gunicorn boot path
+from lazy_modules import pd, px
 
 import os
 import glob
 import flask
 import json
+import functools
 from flask_caching import Cache
 
-import ast
+from date_answers import date_sort_key, get_front_outcomes, WELTKRIEG_FRONTS
+from data_loader import read_csv_file, read_blob_column, get_file_columns, get_file_path, list_month_files, is_large_file, stream_log_aggregate, aggregate_log_column, TIMELINE, TIMELINE_INDEX, LOG_TAGS, WT_CATEGORIES
+from bitmap_index import get_bitmap_index, get_row_mask, apply_facets
+from associations import get_association_matrix
+from uncertainty import get_share_intervals, get_count_intervals, wilson_interval, CONFIDENCE_LEVEL
+from multi_answers import get_multi_answers, tag_frequencies, tag_cooccurrence
+from significance import compare_months, SIGNIFICANCE_LEVEL
+from players import get_player_index, MIN_GAMES_PER_MONTH, ROLE_FACET
+from timestamps import get_submission_index, get_submission_times, get_time_range, SUBMITTED_FACET
+from vocabulary import LOG_TAG_MAP_CODES
+from world_tension import get_wt_events, compare_with_reported_start, REPORTED_START_COLUMN
+from cube import get_answer_counts, get_end_date_counts, get_end_labels, END_DATE_SOURCES
+from industry import get_industry_analytics, get_log_tensor, INDUSTRY_METRICS
+from result_store import stored_per_file, get_store_stats
+from http_cache import register_http_cache
+from job_queue import submit_job, get_job, get_job_result, cancel_job, jobs
+from figure_factory import build_figure, build_layout, base_trace, line_trace, colors, line_widths, PLOT_LAYOUT, LINE_LAYOUT
 
 server = flask.Flask(__name__)
-app = Dash(server=server)
+# The layout is a function that is only evaluated on the first request, so Dash can't validate callback ids at import time
+app = Dash(server=server, suppress_callback_exceptions=True)
 cache = Cache(app.server, config={ 'CACHE_TYPE': 'filesystem', 'CACHE_DIR': 'cache-directory'})
 TIMEOUT = 300
-
-colors = { "background": "#1b1b1b", "text": "#abb6c5", "grid": "#abb6c5"}
-line_widths = {"plot_line": 3, "grid_xaxis": 0.5, "grid_yaxis": 0.5}
+# ETags on callback responses - a repeated dropdown selection gets a 304 instead of the figure
+register_http_cache(server)
+
+tag_colors = {"ENG": "rgb(204,0,0)", "FRA": "rgb(10,54,175)", "JAP": "Pink", "NFA": "Purple", "AUS": "White", "GER": "rgb(93,93,61)", "CAN": "rgb(20,133,237)", "RUS": "rgb(0,127,14)"}
+
+# Number of question/answers rows in the facet panel
+FACET_ROWS = 3
+# Questions are shown as "number. first characters" on the association heatmap axes
+ASSOCIATION_LABEL_LENGTH = 40
+ASSOCIATION_METRICS = {"Cramér's V": "cramers_v", "Mutual information (bits)": "mutual_information"}
+# Most shifted questions shown on the month-over-month graph
+SIGNIFICANCE_QUESTIONS = 20
+# Milliseconds between progress polls of a background analysis
+JOB_POLL_INTERVAL = 1000
+
+# ACW war configuration -> winner question
+ACW_CONFIGURATIONS = {
+    "All": "Who won the American Civil War?",
+    "2-Way War": "If the American Civil War was a two-way, who won it?",
+    "3-Way War": "If the American Civil War was a three-way, who won it?",
+    "Mac Goes East": "If MacArthur retreated EAST, who won the ACW?",
+    "Mac Goes West": "If MacArthur retreated WEST, who won the ACW?",
+    "Mac Doesn't Retreat": "If MacArthur did NOT retreat, who won the ACW?",
+}
 
 ####################
 # Common functions #
@@ -30,12 +71,14 @@ def sort_files_by_month(source, target, month):
     return target
 
 
-def get_dropdown_options() -> list:
+@functools.lru_cache(maxsize=None)
+def get_dropdown_options() -> tuple:
     """Extracts all .scv files from /input and returns a list with their names where the files are sorted based on the month in the filename.
-    E.g. file with December in name will be placed earlier than July and so on
+    E.g. file with December in name will be placed earlier than July and so on.
+    The catalogue is built once per process - new month files are picked up on restart/deploy
 
     Returns:
-        list: Sorted list of files to use in graph dropdowns
+        tuple: Sorted list of files to use in graph dropdowns
     """
     dirname = os.path.dirname(__file__)
     filepath = os.path.join(dirname, "input")
@@ -57,38 +100,245 @@ def get_dropdown_options() -> list:
     sorted_list_of_files = sort_files_by_month(source=list_of_files, target=sorted_list_of_files, month="March")
     sorted_list_of_files = sort_files_by_month(source=list_of_files, target=sorted_list_of_files, month="February")
     sorted_list_of_files = sort_files_by_month(source=list_of_files, target=sorted_list_of_files, month="January")
-    return sorted_list_of_files
+    return tuple(sorted_list_of_files)
+
+
+def get_facet_catalogue() -> dict:
+    """Collects filterable questions and their answers over all files in the dropdowns
+
+    Returns:
+        dict: question -> list of answers
+    """
+    catalogue = {}
+    for input_file in get_dropdown_options():
+        index = get_bitmap_index(input_file)
+        for question in index.columns:
+            answers = catalogue.setdefault(question, [])
+            answers.extend(answer for answer in index.answers(question) if answer not in answers)
+    return catalogue
 
 
 def generate_mock_graph() -> object:
     """Returns blank graph object to display if target file doesn't have required data
 
     Returns:
-        object: blank px.line graph
+        dict: blank line graph
     """
-    d = {"col1": [0], "col2": [0]}
-    mock = pd.DataFrame(data=d)
-    fig = px.line(data_frame=mock, x="col1", y="col2", title="No data found in this file. Please select other file from the dropdown.")
-    fig.update_layout(
-        plot_bgcolor=colors["background"],
-        paper_bgcolor=colors["background"],
-        font_color=colors["text"]
+    return build_figure(
+        [base_trace("col1", "col2", [0], [0])],
+        build_layout(PLOT_LAYOUT, title="No data found in this file. Please select other file from the dropdown.", x_title="col1", y_title="col2"),
     )
-    return fig
 
 
-def read_csv_file(input_file: str) -> pd.DataFrame:
-    dirname = os.path.dirname(__file__)
-    filepath = os.path.join(dirname, f"input//{input_file}")
-    return pd.read_csv(filepath)
+def add_share_intervals(fig, intervals: pd.DataFrame):
+    """Shows the confidence interval of every slice in the pie hover
+
+    Args:
+        fig (_type_): px.pie figure
+        intervals (pd.DataFrame): "Low" and "High" shares indexed by slice name
+    """
+    for trace in fig.data:
+        bounds = intervals.reindex(list(trace.labels))[["Low", "High"]].to_numpy()
+        trace.customdata = bounds
+        trace.hovertemplate = f"%{{label}}<br>%{{value}} runs (%{{percent}})<br>{CONFIDENCE_LEVEL:.0%} interval: %{{customdata[0]:.1%}} - %{{customdata[1]:.1%}}<extra></extra>"
+
+
+def add_count_error_bars(fig, graph_df: pd.DataFrame, input_file: str, question: str, facets):
+    """Adds bootstrap error bars to every line of a winrate graph
+
+    Args:
+        fig (_type_): px.line figure with "Year" on x axis
+        graph_df (pd.DataFrame): "Year" column and a count column for every answer
+        input_file (str): file name
+        question (str): question or front the graph counts
+        facets (list): facet filter from the facet panel
+    """
+    table = graph_df.dropna(subset=["Year"]).set_index("Year").fillna(0).astype(int)
+    low, high = get_count_intervals(input_file, question, table, facets)
+    for trace in fig.data:
+        if trace.name in table.columns:
+            x = list(trace.x)
+            value = table[trace.name].reindex(x)
+            trace.error_y = dict(type="data", symmetric=False, array=(high[trace.name].reindex(x) - value).to_numpy(), arrayminus=(value - low[trace.name].reindex(x)).to_numpy(), thickness=1)
+
+
+def get_log_aggregate(input_file: str, column: str, facets):
+    mask = get_row_mask(input_file, facets)
+    return stream_log_aggregate(input_file, column) if mask is None else aggregate_log_column(input_file, column, mask=mask)
+
+
+def get_cube_roles(input_file: str, facets) -> tuple:
+    """Checks whether the answer cube can answer the facet filter. Role is the only facet the cube has a dimension for
+
+    Args:
+        input_file (str): file name
+        facets (list): facet filter from the facet panel
+
+    Returns:
+        tuple: True and the selected roles (None for every run) if the filter is a cube slice, False and None if rows have to be scanned
+    """
+    if get_row_mask(input_file, facets) is None:
+        return True, None
+    role_facets = [facet for facet in facets if facet.get("question") == ROLE_FACET and facet.get("answers")]
+    if len(role_facets) == 1 and get_row_mask(input_file, [facet for facet in facets if facet not in role_facets]) is None:
+        return True, role_facets[0]["answers"]
+    return False, None
+
+
+def count_answers(input_file: str, column: str, facets):
+    """value_counts() of a question after the facet filter, sliced from the answer cube when possible
+
+    Args:
+        input_file (str): file name
+        column (str): question
+        facets (list): facet filter from the facet panel
+
+    Returns:
+        pd.Series: answer -> number of runs. None if the question is not in the file
+    """
+    if column not in get_file_columns(input_file):
+        return None
+    sliced, roles = get_cube_roles(input_file, facets)
+    if sliced:
+        return get_answer_counts(input_file, column, roles)
+    return apply_facets(read_csv_file(input_file, columns=[column]), input_file, facets)[column].value_counts()
+
+
+def count_answers_by_end_date(input_file: str, column: str, facets):
+    """Runs of every (end date, answer) pair of a question in END_DATE_SOURCES after the facet filter, sliced from the answer cube when possible
+
+    Args:
+        input_file (str): file name
+        column (str): question
+        facets (list): facet filter from the facet panel
+
+    Returns:
+        pd.DataFrame: end labels x answers. None if the file doesn't have the question or its end date
+    """
+    ends = get_end_labels(input_file, END_DATE_SOURCES[column])
+    if ends is None or column not in get_file_columns(input_file):
+        return None
+    sliced, roles = get_cube_roles(input_file, facets)
+    if sliced:
+        return get_end_date_counts(input_file, column, roles)
+    answers = read_csv_file(input_file, columns=[column])[column]
+    return pd.crosstab(apply_facets(ends, input_file, facets), apply_facets(answers, input_file, facets)).rename_axis(index=None, columns=None)
+
+
+def create_world_tension_summary_graph(input_file: str, facets=None) -> object:
+    """WT graph for files too big to plot every run - mean WT with min/max band, built from streaming aggregates
+
+    Args:
+        input_file (str): .csv file name
+        facets (list, optional): facet filter
+
+    Returns:
+        fig: graph object
+    """
+    aggregate = get_log_aggregate(input_file, "WT Data", facets)
+    present = aggregate.count > 0
+    timestamps = [timestamp for timestamp, keep in zip(TIMELINE, present) if keep]
+    counter_red, counter_orange, counter_yellow, counter_green = (aggregate.category_counts[WT_CATEGORIES.index(i)] for i in WT_CATEGORIES)
+    return build_figure(
+        [
+            base_trace("Time", "World Tension", timestamps, aggregate.mean[present]),
+            line_trace(timestamps, aggregate.maximum[present], line=dict(width=0), showlegend=False, name="Max"),
+            line_trace(timestamps, aggregate.minimum[present], line=dict(width=0), fill="tonexty", showlegend=False, name="Min"),
+        ],
+        build_layout(
+            LINE_LAYOUT,
+            title=f"World tension (mean, min and max). {aggregate.runs} graphs total, {counter_red} with < 75% WT by 12.1940, {counter_orange} with< 75% WT by 07.1940, {counter_yellow} with < 75% WT by 12.1939, {counter_green} with > 75% WT between 01.1939 and 06.1940.",
+            x_title="Time",
+            y_title="World Tension",
+        ),
+    )
+
+
+def create_industry_summary_graph(input_file: str, index: int, colors_dict: dict, facets=None) -> object:
+    """Industry graph for files too big to plot every run - mean value per tag, built from streaming aggregates
+
+    Args:
+        input_file (str): .csv file name
+        index (int): 1 - civilian factories, 2 - military factories, 3 - dockyards
+        colors_dict (dict): tag -> line colour
+        facets (list, optional): facet filter
+
+    Returns:
+        fig: graph object
+    """
+    aggregate = get_log_aggregate(input_file, "Industry Data", facets)
+    mean = aggregate.mean[:, :, index - 1]
+    present = (aggregate.count[:, :, index - 1] > 0).any(axis=1)
+    timestamps = [timestamp for timestamp, keep in zip(TIMELINE, present) if keep]
+    line = dict(width=line_widths["plot_line"])
+    data = [base_trace("Time", "Factories", line=line)]
+    for tag_index, tag in enumerate(LOG_TAGS):
+        data.append(line_trace(timestamps, mean[present, tag_index], marker=dict(color=colors_dict[tag]), name=f"{tag} - mean of {aggregate.runs}", line=line))
+    return build_figure(data, build_layout(LINE_LAYOUT, x_title="Time", y_title="Factories", legend_title="Country"))
+
+
+###############
+# Facet panel #
+###############
+@app.callback(
+    Output({"type": "facet-question", "index": ALL}, "options"),
+    Input("facet-section", "children"))
+def get_facet_questions(_):
+    """Fills question dropdowns of the facet panel on page load"""
+    questions = sorted(get_facet_catalogue())
+    return [questions] * FACET_ROWS
+
+
+@app.callback(
+    Output({"type": "facet-answers", "index": MATCH}, "options"),
+    Output({"type": "facet-answers", "index": MATCH}, "value"),
+    Input({"type": "facet-question", "index": MATCH}, "value"))
+def get_facet_answers(question):
+    """Lists answers of the selected question and resets the selection"""
+    if not question:
+        return [], []
+    return get_facet_catalogue().get(question, []), []
+
+
+@app.callback(
+    Output("facet-submitted", "start_date"),
+    Output("facet-submitted", "end_date"),
+    Input("facet-patch-window", "value"))
+def set_patch_window(input_file):
+    """Sets the submission date range to the days in which the selected month file was filled in"""
+    submitted = get_submission_times(input_file).dropna() if input_file else []
+    if not len(submitted):
+        return None, None
+    return submitted.min().date().isoformat(), submitted.max().date().isoformat()
+
+
+@app.callback(
+    Output("facet-store", "data"),
+    Input({"type": "facet-question", "index": ALL}, "value"),
+    Input({"type": "facet-answers", "index": ALL}, "value"),
+    Input("facet-submitted", "start_date"),
+    Input("facet-submitted", "end_date"))
+def update_facet_store(questions, answers, start_date=None, end_date=None):
+    """Combines facet rows into the filter used by every graph: answers of one question are OR-ed, questions are AND-ed.
+    Submission date range is added as one more facet
+
+    Returns:
+        list: [{"question": question, "answers": [answer, ...]}, ..., {"question": SUBMITTED_FACET, "start": date, "end": date}]
+    """
+    facets = [{"question": question, "answers": selected} for question, selected in zip(questions, answers) if question and selected]
+    if start_date or end_date:
+        facets.append({"question": SUBMITTED_FACET, "start": start_date, "end": end_date})
+    return facets
+
 
 ####################################
 # Functions for separate questions #
 ####################################
 @app.callback(
     Output("world-tension-graph", "figure"),
-    Input("world-tension-data-source", "value"))
-def create_world_tension_graph(input_file):
+    Input("world-tension-data-source", "value"),
+    Input("facet-store", "data"))
+def create_world_tension_graph(input_file, facets=None):
     """ARG-CHL winrate graph
 
     Args:
@@ -97,24 +347,19 @@ def create_world_tension_graph(input_file):
     Returns:
         fig: graph object
     """
-    csv_df = read_csv_file(input_file)
-
-    if "WT Data" in csv_df.columns: 
-        fig = px.line(
-            data_frame=pd.DataFrame(columns=["Time", "World Tension"]),
-            x="Time",
-            y="World Tension",
-        )
+    if "WT Data" in get_file_columns(input_file) and is_large_file(input_file):
+        return create_world_tension_summary_graph(input_file, facets)
+    elif "WT Data" in get_file_columns(input_file):
+        line = dict(width=1)
+        data = [base_trace("Time", "World Tension", line=line)]
 
         # Parse through DF and create scatter for each row
         counter_red = 0
         counter_orange = 0
         counter_yellow = 0
         counter_green = 0
-        series = csv_df["WT Data"]
-        for i in series:
-            series_row = ast.literal_eval(i)
-
+        series = apply_facets(read_blob_column(input_file, "WT Data"), input_file, facets)
+        for series_row in series:
             if series_row["1940.December"] < 0.75:
                 color = "Red"
                 counter_red += 1
@@ -127,31 +372,68 @@ def create_world_tension_graph(input_file):
             else:
                 color = "Green"
                 counter_green += 1
-            fig.add_scatter(x=[i for i in series_row.keys()], y=[i for i in series_row.values()], marker=dict(size=3, color=color))
+            data.append(line_trace(list(series_row.keys()), list(series_row.values()), marker=dict(size=3, color=color), line=line))
 
-        fig.update_layout(
-            plot_bgcolor=colors["background"],
-            paper_bgcolor=colors["background"],
-            font_color=colors["text"],
+        return build_figure(data, build_layout(
+            LINE_LAYOUT,
+            title=f"World tension graph. {len(series)} graphs total, {counter_red} with < 75% WT by 12.1940, {counter_orange} with< 75% WT by 07.1940, {counter_yellow} with < 75% WT by 12.1939, {counter_green} with > 75% WT between 01.1939 and 06.1940.",
+            x_title="Time",
+            y_title="World Tension",
             legend_title="Country",
-            title_text=f"World tension graph. {len(series)} graphs total, {counter_red} with < 75% WT by 12.1940, {counter_orange} with< 75% WT by 07.1940, {counter_yellow} with < 75% WT by 12.1939, {counter_green} with > 75% WT between 01.1939 and 06.1940."
-        )
-        
-        fig.update_traces(line=dict(width=1))
-        fig.update_xaxes(showgrid=True, gridwidth=line_widths["grid_xaxis"], gridcolor=colors["grid"])
-        fig.update_yaxes(showgrid=True, gridwidth=line_widths["grid_yaxis"], gridcolor=colors["grid"])
-
-        return fig
+        ))
     else:
         return generate_mock_graph()
 
 
+@app.callback(
+    Output("world-tension-events-graph", "figure"),
+    Input("world-tension-data-source", "value"),
+    Input("facet-store", "data"))
+@cache.memoize(timeout=TIMEOUT)
+@stored_per_file
+def create_world_tension_events_graph(input_file, facets=None):
+    """Histogram of the quarter in which every run first reached each WT threshold, next to the self-reported Weltkrieg start
+
+    Args:
+        input_file (_type_): .csv file name imported by the function. Is defined by the dropdown value
+        facets (list, optional): facet filter
+
+    Returns:
+        fig: graph object
+    """
+    events = get_wt_events(input_file) if input_file else None
+    if events is None:
+        return generate_mock_graph()
+    events = apply_facets(events, input_file, facets)
+    comparison = compare_with_reported_start(input_file)
+    if comparison is not None:
+        events = events.assign(**{REPORTED_START_COLUMN: comparison["Reported"].reindex(events.index)})
+    graph_df = events.melt(var_name="Event", value_name="Quarter").dropna().value_counts().rename("Runs").reset_index()
+    graph_df = graph_df.sort_values("Quarter", key=date_sort_key, kind="stable")
+
+    title = f"First quarter with WT at or above each threshold, {len(events)} runs"
+    if comparison is not None:
+        difference = comparison["Difference"].reindex(events.index).dropna()
+        if len(difference):
+            title += f". WT reached 75% in the reported start quarter in {(difference == 0).mean():.0%} of runs, median difference {difference.median():+.0f} quarters"
+    fig = px.bar(data_frame=graph_df, x="Quarter", y="Runs", color="Event", barmode="group", title=title)
+    fig.update_layout(
+        plot_bgcolor=colors["background"],
+        paper_bgcolor=colors["background"],
+        font_color=colors["text"],
+    )
+    fig.update_yaxes(showgrid=True, gridwidth=line_widths["grid_yaxis"], gridcolor=colors["grid"])
+    return fig
+
+
 @app.callback(
     Output("2wk-winrate-pie", "figure"),
     Input("2wk-winrate-data-source", "value"),
-    Input("2wk-winrate-war-configuration", "value"))
+    Input("2wk-winrate-war-configuration", "value"),
+    Input("facet-store", "data"))
 @cache.memoize(timeout=TIMEOUT)
-def create_2wk_winrate_pie(input_file, war_configuration):
+@stored_per_file
+def create_2wk_winrate_pie(input_file, war_configuration, facets=None):
     """The Second Weltkrieg winrate pie
 
     Args:
@@ -160,18 +442,17 @@ def create_2wk_winrate_pie(input_file, war_configuration):
     Returns:
         fig: graph object
     """
-    csv_df = read_csv_file(input_file)
-
+    if war_configuration == "Germany-France":
+        column = "Who won the Franco-German part of the 2nd Weltkrieg?"
+    elif war_configuration == "Germany-Russia":
+        column = "Who won the Russo-German part of the 2nd Weltkrieg?"
+    else:
+        return generate_mock_graph()
+    counts = count_answers(input_file, column, facets)
 
-    if "Who won the Franco-German part of the 2nd Weltkrieg?" in csv_df.columns:
-        if war_configuration == "Germany-France":
-            csv_df = csv_df["Who won the Franco-German part of the 2nd Weltkrieg?"].value_counts()
-        elif war_configuration == "Germany-Russia":
-            csv_df = csv_df["Who won the Russo-German part of the 2nd Weltkrieg?"].value_counts()
-        else:
-            return generate_mock_graph()
+    if counts is not None:
         fig = px.pie(
-            data_frame=pd.DataFrame({"Country": csv_df.index, "Value": csv_df.values}),
+            data_frame=pd.DataFrame({"Country": counts.index, "Value": counts.values}),
             values="Value",
             names="Country",
             title="2WK winrate pie",
@@ -184,6 +465,7 @@ def create_2wk_winrate_pie(input_file, war_configuration):
                 "Nobody": "grey",
             },
         )
+        add_share_intervals(fig, get_share_intervals(input_file, column, counts, facets))
 
         fig.update_layout(
             plot_bgcolor=colors["background"],
@@ -200,9 +482,11 @@ def create_2wk_winrate_pie(input_file, war_configuration):
 
 @app.callback(
     Output("2wk-winrate-graph", "figure"),
-    Input("2wk-winrate-data-source", "value"))
+    Input("2wk-winrate-data-source", "value"),
+    Input("facet-store", "data"))
 @cache.memoize(timeout=TIMEOUT)
-def create_2wk_winrate_graph(input_file):
+@stored_per_file
+def create_2wk_winrate_graph(input_file, facets=None):
     """2WK winrate graph
 
     Args:
@@ -211,36 +495,14 @@ def create_2wk_winrate_graph(input_file):
     Returns:
         fig: graph object
     """
-    csv_df = read_csv_file(input_file)
-
-    if "If the Reichspakt lost the 2nd Weltkrieg, when did they fall?" in csv_df.columns and "Who won the Franco-German part of the 2nd Weltkrieg?" in csv_df.columns:
-        graph_df = pd.DataFrame(columns=["Year", "Internationale", "Reichspakt", "Nobody"])
-        x = csv_df["If the Reichspakt lost the 2nd Weltkrieg, when did they fall?"]
-        # Create a single Series with war ending date - since the question is split in 2, we need to unify data to create a graph
-        for i, value in enumerate(x):
-            if pd.isnull(value):
-                if pd.isnull(csv_df["If the Internationale lost the 2nd Weltkrieg, when did France fall?"][i]):
-                    x[i] = "Did not end"
-                else:
-                    x[i] = csv_df["If the Internationale lost the 2nd Weltkrieg, when did France fall?"][i]
-
-        # Convert float values to int
-        for i, value in enumerate(x):
-            if isinstance(value, float):
-                x[i] = int(x[i])
-
-        # Convert series data type to str
-        x = pd.Series(data=x, dtype="string")
-
-        for i in x.value_counts().index:
-            internationale = len(csv_df[csv_df["If the Reichspakt lost the 2nd Weltkrieg, when did they fall?"] == i][csv_df["Who won the Franco-German part of the 2nd Weltkrieg?"] == 'Internationale'])
-            reichspakt = len(csv_df[csv_df["If the Reichspakt lost the 2nd Weltkrieg, when did they fall?"] == i][csv_df["Who won the Franco-German part of the 2nd Weltkrieg?"] == 'Reichspakt'])
-            nobody = len(csv_df[csv_df["If the Reichspakt lost the 2nd Weltkrieg, when did they fall?"] == i][csv_df["Who won the Franco-German part of the 2nd Weltkrieg?"] == 'Nobody'])
-            new_row = pd.Series({"Year": i, "Internationale": internationale, "Reichspakt": reichspakt, "Nobody": nobody})
-            graph_df = graph_df.append(new_row, ignore_index=True)
+    # Single war ending date - since the question is split in 2, Reichspakt and France fall dates are merged (see END_DATE_SOURCES)
+    graph_df = count_answers_by_end_date(input_file, "Who won the Franco-German part of the 2nd Weltkrieg?", facets)
+
+    if graph_df is not None:
+        graph_df = graph_df.reindex(columns=["Internationale", "Reichspakt", "Nobody"], fill_value=0).rename_axis(index="Year", columns=None).reset_index()
 
         fig = px.line(
-            data_frame=graph_df.sort_values(by="Year"),
+            data_frame=graph_df.sort_values(by="Year", key=date_sort_key),
             x="Year",
             y=['Internationale', 'Reichspakt'],
             labels={"x": "Date", "y": "Country"},
@@ -260,6 +522,65 @@ def create_2wk_winrate_graph(input_file):
             legend_title="Country",
         )
         fig.update_traces(line=dict(width=line_widths["plot_line"]))
+        add_count_error_bars(fig, graph_df, input_file, "Who won the Franco-German part of the 2nd Weltkrieg?", facets)
+        fig.update_xaxes(showgrid=True, gridwidth=line_widths["grid_xaxis"], gridcolor=colors["grid"])
+        fig.update_yaxes(showgrid=True, gridwidth=line_widths["grid_yaxis"], gridcolor=colors["grid"])
+
+        return fig
+    else:
+        return generate_mock_graph()
+
+
+@app.callback(
+    Output("weltkrieg-fronts-graph", "figure"),
+    Input("weltkrieg-fronts-data-source", "value"),
+    Input("weltkrieg-fronts-front", "value"),
+    Input("facet-store", "data"))
+@cache.memoize(timeout=TIMEOUT)
+@stored_per_file
+def create_weltkrieg_fronts_graph(input_file, front, facets=None):
+    """Weltkrieg front fall dates graph - how many runs each side lost the front at each date
+
+    Args:
+        input_file (_type_): .csv file name imported by the function. Is defined by the dropdown value
+        front (str): key of WELTKRIEG_FRONTS
+
+    Returns:
+        fig: graph object
+    """
+    outcomes = apply_facets(get_front_outcomes(input_file, front), input_file, facets)
+
+    if outcomes is not None:
+        losers = list(dict.fromkeys(WELTKRIEG_FRONTS[front].values()))
+        graph_df = pd.crosstab(outcomes["End"], outcomes["Loser"]).reindex(columns=losers, fill_value=0)
+        graph_df = graph_df.rename_axis(index="Year", columns=None).reset_index()
+
+        fig = px.line(
+            data_frame=graph_df.sort_values(by="Year", key=date_sort_key),
+            x="Year",
+            y=losers,
+            labels={"x": "Date", "y": "Country"},
+            title=f"{front} front - fall dates",
+            color="variable",
+            color_discrete_map={
+                "Reichspakt": "rgb(93,93,61)",
+                "Internationale": "rgb(10,54,175)",
+                "Russia": "rgb(0,127,14)",
+                "Britain": "rgb(204,0,0)",
+                "Canada": "rgb(20,133,237)",
+                "National France": "Purple",
+                "Austria": "White",
+            },
+        )
+
+        fig.update_layout(
+            plot_bgcolor=colors["background"],
+            paper_bgcolor=colors["background"],
+            font_color=colors["text"],
+            legend_title="Fallen side",
+        )
+        fig.update_traces(line=dict(width=line_widths["plot_line"]))
+        add_count_error_bars(fig, graph_df, input_file, front, facets)
         fig.update_xaxes(showgrid=True, gridwidth=line_widths["grid_xaxis"], gridcolor=colors["grid"])
         fig.update_yaxes(showgrid=True, gridwidth=line_widths["grid_yaxis"], gridcolor=colors["grid"])
 
@@ -270,9 +591,11 @@ def create_2wk_winrate_graph(input_file):
 
 @app.callback(
     Output("argentina-winrate-graph", "figure"),
-    Input("argentina-winrate-data-source", "value"))
+    Input("argentina-winrate-data-source", "value"),
+    Input("facet-store", "data"))
 @cache.memoize(timeout=TIMEOUT)
-def create_argentina_winrate_graph(input_file):
+@stored_per_file
+def create_argentina_winrate_graph(input_file, facets=None):
     """ARG-CHL winrate graph
 
     Args:
@@ -281,21 +604,13 @@ def create_argentina_winrate_graph(input_file):
     Returns:
         fig: graph object
     """
-    csv_df = read_csv_file(input_file)
-
-    if "When did the Argentinian-Chilean War end?" in csv_df.columns and "Who won the Argentinian-Chilean war?" in csv_df.columns:
-        graph_df = pd.DataFrame(columns=["Year", "Argentina", "Chile", "Peaceful Reunification", "Nobody"])
+    graph_df = count_answers_by_end_date(input_file, "Who won the Argentinian-Chilean war?", facets)
 
-        for i in csv_df["When did the Argentinian-Chilean War end?"].value_counts().index:
-            arg = len(csv_df[csv_df["When did the Argentinian-Chilean War end?"] == i][csv_df["Who won the Argentinian-Chilean war?"] == "Argentina"])
-            chl = len(csv_df[csv_df["When did the Argentinian-Chilean War end?"] == i][csv_df["Who won the Argentinian-Chilean war?"] == "Chile"])
-            peace = len(csv_df[csv_df["When did the Argentinian-Chilean War end?"] == i][csv_df["Who won the Argentinian-Chilean war?"] == "Peaceful Reunification"])
-            nobody = len(csv_df[csv_df["When did the Argentinian-Chilean War end?"] == i][csv_df["Who won the Argentinian-Chilean war?"] == "Nobody"])
-            new_row = pd.Series({"Year": i, "Argentina": arg, "Chile": chl, "Peaceful Reunification": peace, "Nobody": nobody})
-            graph_df = graph_df.append(new_row, ignore_index=True)
+    if graph_df is not None:
+        graph_df = graph_df.reindex(columns=["Argentina", "Chile", "Peaceful Reunification", "Nobody"], fill_value=0).rename_axis(index="Year").reset_index()
 
         fig = px.line(
-            data_frame=graph_df.sort_values("Year"),
+            data_frame=graph_df.sort_values("Year", key=date_sort_key),
             x="Year",
             y=["Argentina", "Chile", "Peaceful Reunification", "Nobody"],
             labels={"x": "Date", "y": "Country"},
@@ -316,6 +631,7 @@ def create_argentina_winrate_graph(input_file):
             legend_title="Country",
         )
         fig.update_traces(line=dict(width=line_widths["plot_line"]))
+        add_count_error_bars(fig, graph_df, input_file, "Who won the Argentinian-Chilean war?", facets)
         fig.update_xaxes(showgrid=True, gridwidth=line_widths["grid_xaxis"], gridcolor=colors["grid"])
         fig.update_yaxes(showgrid=True, gridwidth=line_widths["grid_yaxis"], gridcolor=colors["grid"])
 
@@ -326,9 +642,11 @@ def create_argentina_winrate_graph(input_file):
 
 @app.callback(
     Output("scw-winrate-pie", "figure"),
-    Input("scw-winrate-data-source", "value"))
+    Input("scw-winrate-data-source", "value"),
+    Input("facet-store", "data"))
 @cache.memoize(timeout=TIMEOUT)
-def create_scw_winrate_pie(input_file):
+@stored_per_file
+def create_scw_winrate_pie(input_file, facets=None):
     """Spanish Civil War winrate pie
 
     Args:
@@ -337,11 +655,10 @@ def create_scw_winrate_pie(input_file):
     Returns:
         fig: graph object
     """
-    csv_df = read_csv_file(input_file)
+    counts = count_answers(input_file, "Who won the Spanish Civil War?", facets)
 
-    if "Who won the Spanish Civil War?" in csv_df.columns:
-        csv_df = csv_df["Who won the Spanish Civil War?"].value_counts()
-        df = pd.DataFrame({"Country": csv_df.index, "Value": csv_df.values})
+    if counts is not None:
+        df = pd.DataFrame({"Country": counts.index, "Value": counts.values})
         fig = px.pie(
             data_frame=df,
             values="Value",
@@ -351,10 +668,11 @@ def create_scw_winrate_pie(input_file):
             color_discrete_map={
                 "CNT-FAI": "rgb(204,0,0)",
                 "Kingdom of Spain": "rgb(242,205,94)",
-                "Carlistis": "rgb(200,100,31)",
+                "Carlists": "rgb(200,100,31)",
                 "Nobody": "grey",
             },
         )
+        add_share_intervals(fig, get_share_intervals(input_file, "Who won the Spanish Civil War?", counts, facets))
 
         fig.update_layout(
             plot_bgcolor=colors["background"],
@@ -372,9 +690,11 @@ def create_scw_winrate_pie(input_file):
 @app.callback(
     Output("acw-winrate-pie", "figure"),
     Input("acw-winrate-data-source", "value"),
-    Input("acw-winrate-war-configuration", "value"))
+    Input("acw-winrate-war-configuration", "value"),
+    Input("facet-store", "data"))
 @cache.memoize(timeout=TIMEOUT)
-def create_acw_winrate_pie(input_file, war_configuration):
+@stored_per_file
+def create_acw_winrate_pie(input_file, war_configuration, facets=None):
     """American Civil War winrate pie
 
     Args:
@@ -384,27 +704,12 @@ def create_acw_winrate_pie(input_file, war_configuration):
     Returns:
         fig: graph object
     """
-    csv_df = read_csv_file(input_file)
-
-    if "When did the American Civil War end?" in csv_df.columns:
-        if war_configuration == "All":
-            if "Who won the American Civil War?" in csv_df.columns:
-                csv_df = csv_df["Who won the American Civil War?"].value_counts()
-            else:
-                return generate_mock_graph()
-        elif war_configuration == "2-Way War":
-            csv_df = csv_df["If the American Civil War was a two-way, who won it?"].value_counts()
-        elif war_configuration == "3-Way War":
-            csv_df = csv_df["If the American Civil War was a three-way, who won it?"].value_counts()
-        elif war_configuration == "Mac Goes East":
-            csv_df = csv_df["If MacArthur retreated EAST, who won the ACW?"].value_counts()
-        elif war_configuration == "Mac Goes West":
-            csv_df = csv_df["If MacArthur retreated WEST, who won the ACW?"].value_counts()
-        elif war_configuration == "Mac Doesn't Retreat":
-            csv_df = csv_df["If MacArthur did NOT retreat, who won the ACW?"].value_counts()
+    column = ACW_CONFIGURATIONS.get(war_configuration)
+    counts = count_answers(input_file, column, facets) if column and "When did the American Civil War end?" in get_file_columns(input_file) else None
 
+    if counts is not None:
         fig = px.pie(
-            data_frame=pd.DataFrame({"Country": csv_df.index, "Value": csv_df.values}),
+            data_frame=pd.DataFrame({"Country": counts.index, "Value": counts.values}),
             values="Value",
             names="Country",
             title="ACW winrate pie",
@@ -418,6 +723,7 @@ def create_acw_winrate_pie(input_file, war_configuration):
                 "Nobody": "grey",
             },
         )
+        add_share_intervals(fig, get_share_intervals(input_file, column, counts, facets))
 
         fig.update_layout(
             plot_bgcolor=colors["background"],
@@ -434,9 +740,11 @@ def create_acw_winrate_pie(input_file, war_configuration):
 @app.callback(
     Output("acw-winrate-graph", "figure"),
     Input("acw-winrate-data-source", "value"),
-    Input("acw-winrate-war-configuration", "value"))
+    Input("acw-winrate-war-configuration", "value"),
+    Input("facet-store", "data"))
 @cache.memoize(timeout=TIMEOUT)
-def create_acw_winrate_graph(input_file, war_configuration):
+@stored_per_file
+def create_acw_winrate_graph(input_file, war_configuration, facets=None):
     """American Civil War winrate graph
 
     Args:
@@ -446,81 +754,14 @@ def create_acw_winrate_graph(input_file, war_configuration):
     Returns:
         fig: graph object
     """
-    csv_df = read_csv_file(input_file)
-    graph_df = pd.DataFrame(data=csv_df, columns=["Year", "USA", "CSA", "TEX", "PSA", "NEE", "Nobody"])
-
-    if "When did the American Civil War end?" in csv_df.columns:
-        if war_configuration == "All":
-            if "Who won the American Civil War?" in csv_df.columns:
-                for i in csv_df["When did the American Civil War end?"].value_counts().index:
-                    usa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["Who won the American Civil War?"] == "USA"])
-                    csa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["Who won the American Civil War?"] == "CSA"])
-                    tex = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["Who won the American Civil War?"] == "TEX"])
-                    psa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["Who won the American Civil War?"] == "PSA"])
-                    nee = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["Who won the American Civil War?"] == "NEE"])
-                    nobody = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["Who won the American Civil War?"] == "Nobody"])
-                    new_row = pd.Series({"Year": i, "USA": usa, "CSA": csa, "TEX": tex, "PSA": psa, "NEE": nee, "Nobody": nobody})
-                    graph_df = graph_df.append(new_row, ignore_index=True)
-            else:
-                return generate_mock_graph()
-
-        elif war_configuration == "2-Way War":
-            for i in csv_df["When did the American Civil War end?"].value_counts().index:
-                usa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If the American Civil War was a two-way, who won it?"] == 'USA'])
-                csa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If the American Civil War was a two-way, who won it?"] == 'CSA'])
-                tex = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If the American Civil War was a two-way, who won it?"] == 'TEX'])
-                psa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If the American Civil War was a two-way, who won it?"] == 'PSA'])
-                nee = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If the American Civil War was a two-way, who won it?"] == 'NEE'])
-                nobody = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If the American Civil War was a two-way, who won it?"] == 'Nobody'])
-                new_row = pd.Series({"Year": i, "USA": usa, "CSA": csa, "TEX": tex, "PSA": psa, "NEE": nee, "Nobody": nobody})
-                graph_df = graph_df.append(new_row, ignore_index=True)
-
-        elif war_configuration == "3-Way War":
-            for i in csv_df["When did the American Civil War end?"].value_counts().index:
-                usa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If the American Civil War was a three-way, who won it?"] == 'USA'])
-                csa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If the American Civil War was a three-way, who won it?"] == 'CSA'])
-                tex = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If the American Civil War was a three-way, who won it?"] == 'TEX'])
-                psa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If the American Civil War was a three-way, who won it?"] == 'PSA'])
-                nee = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If the American Civil War was a three-way, who won it?"] == 'NEE'])
-                nobody = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If the American Civil War was a three-way, who won it?"] == 'Nobody'])
-                new_row = pd.Series({"Year": i, "USA": usa, "CSA": csa, "TEX": tex, "PSA": psa, "NEE": nee, "Nobody": nobody})
-                graph_df = graph_df.append(new_row, ignore_index=True)
-
-        elif war_configuration == "Mac Goes East":
-            for i in csv_df["When did the American Civil War end?"].value_counts().index:
-                usa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur retreated EAST, who won the ACW?"] == 'USA'])
-                csa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur retreated EAST, who won the ACW?"] == 'CSA'])
-                tex = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur retreated EAST, who won the ACW?"] == 'TEX'])
-                psa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur retreated EAST, who won the ACW?"] == 'PSA'])
-                nee = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur retreated EAST, who won the ACW?"] == 'NEE'])
-                nobody = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur retreated EAST, who won the ACW?"] == 'Nobody'])
-                new_row = pd.Series({"Year": i, "USA": usa, "CSA": csa, "TEX": tex, "PSA": psa, "NEE": nee, "Nobody": nobody})
-                graph_df = graph_df.append(new_row, ignore_index=True)
-
-        elif war_configuration == "Mac Goes West":
-            for i in csv_df["When did the American Civil War end?"].value_counts().index:
-                usa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur retreated WEST, who won the ACW?"] == 'USA'])
-                csa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur retreated WEST, who won the ACW?"] == 'CSA'])
-                tex = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur retreated WEST, who won the ACW?"] == 'TEX'])
-                psa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur retreated WEST, who won the ACW?"] == 'PSA'])
-                nee = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur retreated WEST, who won the ACW?"] == 'NEE'])
-                nobody = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur retreated WEST, who won the ACW?"] == 'Nobody'])
-                new_row = pd.Series({"Year": i, "USA": usa, "CSA": csa, "TEX": tex, "PSA": psa, "NEE": nee, "Nobody": nobody})
-                graph_df = graph_df.append(new_row, ignore_index=True)
-
-        elif war_configuration == "Mac Doesn't Retreat":
-            for i in csv_df["When did the American Civil War end?"].value_counts().index:
-                usa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur did NOT retreat, who won the ACW?"] == 'USA'])
-                csa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur did NOT retreat, who won the ACW?"] == 'CSA'])
-                tex = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur did NOT retreat, who won the ACW?"] == 'TEX'])
-                psa = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur did NOT retreat, who won the ACW?"] == 'PSA'])
-                nee = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur did NOT retreat, who won the ACW?"] == 'NEE'])
-                nobody = len(csv_df[csv_df["When did the American Civil War end?"] == i][csv_df["If MacArthur did NOT retreat, who won the ACW?"] == 'Nobody'])
-                new_row = pd.Series({"Year": i, "USA": usa, "CSA": csa, "TEX": tex, "PSA": psa, "NEE": nee, "Nobody": nobody})
-                graph_df = graph_df.append(new_row, ignore_index=True)
+    column = ACW_CONFIGURATIONS.get(war_configuration)
+    graph_df = count_answers_by_end_date(input_file, column, facets) if column else None
+
+    if graph_df is not None:
+        graph_df = graph_df.reindex(columns=["USA", "CSA", "TEX", "PSA", "NEE", "Nobody"], fill_value=0).rename_axis(index="Year").reset_index()
 
         fig = px.line(
-            data_frame=graph_df.sort_values("Year"),
+            data_frame=graph_df.sort_values("Year", key=date_sort_key),
             x="Year",
             y=["USA", "CSA", "TEX", "PSA", "NEE"],
             labels={"x": "Date", "y": "Country"},
@@ -543,6 +784,7 @@ def create_acw_winrate_graph(input_file, war_configuration):
             legend_title="Country",
         )
         fig.update_traces(line=dict(width=line_widths["plot_line"]))
+        add_count_error_bars(fig, graph_df, input_file, column, facets)
         fig.update_xaxes(showgrid=True, gridwidth=line_widths["grid_xaxis"], gridcolor=colors["grid"])
         fig.update_yaxes(showgrid=True, gridwidth=line_widths["grid_yaxis"], gridcolor=colors["grid"])
 
@@ -551,12 +793,76 @@ def create_acw_winrate_graph(input_file, war_configuration):
         return generate_mock_graph()
 
 
+@app.callback(
+    Output("revolts-question", "options"),
+    Output("revolts-question", "value"),
+    Input("revolts-data-source", "value"))
+def get_revolts_questions(input_file):
+    """Lists "check all that apply" questions of the selected file"""
+    questions = list(get_multi_answers(input_file)) if input_file else []
+    return questions, questions[0] if questions else None
+
+
+@app.callback(
+    Output("revolts-frequency-graph", "figure"),
+    Output("revolts-cooccurrence-graph", "figure"),
+    Input("revolts-data-source", "value"),
+    Input("revolts-question", "value"),
+    Input("facet-store", "data"))
+@cache.memoize(timeout=TIMEOUT)
+@stored_per_file
+def create_revolts_graphs(input_file, question, facets=None):
+    """Tag frequencies and tag co-occurrence of a "check all that apply" question
+
+    Args:
+        input_file (_type_): .csv file name imported by the function. Is defined by the dropdown value
+        question (str): multi-answer question
+
+    Returns:
+        tuple: frequency fig, co-occurrence fig
+    """
+    multi_answers = get_multi_answers(input_file) if input_file else {}
+    if question not in multi_answers:
+        return generate_mock_graph(), generate_mock_graph()
+    multi_hot = apply_facets(multi_answers[question], input_file, facets)
+    answered = multi_hot[multi_hot.any(axis=1)]
+    if answered.empty:
+        return generate_mock_graph(), generate_mock_graph()
+
+    frequencies = tag_frequencies(answered)
+    low, high = wilson_interval(frequencies.to_numpy(), len(answered))
+    graph_df = pd.DataFrame({"Tag": frequencies.index, "Share": frequencies.to_numpy() / len(answered), "Runs": frequencies.to_numpy()})
+    frequency_fig = px.bar(
+        data_frame=graph_df,
+        x="Tag",
+        y="Share",
+        hover_data=["Runs"],
+        error_y=high - graph_df["Share"],
+        error_y_minus=graph_df["Share"] - low,
+        title=f"{question} - share of {len(answered)} runs",
+    )
+    frequency_fig.update_yaxes(tickformat=".0%", showgrid=True, gridwidth=line_widths["grid_yaxis"], gridcolor=colors["grid"])
+
+    cooccurrence = tag_cooccurrence(answered).loc[frequencies.index, frequencies.index]
+    cooccurrence_fig = px.imshow(cooccurrence, text_auto=True, color_continuous_scale="Viridis", labels={"color": "Runs"}, title="Runs in which both tags were picked")
+
+    for fig in (frequency_fig, cooccurrence_fig):
+        fig.update_layout(
+            plot_bgcolor=colors["background"],
+            paper_bgcolor=colors["background"],
+            font_color=colors["text"],
+        )
+
+    return frequency_fig, cooccurrence_fig
+
+
 @app.callback(
     Output("industry-map-graph", "figure"),
     Input("map-data-source", "value"),
     Input("map-data-time", "value"),
-    Input("map-data-type", "value"))
-def create_industry_map(input_file, timestamp, map_type):
+    Input("map-data-type", "value"),
+    Input("facet-store", "data"))
+def create_industry_map(input_file, timestamp, map_type, facets=None):
     """Interactive map
 
     Args:
@@ -565,12 +871,9 @@ def create_industry_map(input_file, timestamp, map_type):
     Returns:
         fig: graph object
     """
-    dirname = os.path.dirname(__file__)
-    filepath = os.path.join(dirname, "input//map.geojson")
-    with open(filepath, 'r', encoding="UTF-8") as file:
+    with open(get_file_path("map.geojson"), 'r', encoding="UTF-8") as file:
         json_obj = file.read()
     geojson = json.loads(json_obj)
-    csv_df = read_csv_file(input_file)
     if map_type == "Civilian Factories":
         index = 1
     elif map_type == "Military Factories":
@@ -578,26 +881,19 @@ def create_industry_map(input_file, timestamp, map_type):
     elif map_type == "Dockyards":
         index = 3
 
-    repl_dict = {"ENG": "GBR", "GER": "DEU", "JAP": "JPN", "NFA": "ALG", "AUS": "AUT"}
-
-
-    if "Industry Data" in csv_df.columns:
-        series = csv_df["Industry Data"]
-        for i in series:
-            series_row = ast.literal_eval(i)
-            country = []
-            data = []
-            x = series_row[timestamp]
-            for tag in x:
-                country.append(tag.split(";")[0])
-                data.append(int(tag.split(";")[index]))
-
-        for v in country:
-            if v in ["ENG", "GER", "JAP", "NFA", "AUS"]:
-               i = country.index(v) 
-               country[i] = repl_dict[v]
-
-        df = pd.DataFrame({"Country": country, "Divisions number": data})
+    # The tensor is decoded chunk by chunk for large files, the map needs one quarter of one run of it
+    tensor = get_log_tensor(input_file, "Industry Data")
+    values = []
+    if tensor is not None and timestamp in TIMELINE_INDEX:
+        rows, logs = tensor
+        mask = get_row_mask(input_file, facets)
+        logs = logs if mask is None else logs[mask[rows]]
+        if len(logs):
+            # The map shows the last matching run
+            values = pd.Series(logs[-1, TIMELINE_INDEX[timestamp], :, index - 1], index=LOG_TAGS).dropna()
+    if len(values):
+        df = pd.DataFrame({"Country": values.index, "Divisions number": values.to_numpy().astype(int)})
+        df["Country"] = df["Country"].replace(LOG_TAG_MAP_CODES)
         fig = px.choropleth(
             data_frame=df, 
             geojson=geojson, 
@@ -625,8 +921,9 @@ def create_industry_map(input_file, timestamp, map_type):
 @app.callback(
     Output("industry-graph", "figure"),
     Input("map-data-source", "value"),
-    Input("map-data-type", "value"))
-def create_industry_graph(input_file, graph_type):
+    Input("map-data-type", "value"),
+    Input("facet-store", "data"))
+def create_industry_graph(input_file, graph_type, facets=None):
     """ARG-CHL winrate graph
 
     Args:
@@ -635,7 +932,6 @@ def create_industry_graph(input_file, graph_type):
     Returns:
         fig: graph object
     """
-    csv_df = read_csv_file(input_file)
     if graph_type == "Civilian Factories":
         index = 1
     elif graph_type == "Military Factories":
@@ -643,18 +939,16 @@ def create_industry_graph(input_file, graph_type):
     elif graph_type == "Dockyards":
         index = 3
 
-    colors_dict = {"ENG": "rgb(204,0,0)", "FRA": "rgb(10,54,175)", "JAP": "Pink", "NFA": "Purple", "AUS": "White", "GER": "rgb(93,93,61)", "CAN": "rgb(20,133,237)", "RUS": "rgb(0,127,14)"}
+    colors_dict = tag_colors
 
+    if "Industry Data" in get_file_columns(input_file) and is_large_file(input_file):
+        return create_industry_summary_graph(input_file, index, colors_dict, facets)
     # Parse through DF and create scatter for each row
-    if "Industry Data" in csv_df.columns:
-        fig = px.line(
-            data_frame=pd.DataFrame(columns=["Time", "Factories"]),
-            x="Time",
-            y="Factories",
-        )
-        series = csv_df["Industry Data"]
-        for enum_index, i in enumerate(series):
-            series_row = ast.literal_eval(i)
+    elif "Industry Data" in get_file_columns(input_file):
+        line = dict(width=line_widths["plot_line"])
+        data = [base_trace("Time", "Factories", line=line)]
+        series = apply_facets(read_blob_column(input_file, "Industry Data"), input_file, facets)
+        for enum_index, series_row in enumerate(series):
 
             tags_list = [i.split(";")[0] for i in series_row["1936.March"]]
             test_dict = {i:[] for i in tags_list}
@@ -665,23 +959,354 @@ def create_industry_graph(input_file, graph_type):
                 for tag in value:
                     test_dict[tag.split(";")[0]].append(int(tag.split(";")[index]))
 
+            timestamps = list(series_row.keys())
             for tag in test_dict:
-                fig.add_scatter(x=[i for i in series_row.keys()], y=test_dict[tag], marker=dict(color=colors_dict[tag]), name=f'{tag} - {enum_index}')
+                data.append(line_trace(timestamps, test_dict[tag], marker=dict(color=colors_dict[tag]), name=f'{tag} - {enum_index}', line=line))
+
+        return build_figure(data, build_layout(LINE_LAYOUT, x_title="Time", y_title="Factories", legend_title="Country"))
+    else:
+        return generate_mock_graph()
+
+
+@app.callback(
+    Output("industry-analytics-graph", "figure"),
+    Output("industry-leaderboard-graph", "figure"),
+    Input("industry-analytics-data-source", "value"),
+    Input("industry-analytics-metric", "value"),
+    Input("facet-store", "data"))
+@cache.memoize(timeout=TIMEOUT)
+@stored_per_file
+def create_industry_analytics_graphs(input_file, metric, facets=None):
+    """Mean industry metric per tag over time and the per-tag leaderboard, both from the cached industry analytics
+
+    Args:
+        input_file (_type_): .csv file name imported by the function. Is defined by the dropdown value
+        metric (str): one of INDUSTRY_METRICS
+        facets (list, optional): facet filter
 
+    Returns:
+        tuple: timeline fig, leaderboard fig
+    """
+    analytics = get_industry_analytics(input_file) if input_file else None
+    if analytics is None:
+        return generate_mock_graph(), generate_mock_graph()
+    mask = get_row_mask(input_file, facets)
+    runs = len(analytics.select(mask))
+    if not runs:
+        return generate_mock_graph(), generate_mock_graph()
+
+    graph_df = analytics.get_timeline(metric, mask).rename_axis("Time").reset_index().melt(id_vars="Time", var_name="Tag", value_name=metric)
+    timeline_fig = px.line(data_frame=graph_df, x="Time", y=metric, color="Tag", color_discrete_map=tag_colors, title=f"{metric} - mean of {runs} runs")
+    if metric == "Rank":
+        timeline_fig.update_yaxes(autorange="reversed")
+    elif metric in ("Growth per quarter", "Share of total industry"):
+        timeline_fig.update_yaxes(tickformat=".0%")
+    timeline_fig.update_traces(line=dict(width=line_widths["plot_line"]))
+
+    leaderboard = analytics.get_leaderboard(mask)
+    # Colour compares tags within every column (brighter is better), text shows the value
+    scaled = (leaderboard - leaderboard.min()) / (leaderboard.max() - leaderboard.min())
+    scaled["Average rank"] = 1 - scaled["Average rank"]
+    shares = ["Yearly growth", "Share at end", "Top rank", "Survived"]
+    text = leaderboard.apply(lambda column: column.map(("{:.0%}" if column.name in shares else "{:.1f}").format))
+    leaderboard_fig = px.imshow(scaled, aspect="auto", color_continuous_scale="Viridis", labels={"x": "", "y": "Tag"}, title=f"Tag leaderboard, {runs} runs")
+    leaderboard_fig.update_traces(text=text.to_numpy(), texttemplate="%{text}", hovertemplate="%{y} - %{x}: %{text}<extra></extra>")
+    leaderboard_fig.update_coloraxes(showscale=False)
+
+    for fig in (timeline_fig, leaderboard_fig):
         fig.update_layout(
             plot_bgcolor=colors["background"],
             paper_bgcolor=colors["background"],
             font_color=colors["text"],
-            legend_title="Country",
         )
-        
-        fig.update_traces(line=dict(width=line_widths["plot_line"]))
-        fig.update_xaxes(showgrid=True, gridwidth=line_widths["grid_xaxis"], gridcolor=colors["grid"])
-        fig.update_yaxes(showgrid=True, gridwidth=line_widths["grid_yaxis"], gridcolor=colors["grid"])
+    timeline_fig.update_xaxes(showgrid=True, gridwidth=line_widths["grid_xaxis"], gridcolor=colors["grid"])
+    timeline_fig.update_yaxes(showgrid=True, gridwidth=line_widths["grid_yaxis"], gridcolor=colors["grid"])
 
-        return fig
-    else:
+    return timeline_fig, leaderboard_fig
+
+
+#########################
+# Question associations #
+#########################
+def get_association_labels(questions: list) -> list:
+    """Short unique axis labels for the association heatmap
+
+    Args:
+        questions (list): question names
+
+    Returns:
+        list: "number. question start" labels, same order
+    """
+    return [f"{number}. {question[:ASSOCIATION_LABEL_LENGTH]}" for number, question in enumerate(questions, start=1)]
+
+
+@app.callback(
+    Output("association-heatmap", "figure"),
+    Input("association-data-source", "value"),
+    Input("association-metric", "value"))
+@cache.memoize(timeout=TIMEOUT)
+@stored_per_file
+def create_association_heatmap(input_file, metric):
+    """Heatmap of association strength between every pair of questions
+
+    Args:
+        input_file (_type_): .csv file name imported by the function. Is defined by the dropdown value
+        metric (str): key of ASSOCIATION_METRICS
+
+    Returns:
+        fig: graph object
+    """
+    associations = get_association_matrix(input_file)
+    if not associations.questions:
+        return generate_mock_graph()
+    labels = get_association_labels(associations.questions)
+    fig = px.imshow(
+        getattr(associations, ASSOCIATION_METRICS[metric]),
+        x=labels,
+        y=labels,
+        color_continuous_scale="Viridis",
+        labels={"color": metric},
+        height=900,
+    )
+
+    fig.update_layout(
+        plot_bgcolor=colors["background"],
+        paper_bgcolor=colors["background"],
+        font_color=colors["text"],
+        title_text=f"{metric} between every pair of questions, {len(labels)} questions. Click a cell to see its answers",
+    )
+    fig.update_xaxes(showticklabels=False)
+    fig.update_yaxes(tickfont=dict(size=8))
+
+    return fig
+
+
+@app.callback(
+    Output("association-drilldown", "figure"),
+    Input("association-data-source", "value"),
+    Input("association-heatmap", "clickData"))
+def create_association_drilldown(input_file, click_data):
+    """Contingency table of the question pair clicked on the association heatmap
+
+    Args:
+        input_file (_type_): .csv file name imported by the function. Is defined by the dropdown value
+        click_data (dict): clickData of the heatmap
+
+    Returns:
+        fig: graph object
+    """
+    associations = get_association_matrix(input_file)
+    if not click_data or not associations.questions:
+        return generate_mock_graph()
+    # Labels start with the 1-based question number
+    point = click_data["points"][0]
+    row, column = (int(str(point[axis]).split(".")[0]) - 1 for axis in ("y", "x"))
+    if max(row, column) >= len(associations.questions):
+        return generate_mock_graph()
+    question_a, question_b = associations.questions[row], associations.questions[column]
+    table = associations.get_contingency_table(question_a, question_b)
+    table = table.loc[table.sum(axis=1) > 0, table.sum(axis=0) > 0]
+    fig = px.imshow(table, text_auto=True, color_continuous_scale="Viridis", aspect="auto", labels={"color": "Answers"})
+
+    fig.update_layout(
+        plot_bgcolor=colors["background"],
+        paper_bgcolor=colors["background"],
+        font_color=colors["text"],
+        title_text=f"{question_a} / {question_b}. Cramér's V {associations.cramers_v[row, column]:.2f}, {int(table.to_numpy().sum())} answers",
+    )
+    fig.update_xaxes(title_text=question_b)
+    fig.update_yaxes(title_text=question_a)
+
+    return fig
+
+
+####################
+# Month over month #
+####################
+@app.callback(
+    Output("significance-graph", "figure"),
+    Input("significance-baseline", "value"),
+    Input("significance-compared", "value"))
+@cache.memoize(timeout=TIMEOUT)
+def create_significance_graph(baseline_file, compared_file):
+    """Questions whose answer distribution shifted most between two month files
+
+    Args:
+        baseline_file (str): earlier month file name. Is defined by the dropdown value
+        compared_file (str): later month file name. Is defined by the dropdown value
+
+    Returns:
+        fig: graph object
+    """
+    result = compare_months(baseline_file, compared_file) if baseline_file and compared_file else None
+    if result is None or result.empty:
         return generate_mock_graph()
+    graph_df = result.head(SIGNIFICANCE_QUESTIONS).reset_index()
+    graph_df["Question"] = graph_df["Question"].str.slice(0, 80)
+    graph_df["Result"] = (graph_df["Adjusted p-value"] < SIGNIFICANCE_LEVEL).map({True: "Significant", False: "Not significant"})
+
+    fig = px.bar(
+        data_frame=graph_df.iloc[::-1],
+        x="Shift",
+        y="Question",
+        orientation="h",
+        color="Result",
+        hover_data=["p-value", "Adjusted p-value", "Biggest change", "Runs A", "Runs B"],
+        title=f"{len(result)} shared questions, {(result['Adjusted p-value'] < SIGNIFICANCE_LEVEL).sum()} shifted significantly (adjusted p < {SIGNIFICANCE_LEVEL})",
+        color_discrete_map={"Significant": "rgb(204,0,0)", "Not significant": "grey"},
+        height=700,
+    )
+
+    fig.update_layout(
+        plot_bgcolor=colors["background"],
+        paper_bgcolor=colors["background"],
+        font_color=colors["text"],
+        legend_title="Result",
+    )
+    fig.update_xaxes(tickformat=".0%", showgrid=True, gridwidth=line_widths["grid_xaxis"], gridcolor=colors["grid"])
+
+    return fig
+
+
+###############
+# Submissions #
+###############
+@app.callback(
+    Output("submissions-graph", "figure"),
+    Input("facet-store", "data"))
+@cache.memoize(timeout=TIMEOUT)
+def create_submissions_graph(facets=None):
+    """Submissions per day over all month files, limited to the submission date range of the facet panel
+
+    Returns:
+        fig: graph object
+    """
+    daily_counts = get_submission_index().get_daily_counts(*(get_time_range(facets) or ()))
+    if daily_counts.empty:
+        return generate_mock_graph()
+    fig = px.bar(
+        data_frame=daily_counts,
+        x="Day",
+        y="Submissions",
+        color="File",
+        title=f"{daily_counts['Submissions'].sum()} submissions, days in UTC",
+    )
+
+    fig.update_layout(
+        plot_bgcolor=colors["background"],
+        paper_bgcolor=colors["background"],
+        font_color=colors["text"],
+        legend_title="Month file",
+    )
+    fig.update_yaxes(showgrid=True, gridwidth=line_widths["grid_yaxis"], gridcolor=colors["grid"])
+
+    return fig
+
+
+#################
+# Participation #
+#################
+@app.callback(
+    Output("participation-graph", "figure"),
+    Input("participation-section", "children"))
+def create_participation_graph(_):
+    """Valid games of every tester per month from the cross-month player index
+
+    Returns:
+        fig: graph object
+    """
+    participation = get_player_index().get_participation()
+    if participation.empty:
+        return generate_mock_graph()
+    months = [column for column in participation.columns if column not in ("Months OK", "Valid games")]
+    labels = [f"{name} ({row['Months OK']}/{len(months)} months OK)" for name, row in participation.iterrows()]
+    fig = px.imshow(
+        participation[months].set_axis(labels),
+        text_auto=True,
+        aspect="auto",
+        color_continuous_scale=[[0, colors["background"]], [1, "rgb(0,127,14)"]],
+        range_color=[0, MIN_GAMES_PER_MONTH],
+        labels={"x": "Month", "y": "Tester", "color": "Valid games"},
+        title=f"Valid games per month. Minimum is {MIN_GAMES_PER_MONTH} games played until the end of the Weltkrieg",
+    )
+
+    fig.update_layout(
+        plot_bgcolor=colors["background"],
+        paper_bgcolor=colors["background"],
+        font_color=colors["text"],
+    )
+
+    return fig
+
+
+#######################
+# Background analyses #
+#######################
+@app.callback(
+    Output("job-store", "data"),
+    Input("job-run", "n_clicks"),
+    Input("job-cancel", "n_clicks"),
+    State("job-name", "value"),
+    State("job-store", "data"),
+    prevent_initial_call=True)
+def control_job(_, __, name, job_id):
+    """Submits the selected analysis to the job queue or cancels the current one. Identical submissions share one job
+
+    Args:
+        name (str): job name. Is defined by the dropdown value
+        job_id (str): id of the job shown
+
+    Returns:
+        str: id of the job to show
+    """
+    if ctx.triggered_id == "job-cancel":
+        if job_id:
+            cancel_job(job_id)
+        return job_id
+    return submit_job(name)
+
+
+@app.callback(
+    Output("job-progress", "children"),
+    Output("job-graph", "figure"),
+    Output("job-interval", "disabled"),
+    Input("job-interval", "n_intervals"),
+    Input("job-store", "data"))
+def poll_job(_, job_id):
+    """Progress of the job shown, polled by job-interval until the job ends. The result is read from the result store
+
+    Args:
+        job_id (str): job id
+
+    Returns:
+        tuple: progress text, figure of the result and whether polling stops
+    """
+    job = get_job(job_id) if job_id else None
+    if job is None:
+        return "No analysis started", generate_mock_graph(), True
+    if job["status"] != "done":
+        progress = f" {job['done']}/{job['total']} files" if job["total"] else ""
+        return f"{job['name']}: {job['status']}{progress}. {job['message']}", generate_mock_graph(), job["status"] not in ("queued", "running", "cancelling")
+    result = get_job_result(job_id)
+    if result is None or result.empty:
+        return f"{job['name']}: done, no result", generate_mock_graph(), True
+    fig = px.bar(
+        data_frame=result,
+        x=result.columns[0],
+        y=list(result.columns[1:]),
+        barmode="group",
+        title=job["name"],
+    )
+
+    fig.update_layout(
+        plot_bgcolor=colors["background"],
+        paper_bgcolor=colors["background"],
+        font_color=colors["text"],
+        legend_title="",
+    )
+    fig.update_yaxes(showgrid=True, gridwidth=line_widths["grid_yaxis"], gridcolor=colors["grid"])
+
+    return f"{job['name']}: done", fig, True
 
 
 ###############
@@ -689,56 +1314,153 @@ def create_industry_graph(input_file, graph_type):
 ###############
 
 
-app.layout = html.Div(
-    style={"backgroundColor": colors["background"], "padding": 10, "flex": 1},
-    children=[
-        html.Label(children="Links to items", id="contents-header"),
-        html.Br(),
-        html.A(children="The Second Weltkrieg", href="#2wk-section", className="contents-link"),
-        html.Br(),
-        html.A(children="Argentina-Chile", href="argentina-section", className="contents-link"),
-        html.Br(),
-        html.A(children="Spanish Civil War", href="#scw-section", className="contents-link"),
-        html.Br(),
-        html.A(children="American Civil War", href="#acw-section", className="contents-link"),
-        html.Br(),
-
-        html.Label(children="World Tension", id="wt-section"),
-        dcc.Dropdown(id="world-tension-data-source", options=get_dropdown_options(), value=get_dropdown_options()[0], clearable=False),
-        dcc.Graph(id="world-tension-graph"),
-        html.Br(),
-
-        html.Label(children="The Second Weltkrieg", id="2wk-section"),
-        dcc.Dropdown(id="2wk-winrate-data-source", options=get_dropdown_options(), value=get_dropdown_options()[0], clearable=False),
-        dcc.Dropdown(id="2wk-winrate-war-configuration", options=["Germany-France", "Germany-Russia"], value="Germany-France", clearable=False),
-        dcc.Graph(id="2wk-winrate-pie"),
-        dcc.Graph(id="2wk-winrate-graph"),
-        
-        html.Label(children="Argentinean-Chilean War", id="argentina-section"),
-        dcc.Dropdown(id="argentina-winrate-data-source", options=get_dropdown_options(), value=get_dropdown_options()[0], clearable=False),
-        dcc.Graph(id="argentina-winrate-graph"),
-        html.Br(),
-
-        html.Label(children="Spanish Civil War", id="scw-section"),
-        dcc.Dropdown(id="scw-winrate-data-source", options=get_dropdown_options(), value=get_dropdown_options()[0], clearable=False),
-        dcc.Graph(id="scw-winrate-pie"),
-        html.Br(),
-
-        html.Label(children="American Civil War", id="acw-section"),
-        dcc.Dropdown(id="acw-winrate-data-source", options=get_dropdown_options(), value=get_dropdown_options()[0], clearable=False),
-        dcc.Dropdown(id="acw-winrate-war-configuration", options=["All", "2-Way War", "3-Way War", "Mac Goes West", "Mac Goes East", "Mac Doesn't Retreat"], value="All", clearable=False),
-        dcc.Graph(id="acw-winrate-pie"),
-        dcc.Graph(id="acw-winrate-graph"),
-
-        html.Br(),
-        html.Label(children="Industry Map", id="map-section"),
-        dcc.Dropdown(id="map-data-source", options=get_dropdown_options(), value=get_dropdown_options()[0], clearable=False),
-        dcc.Dropdown(id="map-data-time", options=["1936.March", "1936.June", "1936.September", "1936.December", "1937.March", "1937.June", "1937.September", "1938.December", "1938.March", "1938.June", "1938.September", "1938.December"], value="1936.March", clearable=False),
-        dcc.Dropdown(id="map-data-type", options=["Civilian Factories", "Military Factories", "Dockyards"], value="Civilian Factories", clearable=False),
-        dcc.Graph(id="industry-map-graph"),
-        dcc.Graph(id="industry-graph"),
-    ],
-)
+@functools.lru_cache(maxsize=None)
+def serve_layout() -> html.Div:
+    """Builds the page layout from the cached file catalogue. Called by Dash on the first request instead of at import time
+
+    Returns:
+        html.Div: page layout
+    """
+    options = list(get_dropdown_options())
+    default_file = options[0] if options else None
+    month_files = list_month_files()
+    return html.Div(
+        style={"backgroundColor": colors["background"], "padding": 10, "flex": 1},
+        children=[
+            html.Label(children="Links to items", id="contents-header"),
+            html.Br(),
+            html.A(children="The Second Weltkrieg", href="#2wk-section", className="contents-link"),
+            html.Br(),
+            html.A(children="Argentina-Chile", href="argentina-section", className="contents-link"),
+            html.Br(),
+            html.A(children="Spanish Civil War", href="#scw-section", className="contents-link"),
+            html.Br(),
+            html.A(children="American Civil War", href="#acw-section", className="contents-link"),
+            html.Br(),
+            html.A(children="Revolts", href="#revolts-section", className="contents-link"),
+            html.Br(),
+            html.A(children="Industry Analytics", href="#industry-analytics-section", className="contents-link"),
+            html.Br(),
+            html.A(children="Question Associations", href="#association-section", className="contents-link"),
+            html.Br(),
+            html.A(children="Month over Month", href="#significance-section", className="contents-link"),
+            html.Br(),
+            html.A(children="Background Analyses", href="#jobs-section", className="contents-link"),
+            html.Br(),
+            html.A(children="Participation", href="#participation-section", className="contents-link"),
+            html.Br(),
+            html.A(children="Submissions", href="#submissions-section", className="contents-link"),
+            html.Br(),
+
+            html.Label(children="Filters", id="facet-section"),
+            html.Div(className="facet-panel", children=[
+                html.Div(className="facet-row", children=[
+                    dcc.Dropdown(id={"type": "facet-question", "index": i}, placeholder="Question", className="facet-question"),
+                    dcc.Dropdown(id={"type": "facet-answers", "index": i}, placeholder="Answers", multi=True, className="facet-answers"),
+                ])
+                for i in range(FACET_ROWS)
+            ]),
+            html.Div(className="facet-row", children=[
+                dcc.Dropdown(id="facet-patch-window", options=month_files, placeholder="Patch window (month file)", className="facet-question"),
+                dcc.DatePickerRange(id="facet-submitted", clearable=True, className="facet-answers"),
+            ]),
+            dcc.Store(id="facet-store", data=[]),
+            html.Br(),
+
+            html.Label(children="World Tension", id="wt-section"),
+            dcc.Dropdown(id="world-tension-data-source", options=options, value=default_file, clearable=False),
+            dcc.Graph(id="world-tension-graph"),
+            dcc.Graph(id="world-tension-events-graph"),
+            html.Br(),
+
+            html.Label(children="The Second Weltkrieg", id="2wk-section"),
+            dcc.Dropdown(id="2wk-winrate-data-source", options=options, value=default_file, clearable=False),
+            dcc.Dropdown(id="2wk-winrate-war-configuration", options=["Germany-France", "Germany-Russia"], value="Germany-France", clearable=False),
+            dcc.Graph(id="2wk-winrate-pie"),
+            dcc.Graph(id="2wk-winrate-graph"),
+            dcc.Dropdown(id="weltkrieg-fronts-data-source", options=options, value=default_file, clearable=False),
+            dcc.Dropdown(id="weltkrieg-fronts-front", options=list(WELTKRIEG_FRONTS), value="Germany-France", clearable=False),
+            dcc.Graph(id="weltkrieg-fronts-graph"),
+            
+            html.Label(children="Argentinean-Chilean War", id="argentina-section"),
+            dcc.Dropdown(id="argentina-winrate-data-source", options=options, value=default_file, clearable=False),
+            dcc.Graph(id="argentina-winrate-graph"),
+            html.Br(),
+
+            html.Label(children="Spanish Civil War", id="scw-section"),
+            dcc.Dropdown(id="scw-winrate-data-source", options=options, value=default_file, clearable=False),
+            dcc.Graph(id="scw-winrate-pie"),
+            html.Br(),
+
+            html.Label(children="American Civil War", id="acw-section"),
+            dcc.Dropdown(id="acw-winrate-data-source", options=options, value=default_file, clearable=False),
+            dcc.Dropdown(id="acw-winrate-war-configuration", options=["All", "2-Way War", "3-Way War", "Mac Goes West", "Mac Goes East", "Mac Doesn't Retreat"], value="All", clearable=False),
+            dcc.Graph(id="acw-winrate-pie"),
+            dcc.Graph(id="acw-winrate-graph"),
+            html.Br(),
+
+            html.Label(children="Revolts", id="revolts-section"),
+            dcc.Dropdown(id="revolts-data-source", options=options, value=default_file, clearable=False),
+            dcc.Dropdown(id="revolts-question", clearable=False),
+            dcc.Graph(id="revolts-frequency-graph"),
+            dcc.Graph(id="revolts-cooccurrence-graph"),
+
+            html.Br(),
+            html.Label(children="Industry Map", id="map-section"),
+            dcc.Dropdown(id="map-data-source", options=options, value=default_file, clearable=False),
+            dcc.Dropdown(id="map-data-time", options=["1936.March", "1936.June", "1936.September", "1936.December", "1937.March", "1937.June", "1937.September", "1938.December", "1938.March", "1938.June", "1938.September", "1938.December"], value="1936.March", clearable=False),
+            dcc.Dropdown(id="map-data-type", options=["Civilian Factories", "Military Factories", "Dockyards"], value="Civilian Factories", clearable=False),
+            dcc.Graph(id="industry-map-graph"),
+            dcc.Graph(id="industry-graph"),
+
+            html.Br(),
+            html.Label(children="Industry Analytics", id="industry-analytics-section"),
+            dcc.Dropdown(id="industry-analytics-data-source", options=options, value=default_file, clearable=False),
+            dcc.Dropdown(id="industry-analytics-metric", options=list(INDUSTRY_METRICS), value="Factories", clearable=False),
+            dcc.Graph(id="industry-analytics-graph"),
+            dcc.Graph(id="industry-leaderboard-graph"),
+
+            html.Br(),
+            html.Label(children="Question Associations", id="association-section"),
+            dcc.Dropdown(id="association-data-source", options=options, value=default_file, clearable=False),
+            dcc.Dropdown(id="association-metric", options=list(ASSOCIATION_METRICS), value="Cramér's V", clearable=False),
+            dcc.Graph(id="association-heatmap"),
+            dcc.Graph(id="association-drilldown"),
+
+            html.Br(),
+            html.Label(children="Submissions", id="submissions-section"),
+            dcc.Graph(id="submissions-graph"),
+
+            html.Br(),
+            html.Label(children="Participation", id="participation-section"),
+            dcc.Graph(id="participation-graph"),
+
+            html.Br(),
+            html.Label(children="Month over Month", id="significance-section"),
+            dcc.Dropdown(id="significance-baseline", options=month_files, value=month_files[-2] if len(month_files) > 1 else None, clearable=False),
+            dcc.Dropdown(id="significance-compared", options=month_files, value=month_files[-1] if month_files else None, clearable=False),
+            dcc.Graph(id="significance-graph"),
+
+            html.Br(),
+            html.Label(children="Background Analyses", id="jobs-section"),
+            dcc.Dropdown(id="job-name", options=list(jobs), value=next(iter(jobs)), clearable=False),
+            html.Button(children="Run", id="job-run", n_clicks=0),
+            html.Button(children="Cancel", id="job-cancel", n_clicks=0),
+            html.Label(id="job-progress"),
+            dcc.Store(id="job-store"),
+            dcc.Interval(id="job-interval", interval=JOB_POLL_INTERVAL, disabled=True),
+            dcc.Graph(id="job-graph"),
+        ],
+    )
+
+
+app.layout = serve_layout
+
+
+@server.route("/result-store")
+def result_store_stats():
+    """Stored results and hit rates of the result store, lookups are counted by the worker that answers"""
+    return flask.jsonify(get_store_stats())
 
 if __name__ == "__main__":
     app.run_server(debug=True)
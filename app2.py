@@ -11,6 +11,8 @@ from flask_caching import Cache
 
 import ast
 
+from data_loader import validate_blob_series
+
 server = flask.Flask(__name__)
 app = Dash(server=server)
 cache = Cache(app.server, config={ 'CACHE_TYPE': 'filesystem', 'CACHE_DIR': 'cache-directory'})
@@ -87,12 +89,17 @@ def read_csv_file(input_file: str) -> pd.DataFrame:
 
 
 def decompress_data_dict(input_str: str, flag=None) -> dict:
+    """Decodes one compressed log cell. Cells should be checked with validate_blob_series first
+
+    Returns:
+        dict: decoded log, None if the cell is not a compressed log (e.g. an older dictionary literal)
+    """
     try:
         if flag == "WT":
             return {i[:i.index(':')]:float(i[i.index(':')+1:]) for i in input_str.split(',')}              # "36.02:0.019,36.03:0.087,36.04:0.085" -> {'36.02': '0.019', '36.03': '0.087', '36.04': '0.085'}
         return {i[:i.index(':')]:i[i.index(':')+2:-1].split(",") for i in input_str.split('],')}           # "36.03:[AUS;26;73;118,JAP;32;65;83],36.06:[AUS;26;73;130,JAP;37;62;91]" -> {'36.03': ['AUS;26;73;118', 'JAP;32;65;8'], '36.06': ['AUS;26;73;130', 'JAP;37;62;9']}
-    except:
-        print(input_str)
+    except ValueError:
+        return None
 
 ####################################
 # Functions for separate questions #
@@ -108,10 +115,13 @@ def create_world_tension_graph(input_file, filter_color):
     if "WT Data" in csv_df.columns: 
         fig = px.line(data_frame=pd.DataFrame(columns=["Time", "World Tension"]), x="Time", y="World Tension")          # 1. Create empty graph with no traces
         counter_red, counter_orange, counter_yellow, counter_green = 0, 0, 0, 0
-        series = csv_df["WT Data"]                                                                                      # 2. Create series (one column with WT Data answers)
+        series = csv_df["WT Data"].dropna()                                                                             # 2. Create series (one column with WT Data answers)
+        series = series[validate_blob_series(series, "WT Data").isna()]                                                 #    Malformed logs are quarantined before parsing
 
         for i in series:                                                                                                # 3. Parse through series rows and create scatter for each row (for each reported log)
             series_row = decompress_data_dict(i, flag="WT")                                                             # 4. Convert input line into dictionary. Keys represent Date and Values - WT values from 0 to 1
+            if series_row is None:
+                continue
 
             if "40.12" in series_row.keys() and series_row["40.12"] < 0.75:
                 color = "Red"
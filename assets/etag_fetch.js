@@ -0,0 +1,45 @@
+// Conditional callback requests. Dash sends callbacks as POST, which browsers never revalidate, so the last response of every
+// request body is kept here and its ETag is sent as If-None-Match. A 304 from the server is answered from this cache (see http_cache.py)
+(function () {
+    var MAX_RESPONSES = 200;
+    var UPDATE_PATH = "_dash-update-component";
+    var responses = new Map();
+    var nativeFetch = window.fetch.bind(window);
+
+    function remember(key, entry) {
+        // Map keeps insertion order - the least recently used response is dropped first
+        responses.delete(key);
+        responses.set(key, entry);
+        if (responses.size > MAX_RESPONSES) {
+            responses.delete(responses.keys().next().value);
+        }
+    }
+
+    window.fetch = function (resource, options) {
+        var url = typeof resource === "string" ? resource : resource.url;
+        if (!options || options.method !== "POST" || typeof options.body !== "string" || url.indexOf(UPDATE_PATH) === -1) {
+            return nativeFetch(resource, options);
+        }
+        var key = options.body;
+        var cached = responses.get(key);
+        if (cached) {
+            var headers = new Headers(options.headers);
+            headers.set("If-None-Match", cached.etag);
+            options = Object.assign({}, options, {headers: headers});
+        }
+        return nativeFetch(resource, options).then(function (response) {
+            if (response.status === 304 && cached) {
+                remember(key, cached);
+                return new Response(cached.body, {status: 200, headers: {"Content-Type": "application/json"}});
+            }
+            var etag = response.headers.get("ETag");
+            if (response.status !== 200 || !etag) {
+                return response;
+            }
+            return response.text().then(function (body) {
+                remember(key, {etag: etag, body: body});
+                return new Response(body, {status: response.status, statusText: response.statusText, headers: response.headers});
+            });
+        });
+    };
+})();
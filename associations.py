@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from lazy_modules import pd, np
+from data_loader import cached_per_file
+from bitmap_index import get_bitmap_index
+from result_store import stored_per_file
+
+
+class AssociationMatrix:
+    """Pairwise association of all indexed questions of a month file
+
+    Args:
+        questions (list): question names, order of the matrix axes
+        answers (list): list of answers for every question
+        counts (np.ndarray): (answers x answers) co-occurrence counts - every contingency table is a block of it
+        cramers_v (np.ndarray): (questions x questions) Cramér's V
+        mutual_information (np.ndarray): (questions x questions) mutual information in bits
+    """
+
+    def __init__(self, questions, answers, counts, cramers_v, mutual_information):
+        self.questions = questions
+        self.answers = answers
+        self.counts = counts
+        self.cramers_v = cramers_v
+        self.mutual_information = mutual_information
+        self.offsets = np.concatenate([[0], np.cumsum([len(i) for i in answers])])
+
+    def get_contingency_table(self, question_a: str, question_b: str) -> pd.DataFrame:
+        """Counts of every answer combination of two questions, rows that answered both only
+
+        Args:
+            question_a (str): question shown on rows
+            question_b (str): question shown on columns
+
+        Returns:
+            pd.DataFrame: contingency table
+        """
+        a, b = self.questions.index(question_a), self.questions.index(question_b)
+        block = self.counts[self.offsets[a]:self.offsets[a + 1], self.offsets[b]:self.offsets[b + 1]]
+        return pd.DataFrame(block.astype(np.int64), index=pd.Index(self.answers[a], name=question_a), columns=pd.Index(self.answers[b], name=question_b))
+
+
+def block_sum(matrix, offsets) -> np.ndarray:
+    """Sums (answers x answers) matrix over (question x question) blocks
+
+    Args:
+        matrix (np.ndarray): square matrix over answers
+        offsets (np.ndarray): first answer column of every question
+
+    Returns:
+        np.ndarray: (questions x questions) block sums
+    """
+    return np.add.reduceat(np.add.reduceat(matrix, offsets, axis=0), offsets, axis=1)
+
+
+def compute_associations(matrix, groups) -> tuple:
+    """Cramér's V and mutual information for every pair of one-hot encoded questions.
+    All contingency tables come from one product counts = X.T @ X, statistics of all pairs are then summed block-wise
+    with np.add.reduceat, so there is no Python loop over the pairs. Every pair only uses the rows that answered both questions
+
+    Args:
+        matrix (np.ndarray): (rows x answers) 0/1 one-hot matrix, answers of one question are adjacent
+        groups (np.ndarray): question index of every answer column, sorted
+
+    Returns:
+        tuple: counts (answers x answers), cramers_v (questions x questions), mutual_information (questions x questions)
+    """
+    x = matrix.astype(np.float64)
+    offsets = np.flatnonzero(np.diff(groups, prepend=-1))
+    answered = np.add.reduceat(x, offsets, axis=1)    # (rows x questions) 1 if the row answered the question
+
+    counts = x.T @ x                                  # (answers x answers) all contingency tables
+    marginals = x.T @ answered                        # (answers x questions) answer a among rows that answered question j
+    pair_totals = answered.T @ answered               # (questions x questions) rows that answered both questions
+
+    # row_marginal[a, b] = count of answer a among rows that answered the question of b, column_marginal is the mirror
+    row_marginal = marginals[:, groups]
+    column_marginal = row_marginal.T
+    expected_denominator = row_marginal * column_marginal
+    with np.errstate(divide="ignore", invalid="ignore"):
+        chi_ratio = np.where(expected_denominator > 0, counts ** 2 / expected_denominator, 0)
+        totals = pair_totals[groups][:, groups]
+        log_term = np.where(counts > 0, counts / totals * np.log2(counts * totals / expected_denominator), 0)
+
+    chi_square = pair_totals * (block_sum(chi_ratio, offsets) - 1)
+    # Answers actually seen among the rows that answered both questions
+    levels = np.add.reduceat((marginals > 0).astype(np.int64), offsets, axis=0)
+    dof = np.minimum(levels, levels.T) - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cramers_v = np.sqrt(np.clip(np.where((dof > 0) & (pair_totals > 0), chi_square / (pair_totals * dof), 0), 0, 1))
+    mutual_information = np.clip(block_sum(log_term, offsets), 0, None)
+    np.fill_diagonal(cramers_v, 1)
+    return counts, cramers_v, mutual_information
+
+
+@cached_per_file
+@stored_per_file
+def get_association_matrix(input_file: str) -> AssociationMatrix:
+    """One-hot encodes all indexed questions of the month file and computes all pairwise associations. Cached per file
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        AssociationMatrix: associations of every question pair
+    """
+    index = get_bitmap_index(input_file)
+    # Contingency tables need exactly one answer per row, "check all that apply" questions are left out
+    questions = [question for question in index.columns if len(index.answers(question)) > 1 and question not in index.multi_answer]
+    answers = [index.answers(question) for question in questions]
+    if not questions:
+        return AssociationMatrix([], [], np.zeros((0, 0)), np.zeros((0, 0)), np.zeros((0, 0)))
+    # Bitsets are unpacked back into the dense (rows x answers) one-hot matrix
+    matrix = np.concatenate([np.unpackbits(index.columns[question][1], axis=1, count=index.rows).T for question in questions], axis=1)
+    groups = np.repeat(np.arange(len(questions)), [len(i) for i in answers])
+    counts, cramers_v, mutual_information = compute_associations(matrix, groups)
+    return AssociationMatrix(questions, answers, counts, cramers_v, mutual_information)
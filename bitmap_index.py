@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import functools
+
+from lazy_modules import pd, np
+from data_loader import cached_per_append, load_csv_frame, get_row_count
+from result_store import stored_per_file
+from date_answers import get_date_answers
+from multi_answers import get_multi_answers
+from timestamps import get_time_mask
+from players import get_player_rows, find_column, PLAYER_COLUMN_PREFIX, ROLE_COLUMN_PREFIX, PLAYER_FACET, ROLE_FACET
+from world_tension import get_wt_events
+
+# Columns with more distinct answers than this are free text and are not indexed
+MAX_ANSWERS = 64
+
+
+class BitmapIndex:
+    """Packed bitset of matching rows for every (column, answer) pair of a month file.
+    Filters are evaluated as AND/OR over the bitsets instead of scanning the dataframe
+
+    Args:
+        rows (int): number of rows in the file
+    """
+
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.columns = {}
+        # "Check all that apply" columns - a row can match several of their answers
+        self.multi_answer = set()
+        # Columns with more than MAX_ANSWERS answers, and the date and multi-answer questions the index was built with
+        self.free_text = set()
+        self.date_questions = frozenset()
+        self.multi_questions = frozenset()
+
+    def add_column(self, column: str, answers: list, matches, multi_answer: bool = False, max_answers: int = MAX_ANSWERS):
+        """Adds bitsets for one column. Columns without answers are skipped, columns with more than max_answers are free text
+
+        Args:
+            column (str): column name
+            answers (list): answer labels
+            matches (np.ndarray): (rows x answers) bool matrix, more than one answer per row is allowed
+            multi_answer (bool, optional): True for "check all that apply" columns
+            max_answers (int, optional): None for no limit
+        """
+        if max_answers is not None and len(answers) > max_answers:
+            self.free_text.add(column)
+            return
+        if not len(answers):
+            return
+        # Rows are packed along axis 0, then every answer becomes one contiguous bitset
+        self.columns[column] = ([str(answer) for answer in answers], np.ascontiguousarray(np.packbits(matches, axis=0).T))
+        if multi_answer:
+            self.multi_answer.add(column)
+
+    def append_column(self, index: BitmapIndex, column: str, answers: list, matches, multi_answer: bool = False, max_answers: int = MAX_ANSWERS):
+        """Adds a column of another index over the first index.rows rows, extended with the appended rows.
+        New answers get a bitset that is empty before the appended rows
+
+        Args:
+            index (BitmapIndex): index of the rows before
+            column (str): column name
+            answers (list): answer labels of the appended rows, every tag of the column for "check all that apply" columns
+            matches (np.ndarray): (appended rows x answers) bool matrix
+            multi_answer (bool, optional): True for "check all that apply" columns
+            max_answers (int, optional): None for no limit
+        """
+        if column in index.free_text:
+            self.free_text.add(column)
+            return
+        answers = [str(answer) for answer in answers]
+        labels, bitsets = index.columns.get(column, ([], np.zeros((0, (index.rows + 7) // 8), dtype=np.uint8)))
+        # Tags of "check all that apply" columns are sorted, other answers keep the order in which they first appear
+        merged = answers if multi_answer else labels + [answer for answer in dict.fromkeys(answers) if answer not in labels]
+        if max_answers is not None and len(merged) > max_answers:
+            self.free_text.add(column)
+            return
+        if not merged:
+            return
+        positions = pd.Index(merged)
+        before = np.zeros((len(merged), bitsets.shape[1]), dtype=np.uint8)
+        before[positions.get_indexer(labels)] = bitsets
+        appended = np.zeros((len(matches), len(merged)), dtype=bool)
+        appended[:, positions.get_indexer(answers)] = matches
+        self.columns[column] = (merged, append_bitsets(before, index.rows, appended))
+        if multi_answer:
+            self.multi_answer.add(column)
+
+    def answers(self, column: str) -> list:
+        return self.columns[column][0] if column in self.columns else []
+
+    def get_bitset(self, column: str, answers) -> np.ndarray:
+        """OR of the bitsets of the answers. Unknown answers match nothing
+
+        Args:
+            column (str): indexed column
+            answers (iterable): answer labels
+
+        Returns:
+            np.ndarray: packed bitset
+        """
+        labels, bitsets = self.columns[column]
+        positions = [labels.index(answer) for answer in answers if answer in labels]
+        if not positions:
+            return np.zeros(bitsets.shape[1], dtype=np.uint8)
+        return np.bitwise_or.reduce(bitsets[positions], axis=0)
+
+    def select(self, facets) -> np.ndarray:
+        """AND of the facets, every facet is an OR of its answers. Facets with columns missing from this file are ignored
+
+        Args:
+            facets (list): [{"question": column, "answers": [answer, ...]}, ...]
+
+        Returns:
+            np.ndarray: packed bitset, None if no facet applies to this file
+        """
+        result = None
+        for facet in facets or []:
+            if facet.get("question") not in self.columns or not facet.get("answers"):
+                continue
+            bitset = self.get_bitset(facet["question"], facet["answers"])
+            result = bitset if result is None else result & bitset
+        return result
+
+    def to_mask(self, bitset) -> np.ndarray:
+        return np.unpackbits(bitset, count=self.rows).astype(bool)
+
+    def count(self, bitset) -> int:
+        return int(get_popcount_table()[bitset].sum())
+
+
+def append_bitsets(bitsets, rows: int, matches) -> np.ndarray:
+    """Packed bitsets over rows rows followed by the rows of a bool matrix. Only the last byte of the bitsets is unpacked
+
+    Args:
+        bitsets (np.ndarray): (answers x bytes) packed bitsets
+        rows (int): rows in the bitsets
+        matches (np.ndarray): (appended rows x answers) bool matrix
+
+    Returns:
+        np.ndarray: packed bitsets over all rows
+    """
+    full, rest = divmod(rows, 8)
+    bits = matches.T
+    if rest:
+        bits = np.concatenate([np.unpackbits(bitsets[:, full:full + 1], axis=1, count=rest).astype(bool), bits], axis=1)
+    return np.ascontiguousarray(np.concatenate([bitsets[:, :full], np.packbits(bits, axis=1)], axis=1))
+
+
+@functools.lru_cache(maxsize=None)
+def get_popcount_table() -> np.ndarray:
+    """Number of set bits in every byte value"""
+    return np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+def one_hot(series) -> tuple:
+    """Factorizes the column and builds (rows x answers) bool matrix in one vectorized comparison
+
+    Args:
+        series (pd.Series): answers
+
+    Returns:
+        tuple: list of answers, bool matrix
+    """
+    codes, uniques = pd.factorize(series)
+    return list(uniques), codes[:, None] == np.arange(len(uniques))
+
+
+def iter_answer_columns(input_file: str, start: int = 0):
+    """Answers of every categorical question over the rows from start. Date questions are indexed by their normalized labels,
+    "check all that apply" questions - by every single tag. Tester name and role columns are left out
+
+    Args:
+        input_file (str): file name
+        start (int, optional): first row number
+
+    Yields:
+        tuple: column, answers, (rows x answers) bool matrix and True for "check all that apply" columns
+    """
+    csv_df = load_csv_frame(input_file).iloc[start:]
+    date_answers = get_date_answers(input_file)
+    multi_answers = get_multi_answers(input_file)
+    meta_columns = {find_column(input_file, PLAYER_COLUMN_PREFIX), find_column(input_file, ROLE_COLUMN_PREFIX)}
+    for column in csv_df.columns[1:]:
+        if column in meta_columns:
+            continue
+        if column in multi_answers:
+            multi_hot = multi_answers[column].iloc[start:]
+            yield column, list(multi_hot.columns), multi_hot.to_numpy(), True
+        else:
+            yield (column, *one_hot(date_answers[column]["label"].iloc[start:] if column in date_answers else csv_df[column]), False)
+
+
+def iter_player_columns(input_file: str):
+    """Normalized PLAYER_FACET and ROLE_FACET answers over all rows. Every spelling of a player is shown as the one used most often in this file
+
+    Args:
+        input_file (str): file name
+
+    Yields:
+        tuple: facet, answers and (rows x answers) bool matrix
+    """
+    player_rows = get_player_rows(input_file)
+    if not len(player_rows):
+        return
+    names = player_rows.dropna(subset=["Player"]).groupby("Player")["Name"].agg(lambda names: names.value_counts().index[0])
+    for facet, series in ((PLAYER_FACET, player_rows["Player"].map(names)), (ROLE_FACET, player_rows["Role"])):
+        yield (facet, *one_hot(series))
+
+
+def iter_wt_event_columns(input_file: str, rows: int, start: int = 0):
+    """Derived "When did WT reach X?" answers over the rows from start, indexed like date questions
+
+    Args:
+        input_file (str): file name
+        rows (int): number of rows in the file
+        start (int, optional): first row number
+
+    Yields:
+        tuple: column, answers and (rows x answers) bool matrix
+    """
+    wt_events = get_wt_events(input_file)
+    if wt_events is None:
+        return
+    for column in wt_events.columns:
+        yield (column, *one_hot(wt_events[column].reindex(pd.RangeIndex(start, rows))))
+
+
+def build_bitmap_index(input_file: str) -> BitmapIndex:
+    """Index over every row of the file, see get_bitmap_index"""
+    # Files with only log columns have rows but no answer columns
+    index = BitmapIndex(get_row_count(input_file))
+    index.date_questions, index.multi_questions = frozenset(get_date_answers(input_file)), frozenset(get_multi_answers(input_file))
+    for column, answers, matches, multi_answer in iter_answer_columns(input_file):
+        index.add_column(column, answers, matches, multi_answer=multi_answer)
+    for column, answers, matches in iter_player_columns(input_file):
+        index.add_column(column, answers, matches)
+    for column, answers, matches in iter_wt_event_columns(input_file, index.rows):
+        # Every quarter is a valid answer, the derived columns are never free text
+        index.add_column(column, answers, matches, max_answers=None)
+    return index
+
+
+def extend_bitmap_index(index: BitmapIndex, input_file: str, previous) -> BitmapIndex:
+    """Indexes only the appended rows and appends their bits to a copy of the index. Player and role facets are re-encoded
+    from the cached player rows, the most used spelling of a name can change with the appended rows"""
+    rows = get_row_count(input_file)
+    if rows == index.rows:
+        return index
+    if frozenset(get_date_answers(input_file)) != index.date_questions or frozenset(get_multi_answers(input_file)) != index.multi_questions:
+        # Appended answers turned a question into a date or "check all that apply" question or back, the bits of its old rows change too
+        return build_bitmap_index(input_file)
+    extended = BitmapIndex(rows)
+    extended.date_questions, extended.multi_questions = index.date_questions, index.multi_questions
+    for column, answers, matches, multi_answer in iter_answer_columns(input_file, index.rows):
+        extended.append_column(index, column, answers, matches, multi_answer=multi_answer)
+    for column, answers, matches in iter_player_columns(input_file):
+        extended.add_column(column, answers, matches)
+    for column, answers, matches in iter_wt_event_columns(input_file, rows, index.rows):
+        extended.append_column(index, column, answers, matches, max_answers=None)
+    return extended
+
+
+@cached_per_append(extend_bitmap_index)
+@stored_per_file
+def get_bitmap_index(input_file: str) -> BitmapIndex:
+    """Builds the index for every categorical question of the month file. Date questions are indexed by their normalized labels,
+    "check all that apply" questions - by every single tag. Tester name and role columns are replaced by normalized
+    PLAYER_FACET and ROLE_FACET columns. Derived "When did WT reach X?" columns are indexed like date questions.
+    Appended rows are indexed on their own
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        BitmapIndex: index over every row of the file, row numbers matching read_csv_file
+    """
+    return build_bitmap_index(input_file)
+
+
+def get_row_mask(input_file: str, facets) -> np.ndarray:
+    """Rows of the file that match the facet filter, including the submission date range
+
+    Args:
+        input_file (str): file name
+        facets (list): facet filter from the facet panel
+
+    Returns:
+        np.ndarray: bool mask over all rows of the file, None if the filter doesn't apply or the file has no rows
+    """
+    if not facets:
+        return None
+    index = get_bitmap_index(input_file)
+    if not index.rows:
+        return None
+    bitset = index.select(facets)
+    mask = None if bitset is None else index.to_mask(bitset)
+    time_mask = get_time_mask(input_file, facets, index.rows)
+    if time_mask is None:
+        return mask
+    return time_mask if mask is None else mask & time_mask
+
+
+def apply_facets(data, input_file: str, facets):
+    """Filters dataframe or series indexed by row number of the file
+
+    Args:
+        data (pd.DataFrame | pd.Series): data read from input_file
+        input_file (str): file name
+        facets (list): facet filter from the facet panel
+
+    Returns:
+        pd.DataFrame | pd.Series: matching rows only
+    """
+    mask = get_row_mask(input_file, facets)
+    if mask is None or data is None:
+        return data
+    return data[mask[data.index.to_numpy()]]
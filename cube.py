@@ -0,0 +1,324 @@
+"""Pre-aggregated answer cube.
+Number of runs for every (month, question, answer, end date, role) cell of every month file. Dimensions are dictionary-encoded,
+every cell is a row of small integer code arrays, so pies, winrate lines and month comparisons are slices of a few thousand cells
+instead of scans of the month files. Every month is built once from its bitmap index and cached per file - adding a month only builds that month.
+Usage: python cube.py - prints build time and size of every month slice and of the merged cube
+"""
+from __future__ import annotations
+
+import os
+import time
+
+from lazy_modules import pd, np
+from data_loader import cached_per_append, cached_per_catalogue, list_month_files
+from date_answers import get_date_answers, get_front_outcomes, date_sort_key, WELTKRIEG_FRONTS
+from bitmap_index import get_bitmap_index
+from players import get_player_rows, PLAYER_FACET, ROLE_FACET
+
+DIMENSIONS = ("Month", "Question", "Answer", "End", "Role")
+# Question -> source of its end date dimension: a key of WELTKRIEG_FRONTS or a date question
+END_DATE_SOURCES = {
+    "Who won the Franco-German part of the 2nd Weltkrieg?": "Germany-France",
+    "Who won the Russo-German part of the 2nd Weltkrieg?": "Germany-Russia",
+    "Who won the Argentinian-Chilean war?": "When did the Argentinian-Chilean War end?",
+    "Who won the American Civil War?": "When did the American Civil War end?",
+    "If the American Civil War was a two-way, who won it?": "When did the American Civil War end?",
+    "If the American Civil War was a three-way, who won it?": "When did the American Civil War end?",
+    "If MacArthur retreated EAST, who won the ACW?": "When did the American Civil War end?",
+    "If MacArthur retreated WEST, who won the ACW?": "When did the American Civil War end?",
+    "If MacArthur did NOT retreat, who won the ACW?": "When did the American Civil War end?",
+}
+# Indexed columns that are dimensions of the cube, not questions
+SKIPPED_QUESTIONS = (PLAYER_FACET, ROLE_FACET)
+
+
+class AnswerCube:
+    """Run counts keyed by DIMENSIONS. Every dimension is a list of labels (its dictionary) and an integer array of codes into it,
+    code -1 means the cell has no value of that dimension (answer without an end date question, run without a role)
+
+    Args:
+        dictionaries (dict): dimension -> list of labels
+        codes (dict): dimension -> int32 array of codes, one per cell
+        counts (np.ndarray): int32 number of runs of every cell
+        multi_answer (set, optional): (month, question) pairs of "check all that apply" questions
+    """
+
+    def __init__(self, dictionaries: dict, codes: dict, counts, multi_answer=frozenset()):
+        self.dictionaries = dictionaries
+        self.codes = codes
+        self.counts = counts
+        self.multi_answer = set(multi_answer)
+        # Chronological position of every end label, NaN for answers that are not dates ("Did not end")
+        self.end_ordinals = date_sort_key(pd.Series(dictionaries["End"], dtype=object)).to_numpy()
+        self.build_seconds = 0.0
+        # Date and multi-answer questions of the bitmap index a month slice was counted from
+        self.index_questions = None
+
+    @property
+    def cells(self) -> int:
+        return len(self.counts)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the code and count arrays. Dictionaries are shared strings and are not counted"""
+        return self.counts.nbytes + sum(codes.nbytes for codes in self.codes.values())
+
+    def select(self, where: dict) -> np.ndarray:
+        """Cells that match every filter
+
+        Args:
+            where (dict): dimension -> label or list of labels. Unknown labels match nothing
+
+        Returns:
+            np.ndarray: bool mask over the cells
+        """
+        mask = np.ones(self.cells, dtype=bool)
+        for dimension, labels in where.items():
+            labels = labels if isinstance(labels, (list, tuple, set)) else [labels]
+            positions = pd.Index(self.dictionaries[dimension], dtype=object).get_indexer(list(labels))
+            mask &= np.isin(self.codes[dimension], positions[positions >= 0])
+        return mask
+
+    def get_counts(self, by=("Answer",), where=None) -> pd.Series:
+        """Sum of the runs of the selected cells grouped by some of the dimensions. Cells without a value of a grouped dimension are left out
+
+        Args:
+            by (tuple, optional): grouped dimensions
+            where (dict, optional): filters, see select
+
+        Returns:
+            pd.Series: number of runs indexed by the labels of the grouped dimensions
+        """
+        mask = self.select(where or {})
+        by = list(by)
+        for dimension in by:
+            mask &= self.codes[dimension] >= 0
+        table = pd.DataFrame({dimension: self.codes[dimension][mask] for dimension in by})
+        counts = pd.Series(self.counts[mask]).groupby([table[dimension] for dimension in by]).sum()
+        labels = [
+            pd.Index(np.asarray(self.dictionaries[dimension], dtype=object)[counts.index.get_level_values(dimension)], name=dimension)
+            for dimension in by
+        ]
+        return counts.set_axis(labels[0] if len(by) == 1 else pd.MultiIndex.from_arrays(labels))
+
+    def merge(self, cubes):
+        """Re-encodes the dictionaries of several cubes into one, e.g. month slices into the cube of the catalogue
+
+        Args:
+            cubes (list): AnswerCube objects, self included if it should be kept
+
+        Returns:
+            AnswerCube: merged cube
+        """
+        dictionaries, codes = {}, {}
+        for dimension in DIMENSIONS:
+            merged = pd.Index(pd.unique(pd.Series([label for cube in cubes for label in cube.dictionaries[dimension]], dtype=object)))
+            dictionaries[dimension] = list(merged)
+            recoded = []
+            for cube in cubes:
+                # -1 stays -1
+                remap = np.append(merged.get_indexer(pd.Index(cube.dictionaries[dimension], dtype=object)), -1).astype(np.int32)
+                recoded.append(remap[cube.codes[dimension]])
+            codes[dimension] = np.concatenate(recoded) if recoded else np.zeros(0, dtype=np.int32)
+        counts = np.concatenate([cube.counts for cube in cubes]) if cubes else np.zeros(0, dtype=np.int32)
+        return AnswerCube(dictionaries, codes, counts, set().union(*(cube.multi_answer for cube in cubes)))
+
+    def compact(self):
+        """Sums the cells with the same key, e.g. after merging the cells of appended rows into a month slice
+
+        Returns:
+            AnswerCube: cube with unique cells
+        """
+        keys, inverse = np.unique(np.column_stack([self.codes[dimension] for dimension in DIMENSIONS]), axis=0, return_inverse=True)
+        counts = np.bincount(inverse.ravel(), weights=self.counts, minlength=len(keys)).astype(np.int32)
+        codes = {dimension: keys[:, i].astype(np.int32) for i, dimension in enumerate(DIMENSIONS)}
+        return AnswerCube(self.dictionaries, codes, counts, self.multi_answer)
+
+
+def factorize_labels(series, rows: int, start: int = 0) -> tuple:
+    """Dictionary and int32 codes of a label column over the rows of the file from start, -1 where missing
+
+    Args:
+        series (pd.Series): labels indexed by row number, can be None
+        rows (int): number of rows in the file
+        start (int, optional): first row number
+
+    Returns:
+        tuple: list of labels, codes array
+    """
+    if series is None:
+        return [], np.full(rows - start, -1, dtype=np.int32)
+    codes, uniques = pd.factorize(series.reindex(pd.RangeIndex(start, rows)).astype(object))
+    return [str(label) for label in uniques], codes.astype(np.int32)
+
+
+def get_end_labels(input_file: str, source: str):
+    """End date label of every row for one of END_DATE_SOURCES
+
+    Args:
+        input_file (str): file name
+        source (str): key of WELTKRIEG_FRONTS or a date question
+
+    Returns:
+        pd.Series: labels indexed by row number, None if the file doesn't have the source
+    """
+    if source in WELTKRIEG_FRONTS:
+        outcomes = get_front_outcomes(input_file, source)
+        return None if outcomes is None else outcomes["End"]
+    date_answers = get_date_answers(input_file)
+    return date_answers[source]["label"] if source in date_answers else None
+
+
+def count_cells(input_file: str, start: int = 0) -> AnswerCube:
+    """Cube slice of the rows of one month file from start. Answer cells come from the bitsets of the bitmap index: the (answers x rows)
+    bit matrix of a question is unpacked once, every set bit becomes an (answer, end date, role) key and the keys are counted with one np.unique
+
+    Args:
+        input_file (str): file name
+        start (int, optional): first row number
+
+    Returns:
+        AnswerCube: slice with a single month
+    """
+    index = get_bitmap_index(input_file)
+    player_rows = get_player_rows(input_file)
+    roles, role_codes = factorize_labels(player_rows["Role"] if len(player_rows) else None, index.rows, start)
+    # Only the bytes holding rows from start are unpacked
+    first_byte = start // 8
+
+    questions, answers, ends = [], {}, {}
+    end_codes_by_source = {}
+    codes = {dimension: [] for dimension in DIMENSIONS}
+    counts = []
+    for question, (labels, bitsets) in index.columns.items():
+        if question in SKIPPED_QUESTIONS:
+            continue
+        source = END_DATE_SOURCES.get(question)
+        if source not in end_codes_by_source:
+            end_labels, end_codes = factorize_labels(get_end_labels(input_file, source) if source else None, index.rows, start)
+            # Local end codes -> codes of the month dictionary
+            remap = np.array([ends.setdefault(label, len(ends)) for label in end_labels] + [-1], dtype=np.int32)
+            end_codes_by_source[source] = remap[end_codes]
+        end_codes = end_codes_by_source[source]
+
+        answer_positions, rows = np.nonzero(np.unpackbits(bitsets[:, first_byte:], axis=1, count=index.rows - first_byte * 8)[:, start - first_byte * 8:])
+        # Codes are shifted by one, so -1 (no end date, no role) is 0
+        shape = (len(labels), len(ends) + 1, len(roles) + 1)
+        keys, key_counts = np.unique(np.ravel_multi_index((answer_positions, end_codes[rows] + 1, role_codes[rows] + 1), shape), return_counts=True)
+        answer_codes, end_keys, role_keys = np.unravel_index(keys, shape)
+        answer_dictionary = np.array([answers.setdefault(label, len(answers)) for label in labels], dtype=np.int32)
+
+        codes["Question"].append(np.full(len(keys), len(questions), dtype=np.int32))
+        codes["Answer"].append(answer_dictionary[answer_codes])
+        codes["End"].append(end_keys.astype(np.int32) - 1)
+        codes["Role"].append(role_keys.astype(np.int32) - 1)
+        counts.append(key_counts.astype(np.int32))
+        questions.append(question)
+
+    counts = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int32)
+    codes = {dimension: np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int32) for dimension, arrays in codes.items()}
+    codes["Month"] = np.zeros(len(counts), dtype=np.int32)
+    dictionaries = {"Month": [input_file], "Question": questions, "Answer": list(answers), "End": list(ends), "Role": roles}
+    cube = AnswerCube(dictionaries, codes, counts, {(input_file, question) for question in index.multi_answer})
+    cube.index_questions = (index.date_questions, index.multi_questions)
+    return cube
+
+
+def extend_month_cube(cube: AnswerCube, input_file: str, previous) -> AnswerCube:
+    """Counts only the appended rows and adds their cells to the slice. build_seconds is the time of the update"""
+    index = get_bitmap_index(input_file)
+    if cube.index_questions != (index.date_questions, index.multi_questions):
+        # The index was built again, answers of the old rows changed
+        return build_month_cube.__wrapped__(input_file)
+    start = time.perf_counter()
+    extended = cube.merge([cube, count_cells(input_file, previous.rows)]).compact()
+    extended.index_questions = cube.index_questions
+    extended.build_seconds = time.perf_counter() - start
+    return extended
+
+
+@cached_per_append(extend_month_cube)
+def build_month_cube(input_file: str) -> AnswerCube:
+    """Cube slice of one month file, see count_cells. Appended rows are counted on their own
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        AnswerCube: slice with a single month
+    """
+    get_bitmap_index(input_file)
+    get_player_rows(input_file)
+    # Build time of the aggregation only, the bitmap index and player rows are cached on their own
+    start = time.perf_counter()
+    cube = count_cells(input_file)
+    cube.build_seconds = time.perf_counter() - start
+    return cube
+
+
+@cached_per_catalogue
+def get_answer_cube() -> AnswerCube:
+    """Cube of every month file. Month slices are cached per file, so only added or changed months are built again before the merge
+
+    Returns:
+        AnswerCube: merged cube, build_seconds is the time of the merge only
+    """
+    slices = [build_month_cube(input_file) for input_file in list_month_files()]
+    start = time.perf_counter()
+    cube = slices[0].merge(slices) if slices else AnswerCube({dimension: [] for dimension in DIMENSIONS}, {dimension: np.zeros(0, dtype=np.int32) for dimension in DIMENSIONS}, np.zeros(0, dtype=np.int32))
+    cube.build_seconds = time.perf_counter() - start
+    return cube
+
+
+def get_answer_counts(input_file: str, question: str, roles=None) -> pd.Series:
+    """Number of runs of every answer of one question, like value_counts() of the column
+
+    Args:
+        input_file (str): file name
+        question (str): question
+        roles (list, optional): count only the runs of these roles
+
+    Returns:
+        pd.Series: answer -> number of runs, most frequent first. Empty if the question is not in the file
+    """
+    where = {"Question": question}
+    if roles is not None:
+        where["Role"] = roles
+    counts = build_month_cube(input_file).get_counts(("Answer",), where)
+    return counts.rename(question).rename_axis(None).sort_values(ascending=False, kind="stable")
+
+
+def get_end_date_counts(input_file: str, question: str, roles=None) -> pd.DataFrame:
+    """Number of runs of every (end date, answer) pair of a question in END_DATE_SOURCES, like pd.crosstab(end, answer)
+
+    Args:
+        input_file (str): file name
+        question (str): question
+        roles (list, optional): count only the runs of these roles
+
+    Returns:
+        pd.DataFrame: end labels x answers in chronological order, runs without an end date are left out
+    """
+    where = {"Question": question}
+    if roles is not None:
+        where["Role"] = roles
+    cube = build_month_cube(input_file)
+    table = cube.get_counts(("End", "Answer"), where).unstack("Answer", fill_value=0).rename_axis(index=None, columns=None)
+    # Chronological order from the ordinals of the end dictionary, end answers that are not dates go last
+    ordinals = pd.Series(cube.end_ordinals, index=cube.dictionaries["End"], dtype="float64").reindex(table.index)
+    return table.iloc[np.argsort(ordinals.to_numpy(), kind="stable")]
+
+
+def main():
+    print("| Month | Cells | Size (KB) | Build time (ms) |")
+    print("|---|---|---|---|")
+    for input_file in list_month_files():
+        cube = build_month_cube(input_file)
+        print(f"| {os.path.splitext(input_file)[0]} | {cube.cells} | {cube.nbytes / 1024:.1f} | {cube.build_seconds * 1000:.0f} |")
+    cube = get_answer_cube()
+    print(f"| All months (merge) | {cube.cells} | {cube.nbytes / 1024:.1f} | {cube.build_seconds * 1000:.0f} |")
+    print(f"\nDictionaries: {', '.join(f'{dimension} {len(cube.dictionaries[dimension])}' for dimension in DIMENSIONS)}")
+
+
+if __name__ == "__main__":
+    main()
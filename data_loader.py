@@ -0,0 +1,897 @@
+from __future__ import annotations
+
+import io
+import os
+import ast
+import csv
+import copy
+import glob
+import hashlib
+import functools
+import threading
+
+from lazy_modules import pd, np
+from vocabulary import canonical_question, canonicalize_frame
+
+# Folders with month files, in lookup order. Dashboard dropdowns only list /input, /backup holds older months
+DATA_FOLDERS = ("input", "backup")
+# Multi-kilobyte columns with per-run logs. Never parsed unless a view explicitly asks for them
+BLOB_COLUMNS = ("WT Data", "Divisions Data", "Industry Data")
+MONTHS = ("January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December")
+# Half-month files are named "July I 2022", "July II 2022"
+ROMAN_PARTS = {"I": 1, "II": 2, "III": 3}
+# Monthly axis shared by all log columns. WT is logged monthly, industry and divisions - quarterly
+TIMELINE = tuple(f"{year}.{month}" for year in range(1936, 1951) for month in MONTHS)
+TIMELINE_INDEX = {timestamp: i for i, timestamp in enumerate(TIMELINE)}
+# Tags reported in the industry and divisions logs, each entry is "TAG;value;value;value"
+LOG_TAGS = ("AUS", "CAN", "ENG", "FRA", "GER", "NFA", "RUS", "JAP")
+LOG_TAGS_INDEX = {tag: i for i, tag in enumerate(LOG_TAGS)}
+LOG_VALUES = 3
+
+# Rows parsed at once in streaming mode
+CHUNK_ROWS = 256
+# Files bigger than this are summarised with streaming aggregates instead of plotting every run
+STREAMING_FILE_SIZE = 20 * 1024 * 1024
+# Bytes read at once when hashing a month file
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+#####################
+# Files and caching #
+#####################
+
+
+def get_file_path(input_file: str) -> str:
+    """Resolves month file name (e.g. "June I 2023.csv") to the full path. /input is checked first, then /backup
+
+    Args:
+        input_file (str): file name as shown in the dropdowns
+
+    Returns:
+        str: full path to the file. Path inside /input is returned if the file doesn't exist anywhere
+    """
+    dirname = os.path.dirname(__file__)
+    for folder in DATA_FOLDERS:
+        filepath = os.path.join(dirname, folder, input_file)
+        if os.path.isfile(filepath):
+            return filepath
+    return os.path.join(dirname, DATA_FOLDERS[0], input_file)
+
+
+def month_sort_key(input_file: str) -> tuple:
+    """Chronological sort key of a month file name, e.g. "June I 2023.csv" -> (2023, 6, 1), "May 2022.csv" -> (2022, 5, 0)
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        tuple: (year, month, part of month). Unknown names sort first
+    """
+    words = os.path.splitext(input_file)[0].split()
+    year = int(words[-1]) if words and words[-1].isdigit() else 0
+    month = MONTHS.index(words[0]) + 1 if words and words[0] in MONTHS else 0
+    part = ROMAN_PARTS.get(words[1], 0) if len(words) > 2 else 0
+    return (year, month, part)
+
+
+def list_month_files() -> list:
+    """All month files in /input and /backup in chronological order
+
+    Returns:
+        list: file names
+    """
+    dirname = os.path.dirname(__file__)
+    files = {os.path.basename(filename) for folder in DATA_FOLDERS for filename in glob.glob(os.path.join(dirname, folder, "*.csv"))}
+    return sorted(files, key=month_sort_key)
+
+
+def get_file_signature(input_file: str) -> tuple:
+    """Cheap file version used to invalidate cached results when a month file is re-downloaded
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        tuple: (size, modification time in ns)
+    """
+    stat = os.stat(get_file_path(input_file))
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def cached_per_file(func):
+    """Memoizes func(input_file, *args) in the current process until the file on disk changes.
+    Cached values are shared between callbacks - callers must not mutate them
+    """
+    cache = {}
+
+    @functools.wraps(func)
+    def wrapper(input_file, *args):
+        signature = get_file_signature(input_file)
+        key = (input_file, args)
+        hit = cache.get(key)
+        if hit is not None and hit[0] == signature:
+            return hit[1]
+        value = func(input_file, *args)
+        cache[key] = (signature, value)
+        return value
+
+    wrapper.cache = cache
+    return wrapper
+
+
+def cached_per_catalogue(func):
+    """Memoizes func(*args) built from all month files in /input and /backup until a file is added, removed or changed.
+    Cached values are shared between callbacks - callers must not mutate them
+    """
+    cache = {}
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        signature = tuple((input_file, get_file_signature(input_file)) for input_file in list_month_files())
+        hit = cache.get(args)
+        if hit is not None and hit[0] == signature:
+            return hit[1]
+        value = func(*args)
+        cache[args] = (signature, value)
+        return value
+
+    wrapper.cache = cache
+    return wrapper
+
+
+######################
+# Incremental append #
+######################
+
+
+def count_records(content: bytes) -> int:
+    """Number of non-empty CSV records, quoted line breaks included the way pd.read_csv reads them"""
+    return sum(1 for record in csv.reader(io.TextIOWrapper(io.BytesIO(content), encoding="UTF-8", errors="replace", newline="")) if record)
+
+
+class FileMark:
+    """One ingested version of a month file. Google Form exports are re-downloaded while the survey is open and only grow,
+    so a new version whose first `size` bytes hash to `digest` is this version plus appended rows
+
+    Args:
+        size (int): bytes
+        digest (object): running hashlib.sha256 of the content, extended with the appended bytes of later versions
+        header (bytes): header record with its line break, prepended to appended rows to parse them on their own
+        line_end (bool): True if the content ends with a line break
+        base (FileMark, optional): version this one extends
+        rows (int, optional): number of data rows, counted on the first append
+    """
+
+    def __init__(self, size: int, digest, header: bytes, line_end: bool, base: FileMark = None, rows: int = None):
+        self.size = size
+        self.digest = digest
+        self.header = header
+        self.line_end = line_end
+        self.base = base
+        self.rows = rows
+
+    def extend(self, tail: bytes) -> FileMark:
+        """Version with the tail appended. self.rows must be counted"""
+        digest = self.digest.copy()
+        digest.update(tail)
+        return FileMark(self.size + len(tail), digest, self.header, tail.endswith(b"\n"), base=self, rows=self.rows + count_records(tail))
+
+    def extends(self, mark: FileMark) -> bool:
+        """Checks if this version is the given version plus appended rows"""
+        version = self
+        while version is not None:
+            if version is mark:
+                return True
+            version = version.base
+        return False
+
+
+def get_header(block: bytes) -> bytes:
+    """Header record at the start of the file, line breaks inside quoted titles included"""
+    end = block.find(b"\n")
+    while end != -1 and block[:end].count(b'"') % 2:
+        end = block.find(b"\n", end + 1)
+    return block if end == -1 else block[:end + 1]
+
+
+def read_file_mark(file, size: int) -> FileMark:
+    """Hashes a whole version of a month file in blocks
+
+    Args:
+        file (object): file opened in binary mode
+        size (int): bytes to read
+
+    Returns:
+        FileMark: version without base
+    """
+    digest, header, last = hashlib.sha256(), b"", b""
+    file.seek(0)
+    remaining = size
+    while remaining > 0:
+        block = file.read(min(HASH_BLOCK_SIZE, remaining))
+        if not block:
+            break
+        header = header or get_header(block)
+        digest.update(block)
+        last = block
+        remaining -= len(block)
+    return FileMark(size - remaining, digest, header, last.endswith(b"\n"))
+
+
+# File name -> (signature, FileMark) of the version last seen by this process
+file_marks = {}
+file_marks_lock = threading.Lock()
+
+
+def get_file_mark(input_file: str) -> FileMark:
+    """Current version of the month file. When the file changed, its prefix is hashed and compared with the version seen last -
+    an append only hashes and counts the new bytes, anything else is read as a new file
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        FileMark: current version, extending the previous one for an append
+    """
+    signature = get_file_signature(input_file)
+    with file_marks_lock:
+        hit = file_marks.get(input_file)
+        if hit is not None and hit[0] == signature:
+            return hit[1]
+        previous = hit[1] if hit is not None else None
+        size = signature[0]
+        with open(get_file_path(input_file), "rb") as file:
+            mark = None
+            if previous is not None and size >= previous.size:
+                prefix = file.read(previous.size)
+                tail = file.read(size - previous.size)
+                # Rows must start after a line break of the previous version, otherwise its last row was cut off
+                if hashlib.sha256(prefix).digest() == previous.digest.digest() and (previous.line_end or tail[:1] in (b"\r", b"\n") or not tail):
+                    if not tail:
+                        mark = previous
+                    else:
+                        if previous.rows is None:
+                            previous.rows = count_records(prefix) - 1
+                        mark = previous.extend(tail)
+            if mark is None:
+                mark = read_file_mark(file, size)
+        file_marks[input_file] = (signature, mark)
+        return mark
+
+
+def get_file_hash(input_file: str) -> str:
+    """SHA-256 of the file content. Unlike the signature it stays the same when the file is copied or re-deployed.
+    Appended rows only hash the new bytes (see get_file_mark)
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        str: hex digest
+    """
+    return get_file_mark(input_file).digest.hexdigest()
+
+
+def cached_per_append(extend):
+    """Like cached_per_file, but when the file only grew by appended rows since the cached value was built, the value is
+    updated with extend(value, input_file, previous, *args) instead of being rebuilt. previous is the FileMark of the cached
+    value, see read_csv_tail. extend must not mutate the cached value - callers may still hold it. Cost of an update scales
+    with the appended rows, not with the file size. A re-download with the same content keeps the cached value
+
+    Args:
+        extend (function): builds the value of the grown file from the cached value and the appended rows
+    """
+    def decorator(func):
+        cache = {}
+
+        @functools.wraps(func)
+        def wrapper(input_file, *args):
+            signature = get_file_signature(input_file)
+            key = (input_file, args)
+            hit = cache.get(key)
+            if hit is not None and hit[0] == signature:
+                return hit[1]
+            mark = get_file_mark(input_file)
+            if hit is not None and hit[2] is mark:
+                value = hit[1]
+            elif hit is not None and hit[2] is not None and mark.extends(hit[2]):
+                value = extend(hit[1], input_file, hit[2], *args)
+            else:
+                value = func(input_file, *args)
+            # A file that changed while the value was built gets no mark, the next call rebuilds it
+            cache[key] = (signature, value, mark if get_file_signature(input_file) == signature else None)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+def read_csv_tail(input_file: str, previous: FileMark, columns=None, dtypes=None) -> pd.DataFrame:
+    """Parses only the rows appended since a version of the month file. Row numbers continue the rows of that version
+
+    Args:
+        input_file (str): file name
+        previous (FileMark): version the current file extends
+        columns (iterable, optional): canonical names of the columns to parse. Defaults to every column except the blob columns
+        dtypes (pd.Series, optional): dtypes of the rows parsed before, by canonical name. Text columns stay text even if the
+            appended answers look like numbers
+
+    Returns:
+        pd.DataFrame: canonicalized appended rows
+    """
+    mark = get_file_mark(input_file)
+    with open(get_file_path(input_file), "rb") as file:
+        file.seek(previous.size)
+        tail = file.read(mark.size - previous.size)
+    dtype = None
+    if dtypes is not None:
+        header = pd.read_csv(io.BytesIO(previous.header), nrows=0).columns
+        dtype = {column: str for column in header if dtypes.get(canonical_question(column)) == object}
+    csv_df = pd.read_csv(io.BytesIO(previous.header + tail), usecols=get_usecols(columns), dtype=dtype)
+    csv_df.index += previous.rows
+    return canonicalize_frame(csv_df, exclude=BLOB_COLUMNS)
+
+
+###############
+# CSV loading #
+###############
+
+
+@cached_per_file
+def get_file_columns(input_file: str) -> tuple:
+    """Reads only the header of the month file
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        tuple: canonical column names in file order
+    """
+    return tuple(map(canonical_question, pd.read_csv(get_file_path(input_file), nrows=0).columns))
+
+
+def get_usecols(columns=None):
+    """Column filter for pd.read_csv. Missing columns are ignored instead of raising
+
+    Args:
+        columns (iterable, optional): canonical names of the columns to parse. Defaults to every column except the blob columns
+
+    Returns:
+        function: usecols callable
+    """
+    if columns is None:
+        return lambda column: column not in BLOB_COLUMNS
+    wanted = set(columns)
+    return lambda column: canonical_question(column) in wanted
+
+
+def parse_csv_frame(input_file: str) -> pd.DataFrame:
+    """Parses every column of the month file except the blob columns"""
+    return canonicalize_frame(pd.read_csv(get_file_path(input_file), usecols=get_usecols()), exclude=BLOB_COLUMNS)
+
+
+def extend_csv_frame(csv_df: pd.DataFrame, input_file: str, previous: FileMark) -> pd.DataFrame:
+    """Appends the new rows of the month file to its cached dataframe. A number column that got a text answer is text
+    in the whole file, so the file is parsed again"""
+    tail = read_csv_tail(input_file, previous, dtypes=csv_df.dtypes)
+    if not len(tail):
+        return csv_df
+    if any(tail[column].dtype == object and csv_df[column].dtype != object for column in tail.columns):
+        return parse_csv_frame(input_file)
+    return pd.concat([csv_df, tail])
+
+
+@cached_per_append(extend_csv_frame)
+def load_csv_frame(input_file: str) -> pd.DataFrame:
+    """Every column except the blob columns, parsed once per file and extended with appended rows
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        pd.DataFrame: canonicalized dataframe, shared - use read_csv_file for a copy
+    """
+    return parse_csv_frame(input_file)
+
+
+def read_appended_rows(input_file: str, previous: FileMark) -> pd.DataFrame:
+    """Rows of load_csv_frame appended since a version of the month file. Sliced from the cached frame, nothing is parsed again
+
+    Args:
+        input_file (str): file name
+        previous (FileMark): version the current file extends
+
+    Returns:
+        pd.DataFrame: canonicalized rows, shared - must not be mutated
+    """
+    return load_csv_frame(input_file).iloc[previous.rows:]
+
+
+def extend_row_count(rows: int, input_file: str, previous: FileMark) -> int:
+    """Adds the rows appended to the month file"""
+    return rows + get_file_mark(input_file).rows - previous.rows
+
+
+@cached_per_append(extend_row_count)
+def get_row_count(input_file: str) -> int:
+    """Number of data rows in the month file. Unlike len(read_csv_file(input_file)) it counts the rows of files with only log columns
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        int: rows
+    """
+    with open(get_file_path(input_file), "rb") as file:
+        return max(count_records(file.read()) - 1, 0)
+
+
+def read_csv_file(input_file: str, columns=None) -> pd.DataFrame:
+    """Reads month file keeping only the columns a figure needs. Columns that are not present in the file are skipped,
+    so callers should still check `column in csv_df.columns`. Question titles and answers are canonicalized (see vocabulary).
+    Answer columns are projected from load_csv_frame, log columns are parsed on every call
+
+    Args:
+        input_file (str): file name. Is defined by the dropdown value
+        columns (iterable, optional): canonical names of the columns to parse. Defaults to every column except the blob columns
+
+    Returns:
+        pd.DataFrame: projected dataframe, a copy the caller can change
+    """
+    if columns is not None and set(columns) & set(BLOB_COLUMNS):
+        return canonicalize_frame(pd.read_csv(get_file_path(input_file), usecols=get_usecols(columns)), exclude=BLOB_COLUMNS)
+    csv_df = load_csv_frame(input_file)
+    wanted = None if columns is None else set(columns)
+    return csv_df[[column for column in csv_df.columns if wanted is None or column in wanted]]
+
+
+def iter_csv_chunks(input_file: str, columns=None, chunksize: int = CHUNK_ROWS):
+    """Streams month file in row chunks, so memory doesn't depend on the file size
+
+    Args:
+        input_file (str): file name
+        columns (iterable, optional): canonical names of the columns to parse. Defaults to every column except the blob columns
+        chunksize (int, optional): rows per chunk
+
+    Yields:
+        pd.DataFrame: next chunk, index continues the row numbers of the file
+    """
+    with pd.read_csv(get_file_path(input_file), usecols=get_usecols(columns), chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield canonicalize_frame(chunk, exclude=BLOB_COLUMNS)
+
+
+def is_large_file(input_file: str) -> bool:
+    """Checks if the file should be processed in streaming mode
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        bool: True if the file is bigger than STREAMING_FILE_SIZE
+    """
+    return os.path.getsize(get_file_path(input_file)) > STREAMING_FILE_SIZE
+
+
+###################
+# Blob validation #
+###################
+
+
+def repeated(item: str, separator: str) -> str:
+    """Regex of one or more items joined with the separator"""
+    return f"{item}(?:{separator}{item})*"
+
+
+# Log cell shapes. Older files store dictionary literals ("{'1936.March': ['AUS;26;73;118', ...]}"), newer ones compressed logs
+LOG_NUMBER = r"-?\d+(?:\.\d+)?"
+LOG_ENTRY = r"[A-Z]{3}(?:;-?\d+){%d}" % LOG_VALUES
+COMPRESSED_KEY = r"\d{2}\.\d{2}"
+LITERAL_KEY = r"'\d{4}\.[A-Z][a-z]+'"
+TAG_LOG_SHAPE = (
+    repeated(rf"{COMPRESSED_KEY}:\[(?:{repeated(LOG_ENTRY, ',')})?\]", ",")
+    + "|" + r"\{" + repeated(rf"{LITERAL_KEY}: \[(?:{repeated(f'{chr(39)}{LOG_ENTRY}{chr(39)}', ', ')})?\]", ", ") + r"\}"
+)
+BLOB_SHAPES = {
+    "WT Data": repeated(f"{COMPRESSED_KEY}:{LOG_NUMBER}", ",") + "|" + r"\{" + repeated(f"{LITERAL_KEY}: {LOG_NUMBER}", ", ") + r"\}",
+    "Divisions Data": TAG_LOG_SHAPE,
+    "Industry Data": TAG_LOG_SHAPE,
+}
+# Captures every timestamp key, "36.03" and "'1936.March'"
+LOG_KEY_PATTERN = r"(?:^|[,{] ?)'?(\d{2,4}\.(?:\d{2}|[A-Z][a-z]+))'?:"
+WT_RANGE = (0.0, 1.0)
+# Quarantine reasons in check order, a row is reported with the first check it fails
+QUARANTINE_REASONS = (
+    "malformed",
+    "unknown timestamp",
+    "timestamps out of order",
+    "unknown tag",
+    "value out of range",
+    "inconsistent tags",
+)
+
+
+def validate_blob_series(series, column: str) -> pd.Series:
+    """Checks every cell of a log column with vectorized string operations, no cell is decoded:
+    shape of the cell, timestamps (known and strictly increasing), tags (known, no duplicates in one timestamp),
+    value ranges and tag counts (tags only drop out of the log when a country capitulates, they never come back)
+
+    Args:
+        series (pd.Series): raw log cells
+        column (str): one of BLOB_COLUMNS
+
+    Returns:
+        pd.Series: one of QUARANTINE_REASONS for every row that fails a check, None for valid and empty rows. Index of the series
+    """
+    reasons = pd.Series(None, index=series.index, dtype=object)
+    cells = series.dropna().astype(str)
+    shaped = cells.str.fullmatch(BLOB_SHAPES[column])
+    failed = {"malformed": cells.index[~shaped]}
+    cells = cells[shaped]
+
+    # findall + explode keeps the row label of every match, extractall is ~10x slower on multi-kilobyte cells
+    keys = cells.str.findall(LOG_KEY_PATTERN).explode().dropna()
+    parts = keys.str.split(".", expand=True) if len(keys) else pd.DataFrame({0: keys, 1: keys})
+    years = parts[0].astype(int)
+    years = years.where(years > 100, years + 1900)
+    months = pd.to_numeric(parts[1], errors="coerce").fillna(parts[1].map({month: i + 1 for i, month in enumerate(MONTHS)}))
+    ordinals = (years - int(TIMELINE[0][:4])) * 12 + months - 1
+    failed["unknown timestamp"] = ordinals.index[~ordinals.between(0, len(TIMELINE) - 1)]
+    failed["timestamps out of order"] = ordinals.index[ordinals.groupby(level=0).diff().le(0)]
+
+    if column == "WT Data":
+        values = cells.str.findall(rf":\s?({LOG_NUMBER})").explode().dropna().astype(float)
+        failed["value out of range"] = values.index[~values.between(*WT_RANGE)]
+    else:
+        blocks = cells.str.findall(r"\[([^\]]*)\]").explode().dropna()
+        block_rows = blocks.index
+        blocks = blocks.reset_index(drop=True)
+        tags = blocks.str.findall(r"([A-Z]{3});").explode().dropna()
+        failed["unknown tag"] = block_rows[tags.index[~tags.isin(LOG_TAGS)]]
+        # Industry and divisions values are counts
+        failed["value out of range"] = cells.index[cells.str.contains(";-", regex=False)]
+        duplicated = pd.DataFrame({"Block": tags.index, "Tag": tags.to_numpy()}).duplicated().to_numpy()
+        growing = blocks.str.count(";").groupby(block_rows).diff().gt(0).to_numpy()
+        failed["inconsistent tags"] = block_rows[tags.index[duplicated]].append(block_rows[growing])
+
+    for reason in QUARANTINE_REASONS:
+        rows = pd.Index(failed.get(reason, [])).unique()
+        reasons[rows[reasons[rows].isna()]] = reason
+    return reasons
+
+
+def iter_log_column(input_file: str, column: str):
+    """Raw cells of a log column. Files bigger than STREAMING_FILE_SIZE are read chunk by chunk, so the raw column of a large
+    file is never held in memory at once
+
+    Args:
+        input_file (str): file name
+        column (str): one of BLOB_COLUMNS
+
+    Yields:
+        pd.Series: raw cells indexed by row number, the whole column for smaller files
+    """
+    chunks = iter_csv_chunks(input_file, columns=[column]) if is_large_file(input_file) else [read_csv_file(input_file, columns=[column])]
+    for chunk in chunks:
+        if column in chunk.columns:
+            yield chunk[column]
+
+
+def get_quarantine_frame(series, column: str) -> pd.DataFrame:
+    """"Reason" and "Value" of the cells of a log column that fail validation"""
+    reasons = validate_blob_series(series, column).dropna()
+    return pd.DataFrame({"Reason": reasons, "Value": series[reasons.index].astype(str).str[:80]})
+
+
+def extend_blob_quarantine(quarantine: pd.DataFrame, input_file: str, previous: FileMark, column: str) -> pd.DataFrame:
+    """Validates only the appended rows of the log column"""
+    tail = read_csv_tail(input_file, previous, columns=[column])
+    if column not in tail.columns or not len(tail):
+        return quarantine
+    return pd.concat([quarantine, get_quarantine_frame(tail[column], column)])
+
+
+@cached_per_append(extend_blob_quarantine)
+def get_blob_quarantine(input_file: str, column: str) -> pd.DataFrame:
+    """Rows of the log column that failed validation. Cached per file
+
+    Args:
+        input_file (str): file name
+        column (str): one of BLOB_COLUMNS
+
+    Returns:
+        pd.DataFrame: "Reason" and "Value" (start of the raw cell) indexed by row number
+    """
+    frames = [get_quarantine_frame(series, column) for series in iter_log_column(input_file, column)]
+    if not frames:
+        return pd.DataFrame(columns=["Reason", "Value"])
+    return frames[0] if len(frames) == 1 else pd.concat(frames)
+
+
+#################
+# Blob decoding #
+#################
+
+
+def normalize_timestamp(key: str) -> str:
+    """Converts log timestamps to the "1936.March" format. Newer logs use compressed "36.03" keys
+
+    Args:
+        key (str): timestamp from the log, "36.03" or "1936.March"
+
+    Returns:
+        str: timestamp in "1936.March" format
+    """
+    year, month = key.split(".")
+    if month.isdigit():
+        return f"19{year}.{MONTHS[int(month) - 1]}" if len(year) == 2 else f"{year}.{MONTHS[int(month) - 1]}"
+    return key
+
+
+def decode_blob(input_str: str, column: str) -> dict:
+    """Decodes one log cell. Both dictionary literals and compressed logs are supported:
+    "36.02:0.019,36.03:0.087" -> {"1936.February": 0.019, "1936.March": 0.087}
+    "36.03:[AUS;26;73;118,JAP;32;65;83],36.06:[...]" -> {"1936.March": ["AUS;26;73;118", "JAP;32;65;83"], "1936.June": [...]}
+
+    Args:
+        input_str (str): raw cell value
+        column (str): one of BLOB_COLUMNS
+
+    Returns:
+        dict: timestamp -> WT value (float) or list of "TAG;value;value;value" strings
+    """
+    if input_str.startswith("{"):
+        data = ast.literal_eval(input_str)
+    elif column == "WT Data":
+        data = {i[:i.index(":")]: float(i[i.index(":") + 1:]) for i in input_str.split(",")}
+    else:
+        data = {i[:i.index(":")]: i[i.index(":") + 2:].rstrip("]").split(",") for i in input_str.split("],")}
+    return {normalize_timestamp(key): value for key, value in data.items()}
+
+
+def get_valid_blobs(series, column: str) -> pd.Series:
+    """Non-empty cells of a log column that pass validation (see get_blob_quarantine)"""
+    series = series.dropna()
+    return series[validate_blob_series(series, column).isna()]
+
+
+def read_blob_tail(input_file: str, previous: FileMark, column: str) -> pd.Series:
+    """get_valid_blobs of the rows appended since a version of the month file
+
+    Args:
+        input_file (str): file name
+        previous (FileMark): version the current file extends
+        column (str): one of BLOB_COLUMNS
+
+    Returns:
+        pd.Series: raw cells indexed by row number, empty if no row was appended
+    """
+    tail = read_csv_tail(input_file, previous, columns=[column])
+    return get_valid_blobs(tail[column], column) if column in tail.columns else pd.Series(dtype=object)
+
+
+def decode_blob_series(series, column: str) -> pd.Series:
+    """decode_blob of every cell"""
+    return pd.Series([decode_blob(value, column) for value in series], index=series.index, dtype="object")
+
+
+def extend_blob_column(decoded: pd.Series, input_file: str, previous: FileMark, column: str) -> pd.Series:
+    """Decodes only the appended rows of the log column"""
+    series = read_blob_tail(input_file, previous, column)
+    return pd.concat([decoded, decode_blob_series(series, column)]) if len(series) else decoded
+
+
+@cached_per_append(extend_blob_column)
+def read_blob_column(input_file: str, column: str) -> pd.Series:
+    """Parses one of the log columns on demand. Rows that fail validation are quarantined (see get_blob_quarantine) and never decoded.
+    The result is cached until the file changes, appended rows are decoded on their own
+
+    Args:
+        input_file (str): file name
+        column (str): one of BLOB_COLUMNS
+
+    Returns:
+        pd.Series: decoded dict for every valid row with data in this column, indexed by row number
+    """
+    decoded = [decode_blob_series(get_valid_blobs(series, column), column) for series in iter_log_column(input_file, column)]
+    if not decoded:
+        return pd.Series(dtype=object)
+    return decoded[0] if len(decoded) == 1 else pd.concat(decoded)
+
+
+def fill_wt_array(series, out) -> np.ndarray:
+    """Decodes WT logs into preallocated (rows x TIMELINE) array. Months without data are NaN
+
+    Args:
+        series (pd.Series): raw "WT Data" cells
+        out (np.ndarray): buffer with at least len(series) rows, reused between chunks
+
+    Returns:
+        np.ndarray: view of the buffer with one row per cell
+    """
+    block = out[:len(series)]
+    block.fill(np.nan)
+    for row, value in enumerate(series):
+        if not isinstance(value, str):
+            continue
+        for timestamp, wt in decode_blob(value, "WT Data").items():
+            column = TIMELINE_INDEX.get(timestamp)
+            if column is not None:
+                block[row, column] = wt
+    return block
+
+
+def fill_tag_array(series, column: str, out) -> np.ndarray:
+    """Decodes industry/divisions logs into preallocated (rows x TIMELINE x LOG_TAGS x LOG_VALUES) array.
+    Missing timestamps and tags are NaN, tags outside LOG_TAGS are skipped
+
+    Args:
+        series (pd.Series): raw log cells
+        column (str): "Industry Data" or "Divisions Data"
+        out (np.ndarray): buffer with at least len(series) rows, reused between chunks
+
+    Returns:
+        np.ndarray: view of the buffer with one row per cell
+    """
+    block = out[:len(series)]
+    block.fill(np.nan)
+    for row, value in enumerate(series):
+        if not isinstance(value, str):
+            continue
+        for timestamp, entries in decode_blob(value, column).items():
+            time_index = TIMELINE_INDEX.get(timestamp)
+            if time_index is None:
+                continue
+            for entry in entries:
+                parts = entry.split(";")
+                tag_index = LOG_TAGS_INDEX.get(parts[0])
+                if tag_index is not None:
+                    block[row, time_index, tag_index] = parts[1:LOG_VALUES + 1]
+    return block
+
+
+def create_log_buffer(column: str, rows: int) -> np.ndarray:
+    """Allocates decoding buffer for the log column
+
+    Args:
+        column (str): one of BLOB_COLUMNS
+        rows (int): number of rows
+
+    Returns:
+        np.ndarray: float32 buffer
+    """
+    if column == "WT Data":
+        return np.empty((rows, len(TIMELINE)), dtype=np.float32)
+    return np.empty((rows, len(TIMELINE), len(LOG_TAGS), LOG_VALUES), dtype=np.float32)
+
+
+def fill_log_array(series, column: str, out) -> np.ndarray:
+    """Dispatches to fill_wt_array or fill_tag_array based on the column"""
+    if column == "WT Data":
+        return fill_wt_array(series, out)
+    return fill_tag_array(series, column, out)
+
+
+########################
+# Streaming aggregates #
+########################
+
+
+WT_CATEGORIES = ("Red", "Orange", "Yellow", "Green")
+
+
+def categorize_world_tension(matrix) -> np.ndarray:
+    """Splits runs into the WT graph colour groups:
+    Red - < 75% WT by 12.1940, Orange - < 75% WT by 07.1940, Yellow - > 75% WT by 12.1938, Green - everything else
+
+    Args:
+        matrix (np.ndarray): (runs x TIMELINE) WT values
+
+    Returns:
+        np.ndarray: index in WT_CATEGORIES for every run
+    """
+    red = matrix[:, TIMELINE_INDEX["1940.December"]] < 0.75
+    orange = matrix[:, TIMELINE_INDEX["1940.July"]] < 0.75
+    yellow = matrix[:, TIMELINE_INDEX["1938.December"]] > 0.75
+    return np.select([red, orange, yellow], [0, 1, 2], default=3)
+
+
+class LogAggregate:
+    """Running per-timestamp statistics of a log column. Memory depends only on the timeline and tag axes,
+    not on the number of runs in the file
+
+    Args:
+        shape (tuple): shape of one decoded row
+    """
+
+    def __init__(self, shape: tuple):
+        self.runs = 0
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.total = np.zeros(shape, dtype=np.float64)
+        self.minimum = np.full(shape, np.nan)
+        self.maximum = np.full(shape, np.nan)
+
+    def update(self, block):
+        """Folds decoded chunk into the aggregate
+
+        Args:
+            block (np.ndarray): (rows x shape) decoded values, NaN where missing
+        """
+        if not len(block):
+            return
+        self.runs += len(block)
+        self.count += (~np.isnan(block)).sum(axis=0)
+        self.total += np.nansum(block, axis=0)
+        self.minimum = np.fmin(self.minimum, np.fmin.reduce(block, axis=0))
+        self.maximum = np.fmax(self.maximum, np.fmax.reduce(block, axis=0))
+
+    @property
+    def mean(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 0, self.total / self.count, np.nan)
+
+
+class WorldTensionAggregate(LogAggregate):
+    """LogAggregate for "WT Data" that also counts runs per WT graph colour group"""
+
+    def __init__(self):
+        super().__init__((len(TIMELINE),))
+        self.category_counts = np.zeros(len(WT_CATEGORIES), dtype=np.int64)
+
+    def update(self, block):
+        super().update(block)
+        self.category_counts += np.bincount(categorize_world_tension(block), minlength=len(WT_CATEGORIES))
+
+
+def aggregate_log_column(input_file: str, column: str, mask=None, chunksize: int = CHUNK_ROWS) -> LogAggregate:
+    """Reads the log column chunk by chunk into one reused buffer and updates the aggregate incrementally.
+    Peak memory is bounded by the chunk size regardless of the file size. Runs without logs and quarantined rows are skipped
+
+    Args:
+        input_file (str): file name
+        column (str): one of BLOB_COLUMNS
+        mask (np.ndarray, optional): bool mask over all rows of the file, only matching rows are aggregated
+        chunksize (int, optional): rows per chunk
+
+    Returns:
+        LogAggregate: WorldTensionAggregate for "WT Data", LogAggregate with (TIMELINE x LOG_TAGS x LOG_VALUES) shape otherwise
+    """
+    buffer = create_log_buffer(column, chunksize)
+    aggregate = WorldTensionAggregate() if column == "WT Data" else LogAggregate(buffer.shape[1:])
+    for chunk in iter_csv_chunks(input_file, columns=[column], chunksize=chunksize):
+        if column not in chunk.columns:
+            continue
+        series = chunk[column] if mask is None else chunk[column][mask[chunk.index.to_numpy()]]
+        fold_log_series(aggregate, series, column, buffer)
+    return aggregate
+
+
+def fold_log_series(aggregate: LogAggregate, series, column: str, buffer):
+    """Validates and decodes a chunk of raw log cells into the buffer and updates the aggregate. Empty and quarantined cells are skipped
+
+    Args:
+        aggregate (LogAggregate): aggregate to update
+        series (pd.Series): raw cells, at most as many as the buffer has rows
+        column (str): one of BLOB_COLUMNS
+        buffer (np.ndarray): buffer from create_log_buffer
+    """
+    aggregate.update(fill_log_array(get_valid_blobs(series, column), column, buffer))
+
+
+def extend_log_aggregate(aggregate: LogAggregate, input_file: str, previous: FileMark, column: str, chunksize: int = CHUNK_ROWS) -> LogAggregate:
+    """Folds only the appended rows into a copy of the aggregate. The copy depends on the timeline, not on the runs"""
+    tail = read_csv_tail(input_file, previous, columns=[column])
+    if column not in tail.columns or not len(tail):
+        return aggregate
+    aggregate = copy.deepcopy(aggregate)
+    buffer = create_log_buffer(column, chunksize)
+    for start in range(0, len(tail), chunksize):
+        fold_log_series(aggregate, tail[column].iloc[start:start + chunksize], column, buffer)
+    return aggregate
+
+
+@cached_per_append(extend_log_aggregate)
+def stream_log_aggregate(input_file: str, column: str, chunksize: int = CHUNK_ROWS) -> LogAggregate:
+    """Cached aggregate_log_column over all rows of the file, appended rows are folded into it"""
+    return aggregate_log_column(input_file, column, chunksize=chunksize)
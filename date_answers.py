@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import re
+import functools
+
+from lazy_modules import pd, np
+from data_loader import cached_per_file, cached_per_append, read_csv_file, load_csv_frame, read_appended_rows
+
+# Ordinal 0 is 1936, quarter 1
+FIRST_YEAR = 1936
+# Column is treated as a date question if at least this share of its distinct answers are dates
+DATE_COLUMN_SHARE = 0.5
+# Early/Mid/Late are mapped to the quarter holding the middle of that third of the year
+PART_OF_YEAR_QUARTERS = {"Early": 1, "Mid": 3, "Late": 4}
+
+# (regex, function building (year, quarter, label) from the match groups). Patterns are applied to distinct values only
+DATE_PATTERNS = (
+    (re.compile(r"^(\d{4})(?:\.0)?$"), lambda year: (int(year), 1, year)),                                                       # "1940", "1940.0" (numeric column)
+    (re.compile(r"^(\d{4}), quarter (\d)$"), lambda year, quarter: (int(year), int(quarter), f"{year}, quarter {quarter}")),     # "1939, quarter 2"
+    (re.compile(r"^Quarter (\d), (\d{4})$"), lambda quarter, year: (int(year), int(quarter), f"{year}, quarter {quarter}")),     # "Quarter 2, 1937"
+    (re.compile(r"^(Early|Mid|Late) (\d{4})$"), lambda part, year: (int(year), PART_OF_YEAR_QUARTERS[part], f"{part} {year}")),  # "Late 1940"
+    (re.compile(r"^Before (\d{4})$"), lambda year: (int(year) - 1, 4, f"Before {year}")),                                        # "Before 1938"
+    (re.compile(r"^(\d{4}) or (?:later|after)$"), lambda year: (int(year), 1, f"{year} or later")),                              # "1938 or later"
+    (re.compile(r"^(?:After|Past) (\d{4})$"), lambda year: (int(year) + 1, 1, f"After {year}")),                                 # "After 1945", "Past 1950"
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_date_value(value: str) -> tuple:
+    """Parses one distinct answer. Answers that are not dates ("Did not end", "Treaty of London") keep their label
+
+    Args:
+        value (str): answer
+
+    Returns:
+        tuple: (canonical label, quarters since 1936 Q1 or None)
+    """
+    for pattern, build in DATE_PATTERNS:
+        match = pattern.match(value)
+        if match:
+            year, quarter, label = build(*match.groups())
+            return label, (year - FIRST_YEAR) * 4 + quarter - 1
+    return value, None
+
+
+def parse_date_values(values) -> pd.DataFrame:
+    """Parses distinct date answers into canonical labels and quarter ordinals
+
+    Args:
+        values (iterable): distinct answers
+
+    Returns:
+        pd.DataFrame: "label" (str) and "ordinal" (Int16, quarters since 1936 Q1, missing for answers that are not dates) for every value, same order
+    """
+    parsed = [parse_date_value(str(value).strip()) for value in values]
+    return pd.DataFrame({
+        "label": pd.Series([label for label, ordinal in parsed], dtype="object"),
+        "ordinal": pd.array([ordinal for label, ordinal in parsed], dtype="Int16"),
+    })
+
+
+def normalize_date_series(series) -> pd.DataFrame:
+    """Maps answers of one date question to an ordered categorical sorted by the quarter ordinal.
+    Rows are factorized once, parsing is done on the distinct values only
+
+    Args:
+        series (pd.Series): raw answers
+
+    Returns:
+        pd.DataFrame: "label" (ordered categorical) and "ordinal" (Int16) with the index of the series
+    """
+    codes, uniques = pd.factorize(series)
+    parsed = parse_date_values(uniques)
+    # Different spellings of the same date share one category, categories are in chronological order
+    categories = parsed.drop_duplicates("label").sort_values(["ordinal", "label"], na_position="last")
+    # -1 is appended so that missing answers (code -1) stay missing
+    positions = np.append(pd.Index(categories["label"]).get_indexer(parsed["label"]), -1)
+    row_codes = positions[codes]
+    label = pd.Categorical.from_codes(row_codes, categories=categories["label"], ordered=True)
+    ordinal = categories["ordinal"].array.take(row_codes, allow_fill=True)
+    return pd.DataFrame({"label": label, "ordinal": ordinal}, index=series.index)
+
+
+def is_date_values(uniques) -> bool:
+    """Checks if most distinct answers of a column are dates
+
+    Args:
+        uniques (iterable): distinct raw answers
+
+    Returns:
+        bool: True for date questions
+    """
+    uniques = list(uniques)
+    if not uniques:
+        return False
+    return parse_date_values(uniques)["ordinal"].notna().mean() >= DATE_COLUMN_SHARE
+
+
+def append_date_series(answers: pd.DataFrame, series) -> pd.DataFrame:
+    """Adds appended answers of a date question to its normalized answers. New labels are sorted into the categories
+
+    Args:
+        answers (pd.DataFrame): normalize_date_series of the rows before
+        series (pd.Series): raw answers of the appended rows
+
+    Returns:
+        pd.DataFrame: "label" (ordered categorical) and "ordinal" (Int16) of all rows
+    """
+    tail = normalize_date_series(series)
+    categories = answers["label"].cat.categories
+    if not tail["label"].cat.categories.isin(categories).all():
+        # Canonical labels parse to themselves, so the categories are sorted like in normalize_date_series
+        labels = categories.union(tail["label"].cat.categories, sort=False)
+        parsed = parse_date_values(labels).drop_duplicates("label").sort_values(["ordinal", "label"], na_position="last")
+        categories = pd.Index(parsed["label"])
+        answers = answers.assign(label=answers["label"].cat.set_categories(categories))
+    return pd.concat([answers, tail.assign(label=tail["label"].cat.set_categories(categories))])
+
+
+class DateAnswers(dict):
+    """Normalized answers of every date question, column name -> pd.DataFrame with "label" and "ordinal" columns indexed by
+    row number. Also keeps the distinct raw answers of every column, so appended rows are classified without scanning the file
+
+    Args:
+        answers (dict): normalized answers of the date questions
+        uniques (dict): column name -> set of distinct raw answers, for every answer column
+    """
+
+    def __init__(self, answers: dict, uniques: dict):
+        super().__init__(answers)
+        self.uniques = uniques
+
+
+def extend_date_answers(date_answers: DateAnswers, input_file: str, previous) -> DateAnswers:
+    """Normalizes only the appended rows. A column whose appended answers change it from or to a date question is normalized again"""
+    tail = read_appended_rows(input_file, previous)
+    if not len(tail):
+        return date_answers
+    answers, uniques = {}, dict(date_answers.uniques)
+    for column in tail.columns[1:]:
+        new = set(tail[column].dropna().unique()) - uniques[column]
+        if new:
+            uniques[column] = uniques[column] | new
+        is_date = is_date_values(uniques[column]) if new else column in date_answers
+        if not is_date:
+            continue
+        if column in date_answers:
+            answers[column] = append_date_series(date_answers[column], tail[column])
+        else:
+            answers[column] = normalize_date_series(load_csv_frame(input_file)[column])
+    return DateAnswers(answers, uniques)
+
+
+@cached_per_append(extend_date_answers)
+def get_date_answers(input_file: str) -> DateAnswers:
+    """Normalizes every date question of the month file. Computed once per file and cached, appended rows are normalized on their own
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        DateAnswers: column name -> pd.DataFrame with "label" and "ordinal" columns, indexed by row number
+    """
+    csv_df = read_csv_file(input_file)
+    uniques = {column: set(csv_df[column].dropna().unique()) for column in csv_df.columns[1:]}
+    return DateAnswers({column: normalize_date_series(csv_df[column]) for column in csv_df.columns[1:] if is_date_values(uniques[column])}, uniques)
+
+
+def date_sort_key(series) -> pd.Series:
+    """Sort key for `sort_values(key=...)` - orders date labels chronologically, answers that are not dates go last
+
+    Args:
+        series (pd.Series): date labels
+
+    Returns:
+        pd.Series: float quarter ordinals, NaN for answers that are not dates
+    """
+    codes, uniques = pd.factorize(series)
+    ordinals = np.append(parse_date_values(uniques)["ordinal"].to_numpy(dtype="float64", na_value=np.nan), np.nan)
+    return pd.Series(ordinals[codes], index=series.index)
+
+
+# Mutually exclusive "when did X fall" questions of every Weltkrieg front: front -> {date column: side that lost}
+WELTKRIEG_FRONTS = {
+    "Germany-France": {
+        "If the Reichspakt lost the 2nd Weltkrieg, when did they fall?": "Reichspakt",
+        "If the Internationale lost the 2nd Weltkrieg, when did France fall?": "Internationale",
+    },
+    "Germany-Russia": {
+        "If the Reichspakt lost the 2nd Weltkrieg, when did they fall?": "Reichspakt",
+        "If Russia lost the 2nd Weltkrieg, when did they fall?": "Russia",
+    },
+    "Britain": {"If the Internationale lost the 2nd Weltkrieg, when did Britain fall?": "Britain"},
+    "Canada": {"If Canada was defeated, when did they fall?": "Canada"},
+    "National France": {"If National France was defeated, when did they fall?": "National France"},
+    "Austria": {"If Austria intervened in the Weltkrieg and lost, when did they fall?": "Austria"},
+}
+
+
+def coalesce_outcome_dates(input_file: str, columns: dict, no_outcome: str = "Did not end") -> pd.DataFrame:
+    """Merges mutually exclusive outcome date questions ("If X lost, when did they fall?") into one end date and loser per row.
+    Done in one vectorized pass over the cached date answers, the source data is not modified.
+    If a row (incorrectly) answers several of the questions, the first column wins
+
+    Args:
+        input_file (str): file name
+        columns (dict): date column -> side that lost if the column is answered, in priority order
+        no_outcome (str, optional): end label for rows with none of the columns answered
+
+    Returns:
+        pd.DataFrame: "End" (str label), "Ordinal" (Int16) and "Loser" (str or None) for every row. None if the file has none of the columns
+    """
+    date_answers = get_date_answers(input_file)
+    available = [column for column in columns if column in date_answers]
+    if not available:
+        return None
+    labels = np.column_stack([date_answers[column]["label"].astype(object).to_numpy() for column in available])
+    ordinals = np.column_stack([date_answers[column]["ordinal"].to_numpy(dtype="float64", na_value=np.nan) for column in available])
+    losers = np.array([columns[column] for column in available], dtype=object)
+
+    answered = pd.notna(labels)
+    first = answered.argmax(axis=1)
+    ended = answered.any(axis=1)
+    rows = np.arange(len(labels))
+    return pd.DataFrame({
+        "End": np.where(ended, labels[rows, first], no_outcome),
+        "Ordinal": pd.array(np.where(ended, ordinals[rows, first], np.nan), dtype="Int16"),
+        "Loser": np.where(ended, losers[first], None),
+    }, index=date_answers[available[0]].index)
+
+
+@cached_per_file
+def get_front_outcomes(input_file: str, front: str) -> pd.DataFrame:
+    """Cached coalesce_outcome_dates for one of WELTKRIEG_FRONTS
+
+    Args:
+        input_file (str): file name
+        front (str): key of WELTKRIEG_FRONTS
+
+    Returns:
+        pd.DataFrame: "End", "Ordinal" and "Loser" columns or None
+    """
+    return coalesce_outcome_dates(input_file, WELTKRIEG_FRONTS[front])
@@ -0,0 +1,45 @@
+// Dropdowns of the static export. Every figure of every dropdown combination is a precomputed JSON file listed in manifest.json,
+// a change of a dropdown loads the files of the new combination - no server code runs (see static_export.py)
+(function () {
+    function getValue(id) {
+        var select = document.getElementById(id);
+        return select ? select.value : null;
+    }
+
+    function showFigure(element, file) {
+        if (!file) {
+            Plotly.purge(element);
+            element.textContent = "No figure for this selection";
+            return;
+        }
+        fetch(file).then(function (response) {
+            return response.json();
+        }).then(function (figure) {
+            element.textContent = "";
+            Plotly.react(element, figure.data, figure.layout);
+        });
+    }
+
+    function connect(callback) {
+        function update() {
+            // Same key format as static_export.get_figure_key - JSON list of the input values
+            var files = callback.figures[JSON.stringify(callback.inputs.map(getValue))];
+            callback.outputs.forEach(function (output, i) {
+                showFigure(document.getElementById(output), files ? files[i] : null);
+            });
+        }
+        callback.inputs.forEach(function (id) {
+            var select = document.getElementById(id);
+            if (select) {
+                select.addEventListener("change", update);
+            }
+        });
+        update();
+    }
+
+    fetch("manifest.json").then(function (response) {
+        return response.json();
+    }).then(function (manifest) {
+        manifest.callbacks.forEach(connect);
+    });
+})();
@@ -0,0 +1,170 @@
+"""Figure factory for the line graphs with one trace per run.
+Building these graphs with px.line, add_scatter and update_traces validates every property of every trace on every call, which takes
+longer than reading the data for files with hundreds of runs. The factory assembles the same figure as a plain dict: traces are dicts of
+precomputed arrays, the layout is cloned from a prebuilt skeleton and the dark theme is the "kr_dark" template - plotly's default template
+with the dashboard colours, registered in plotly.io.templates. Dash serializes the dict without validating it.
+Usage: python figure_factory.py [file] - build time of every factory figure, next to the time plotly takes to validate the same figure
+"""
+from __future__ import annotations
+
+import sys
+import time
+import functools
+
+colors = { "background": "#1b1b1b", "text": "#abb6c5", "grid": "#abb6c5"}
+line_widths = {"plot_line": 3, "grid_xaxis": 0.5, "grid_yaxis": 0.5}
+
+THEME_NAME = "kr_dark"
+# px.line colours its first trace with the first colour of the template colorway
+BASE_LINE_COLOR = "#636efa"
+
+# Layout px.line builds for a single x/y plot. The skeletons are never changed, build_layout clones them
+PLOT_LAYOUT = {
+    "xaxis": {"anchor": "y", "domain": [0.0, 1.0]},
+    "yaxis": {"anchor": "x", "domain": [0.0, 1.0]},
+    "legend": {"tracegroupgap": 0},
+}
+LINE_LAYOUT = {
+    "xaxis": dict(PLOT_LAYOUT["xaxis"], showgrid=True, gridwidth=line_widths["grid_xaxis"], gridcolor=colors["grid"]),
+    "yaxis": dict(PLOT_LAYOUT["yaxis"], showgrid=True, gridwidth=line_widths["grid_yaxis"], gridcolor=colors["grid"]),
+    "legend": PLOT_LAYOUT["legend"],
+    # px.line sets a top margin when it is called without a title, the titles of these graphs are added afterwards
+    "margin": {"t": 60},
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_theme() -> dict:
+    """The dark theme as a template dict, registered as THEME_NAME on first use so px figures can use it too
+
+    Returns:
+        dict: template with "data" and "layout", shared by every figure - must not be mutated
+    """
+    import plotly.io as pio
+
+    template = pio.templates["plotly"].to_plotly_json()
+    template["layout"].update(
+        plot_bgcolor=colors["background"],
+        paper_bgcolor=colors["background"],
+        font=dict(template["layout"].get("font", {}), color=colors["text"]),
+    )
+    pio.templates[THEME_NAME] = template
+    return template
+
+
+def build_layout(skeleton: dict, title: str = None, x_title: str = None, y_title: str = None, legend_title: str = None) -> dict:
+    """Clones a layout skeleton and adds the titles of one figure
+
+    Args:
+        skeleton (dict): PLOT_LAYOUT or LINE_LAYOUT
+        title (str, optional): figure title
+        x_title (str, optional): x axis title
+        y_title (str, optional): y axis title
+        legend_title (str, optional): legend title
+
+    Returns:
+        dict: layout with the theme template
+    """
+    # Titles go one level deep, so the nested dicts of the skeleton are copied and its lists are shared
+    layout = {key: dict(value) for key, value in skeleton.items()}
+    layout["template"] = get_theme()
+    if title is not None:
+        layout["title"] = {"text": title}
+    if x_title is not None:
+        layout["xaxis"]["title"] = {"text": x_title}
+    if y_title is not None:
+        layout["yaxis"]["title"] = {"text": y_title}
+    if legend_title is not None:
+        layout["legend"]["title"] = {"text": legend_title}
+    return layout
+
+
+def base_trace(x_title: str, y_title: str, x=(), y=(), line: dict = None) -> dict:
+    """The trace px.line adds for its data frame, also when it is empty. It takes the first colour of the colorway,
+    so the traces after it get the same default colours as in the px figure
+
+    Args:
+        x_title (str): x axis title shown in the hover
+        y_title (str): y axis title shown in the hover
+        x (list, optional): x values
+        y (list, optional): y values
+        line (dict, optional): extra line properties, e.g. width
+
+    Returns:
+        dict: scatter trace
+    """
+    return {
+        "type": "scatter",
+        "mode": "lines",
+        "x": x,
+        "y": y,
+        "xaxis": "x",
+        "yaxis": "y",
+        "name": "",
+        "legendgroup": "",
+        "showlegend": False,
+        "orientation": "v",
+        "hovertemplate": f"{x_title}=%{{x}}<br>{y_title}=%{{y}}<extra></extra>",
+        "line": {"color": BASE_LINE_COLOR, "dash": "solid", **(line or {})},
+        "marker": {"symbol": "circle"},
+    }
+
+
+def line_trace(x, y, **properties) -> dict:
+    """Scatter trace like fig.add_scatter. The mode is left to plotly.js - lines and markers below 20 points, lines above
+
+    Args:
+        x (list): x values
+        y (list): y values
+        **properties: other trace properties, e.g. name, line, marker
+
+    Returns:
+        dict: scatter trace
+    """
+    return {"type": "scatter", "x": x, "y": y, **properties}
+
+
+def build_figure(data: list, layout: dict) -> dict:
+    """Figure dict Dash can return from a callback
+
+    Args:
+        data (list): trace dicts
+        layout (dict): layout from build_layout
+
+    Returns:
+        dict: figure
+    """
+    return {"data": data, "layout": layout}
+
+
+def main():
+    import plotly.graph_objects as go
+    import app
+    from data_loader import list_month_files, get_file_columns
+
+    input_files = sys.argv[1:] or [input_file for input_file in list_month_files() if "WT Data" in get_file_columns(input_file)]
+    figures = {
+        "World tension": lambda input_file: app.create_world_tension_graph(input_file, None),
+        "World tension summary": lambda input_file: app.create_world_tension_summary_graph(input_file, None),
+        "Industry": lambda input_file: app.create_industry_graph(input_file, "Civilian Factories", None),
+        "Industry summary": lambda input_file: app.create_industry_summary_graph(input_file, 1, app.tag_colors, None),
+        "No data": lambda input_file: app.generate_mock_graph(),
+    }
+    print("| File | Figure | Traces | Build (ms) | Validation skipped (ms) |")
+    print("|---|---|---|---|---|")
+    for input_file in input_files:
+        for name, build in figures.items():
+            # First call reads the file, the timed calls only build the figure
+            figure = build(input_file)
+            start = time.perf_counter()
+            for _ in range(3):
+                build(input_file)
+            built = (time.perf_counter() - start) / 3
+            start = time.perf_counter()
+            go.Figure(figure)
+            validated = time.perf_counter() - start
+            print(f"| {input_file} | {name} | {len(figure['data'])} | {built * 1000:.1f} | {validated * 1000:.1f} |")
+
+
+if __name__ == "__main__":
+    main()
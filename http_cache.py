@@ -0,0 +1,123 @@
+"""HTTP caching of the dashboard responses.
+A callback response only depends on its request body (callback id and input values), the month files and the code, so its ETag is
+derived from those before the callback runs. A conditional request with a matching If-None-Match gets a 304 without running the callback.
+Browsers never revalidate POST requests on their own - assets/etag_fetch.js keeps the last response of every callback and sends its ETag.
+Layout and dependencies get content ETags, fingerprinted assets are cached as immutable. Hit ratios are printed every HIT_LOG_INTERVAL responses
+"""
+from __future__ import annotations
+
+import sys
+import hashlib
+import collections
+
+import flask
+
+from data_loader import list_month_files, get_file_hash
+from result_store import get_code_version
+
+UPDATE_PATH = "/_dash-update-component"
+# GET endpoints revalidated with content ETags
+VALIDATED_PATHS = ("/_dash-layout", "/_dash-dependencies")
+ASSETS_PATH = "/assets/"
+# Dash adds the modification time to asset urls (?m=...), a changed asset gets a new url
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+HIT_LOG_INTERVAL = 100
+
+# (endpoint, "hits" | "misses") -> conditional responses of this worker
+responses = collections.Counter()
+
+
+def get_catalogue_hash() -> str:
+    """Hash of the content of every month file. Content hashes are cached per file signature, so this is one stat per file
+
+    Returns:
+        str: hex digest
+    """
+    digest = hashlib.sha256()
+    for input_file in list_month_files():
+        digest.update(f"{input_file}:{get_file_hash(input_file)};".encode())
+    return digest.hexdigest()
+
+
+def get_update_etag(body: bytes) -> str:
+    """ETag of a callback response. Any change of the code or of a month file changes every ETag
+
+    Args:
+        body (bytes): request body with the callback id and its input and state values
+
+    Returns:
+        str: ETag value without quotes
+    """
+    digest = hashlib.sha256(f"{get_code_version()}:{get_catalogue_hash()}:".encode())
+    digest.update(body)
+    return digest.hexdigest()[:32]
+
+
+def count_response(endpoint: str, hit: bool):
+    """Counts a validated response and prints the hit ratios every HIT_LOG_INTERVAL responses
+
+    Args:
+        endpoint (str): request path
+        hit (bool): True if the response was a 304
+    """
+    responses[endpoint, "hits" if hit else "misses"] += 1
+    if sum(responses.values()) % HIT_LOG_INTERVAL == 0:
+        ratios = []
+        for path in sorted({path for path, _ in responses}):
+            hits, misses = responses[path, "hits"], responses[path, "misses"]
+            ratios.append(f"{path} {hits}/{hits + misses} ({hits / (hits + misses):.0%})")
+        print(f"HTTP cache hits: {', '.join(ratios)}", file=sys.stderr, flush=True)
+
+
+def check_update_etag():
+    """before_request hook. Answers a callback request with 304 if the client already has the response"""
+    request = flask.request
+    if request.method != "POST" or request.path != UPDATE_PATH:
+        return None
+    etag = get_update_etag(request.get_data())
+    flask.g.update_etag = etag
+    hit = etag in request.if_none_match
+    count_response(request.path, hit)
+    if hit:
+        response = flask.Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def add_validators(response):
+    """after_request hook. Adds ETags and Cache-Control to callback, layout and asset responses
+
+    Args:
+        response (flask.Response): response of the view
+
+    Returns:
+        flask.Response: response with validators, 304 if a revalidated GET is not modified
+    """
+    request = flask.request
+    etag = flask.g.pop("update_etag", None)
+    if etag is not None and response.status_code == 200:
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+    elif request.method == "GET" and request.path in VALIDATED_PATHS and response.status_code == 200:
+        response.add_etag()
+        response.headers["Cache-Control"] = "no-cache"
+        response = response.make_conditional(request)
+        count_response(request.path, response.status_code == 304)
+    elif request.path.startswith(ASSETS_PATH) and "m" in request.args and response.status_code in (200, 304):
+        # Flask sends static files with no-cache
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
+def register_http_cache(server: flask.Flask):
+    """Installs the hooks on the Flask server of the dashboard
+
+    Args:
+        server (flask.Flask): server
+    """
+    server.before_request(check_update_etag)
+    server.after_request(add_validators)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import warnings
+
+from lazy_modules import pd, np
+from data_loader import cached_per_file, cached_per_append, read_blob_tail, get_valid_blobs, iter_log_column, get_file_columns, create_log_buffer, fill_tag_array, TIMELINE, LOG_TAGS
+from result_store import stored_per_file
+
+# Values of an industry entry "TAG;civilian;military;dockyards"
+INDUSTRY_VALUES = ("Civilian Factories", "Military Factories", "Dockyards")
+# First value of a divisions entry is the number of divisions
+DIVISIONS_VALUE = 0
+# Industry and divisions are logged every quarter
+LOGS_PER_YEAR = 4
+INDUSTRY_METRICS = ("Factories", "Growth per quarter", "Share of total industry", "Rank", "Divisions per military factory")
+
+
+def decode_log_tensor(series, column: str) -> tuple:
+    """Row numbers and tensor of valid raw log cells"""
+    return series.index.to_numpy(), fill_tag_array(series, column, create_log_buffer(column, len(series)))
+
+
+def extend_log_tensor(tensor: tuple, input_file: str, previous, column: str) -> tuple:
+    """Decodes only the runs appended to the month file and stacks them under the cached tensor"""
+    if tensor is None:
+        return None
+    series = read_blob_tail(input_file, previous, column)
+    if not len(series):
+        return tensor
+    return tuple(np.concatenate(parts) for parts in zip(tensor, decode_log_tensor(series, column)))
+
+
+@cached_per_append(extend_log_tensor)
+def get_log_tensor(input_file: str, column: str) -> tuple:
+    """Industry or divisions logs of every valid run decoded into one tensor, once per file. Quarantined rows are left out,
+    appended runs are decoded on their own
+
+    Args:
+        input_file (str): file name
+        column (str): "Industry Data" or "Divisions Data"
+
+    Returns:
+        tuple: row numbers (np.ndarray) and float32 (runs x TIMELINE x LOG_TAGS x LOG_VALUES) tensor, NaN where not logged.
+        None if the file has no such column
+    """
+    if column not in get_file_columns(input_file):
+        return None
+    # Large files are decoded chunk by chunk, only the float32 tensor is kept
+    tensors = [decode_log_tensor(get_valid_blobs(series, column), column) for series in iter_log_column(input_file, column)]
+    return tensors[0] if len(tensors) == 1 else tuple(np.concatenate(parts) for parts in zip(*tensors))
+
+
+class IndustryAnalytics:
+    """Industry and divisions metrics of every run, tag and logged quarter. Every metric is one NumPy expression over
+    the decoded tensors, computed once when the object is built. A tag that capitulated is NaN from then on
+
+    Args:
+        rows (np.ndarray): row numbers of the runs
+        timestamps (tuple): logged quarters
+        industry (np.ndarray): (runs x timestamps x LOG_TAGS x INDUSTRY_VALUES) factories
+        divisions (np.ndarray): (runs x timestamps x LOG_TAGS) divisions, NaN if the file has no divisions logs
+    """
+
+    def __init__(self, rows, timestamps: tuple, industry, divisions):
+        self.rows = rows
+        self.timestamps = timestamps
+        self.industry = industry
+        self.divisions = divisions
+        # NaN stays NaN in the sum, so capitulated tags don't count as 0 factories
+        self.factories = industry.sum(axis=3)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.growth = np.concatenate([np.full_like(self.factories[:, :1], np.nan), self.factories[:, 1:] / self.factories[:, :-1] - 1], axis=1)
+            totals = np.nansum(self.factories, axis=2, keepdims=True)
+            self.share = np.where(totals > 0, self.factories / totals, np.nan)
+            military = industry[..., INDUSTRY_VALUES.index("Military Factories")]
+            self.divisions_per_factory = np.where(military > 0, divisions / military, np.nan)
+        # Rank 1 is the tag with the most factories in that quarter of that run
+        order = np.argsort(-np.nan_to_num(self.factories, nan=-np.inf), axis=2, kind="stable")
+        rank = np.empty_like(self.factories)
+        np.put_along_axis(rank, order, np.arange(1, len(LOG_TAGS) + 1, dtype=rank.dtype), axis=2)
+        self.rank = np.where(np.isnan(self.factories), np.nan, rank)
+
+    def get_metric(self, metric: str):
+        """(runs x timestamps x LOG_TAGS) values of one of INDUSTRY_METRICS"""
+        return {
+            "Factories": self.factories,
+            "Growth per quarter": self.growth,
+            "Share of total industry": self.share,
+            "Rank": self.rank,
+            "Divisions per military factory": self.divisions_per_factory,
+        }[metric]
+
+    def select(self, mask=None) -> np.ndarray:
+        """Positions of the runs that match a bool mask over all rows of the file, all runs if None"""
+        return np.arange(len(self.rows)) if mask is None else np.flatnonzero(mask[self.rows])
+
+    def get_timeline(self, metric: str, mask=None) -> pd.DataFrame:
+        """Mean of the metric over the selected runs
+
+        Args:
+            metric (str): one of INDUSTRY_METRICS
+            mask (np.ndarray, optional): bool mask over all rows of the file
+
+        Returns:
+            pd.DataFrame: (timestamps x LOG_TAGS) means, NaN where no selected run has the tag
+        """
+        values = self.get_metric(metric)[self.select(mask)]
+        with warnings.catch_warnings():
+            # Mean of a tag that no selected run has is NaN
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            return pd.DataFrame(np.nanmean(values, axis=0), index=list(self.timestamps), columns=list(LOG_TAGS))
+
+    def get_leaderboard(self, mask=None) -> pd.DataFrame:
+        """Per-tag summary of the selected runs. "End" is the last logged quarter of every run
+
+        Args:
+            mask (np.ndarray, optional): bool mask over all rows of the file
+
+        Returns:
+            pd.DataFrame: "Factories at start", "Factories at end", "Yearly growth", "Share at end", "Average rank", "Top rank"
+            (share of runs that ended with the tag ranked first), "Survived" (share of runs in which the tag was still logged at the end)
+            and "Divisions per military factory" indexed by tag, most factories at the end first
+        """
+        positions = self.select(mask)
+        factories = self.factories[positions]
+        runs = np.arange(len(positions))
+        logged = ~np.isnan(factories).all(axis=2)
+        end = logged.shape[1] - 1 - logged[:, ::-1].argmax(axis=1)
+        # First and last quarter in which every tag was logged, for the growth of tags that capitulated along the way
+        valid = ~np.isnan(factories)
+        first = valid.argmax(axis=1)
+        last = valid.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+        start_value = np.take_along_axis(factories, first[:, None, :], axis=1)[:, 0]
+        last_value = np.take_along_axis(factories, last[:, None, :], axis=1)[:, 0]
+        with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            years = (last - first) / LOGS_PER_YEAR
+            growth = np.where((years > 0) & (start_value > 0), (last_value / start_value) ** (1 / years) - 1, np.nan)
+            end_rank = self.rank[positions][runs, end]
+            leaderboard = pd.DataFrame({
+                "Factories at start": np.nanmean(factories[:, 0], axis=0),
+                "Factories at end": np.nanmean(factories[runs, end], axis=0),
+                "Yearly growth": np.nanmean(growth, axis=0),
+                "Share at end": np.nanmean(self.share[positions][runs, end], axis=0),
+                "Average rank": np.nanmean(self.rank[positions], axis=(0, 1)),
+                "Top rank": (end_rank == 1).mean(axis=0),
+                "Survived": (~np.isnan(end_rank)).mean(axis=0),
+                "Divisions per military factory": np.nanmean(self.divisions_per_factory[positions], axis=(0, 1)),
+            }, index=pd.Index(LOG_TAGS, name="Tag"))
+        return leaderboard.sort_values("Factories at end", ascending=False)
+
+
+@cached_per_file
+@stored_per_file
+def get_industry_analytics(input_file: str) -> IndustryAnalytics:
+    """Industry analytics of the month file, built once from the decoded tensors and cached
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        IndustryAnalytics: metrics over the quarters with industry logs, None if the file has no industry logs
+    """
+    industry = get_log_tensor(input_file, "Industry Data")
+    if industry is None or not len(industry[0]):
+        return None
+    rows, tensor = industry
+    logged = ~np.isnan(tensor).all(axis=(0, 2, 3))
+    divisions = np.full(tensor.shape[:3], np.nan, dtype=tensor.dtype)
+    divisions_log = get_log_tensor(input_file, "Divisions Data")
+    if divisions_log is not None:
+        # Runs are matched by row number, runs without a valid divisions log stay NaN
+        positions = pd.Index(divisions_log[0]).get_indexer(rows)
+        found = positions >= 0
+        divisions[found] = divisions_log[1][positions[found], ..., DIVISIONS_VALUE]
+    timestamps = tuple(timestamp for timestamp, keep in zip(TIMELINE, logged) if keep)
+    return IndustryAnalytics(rows, timestamps, tensor[:, logged], divisions[:, logged])
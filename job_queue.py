@@ -0,0 +1,371 @@
+"""Background job queue for analyses over all month files.
+Scans over every file in /input and /backup take longer than a web request may, so callbacks only submit them here and poll their progress.
+Jobs are rows of a local SQLite database, worker processes (python job_queue.py worker) are started on demand and exit when the queue
+stays empty. A job is identified by its name, arguments, code version and the content of every month file - submitting a job that
+is already queued, running or done returns that job, a done job whose result is gone runs again. Results are saved in the result store, where every dashboard worker can read them.
+Usage: python job_queue.py [worker] - prints the jobs, or runs a worker
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import subprocess
+
+from lazy_modules import pd, np
+from data_loader import list_month_files
+from significance import load_catalogue_counts, compare_months, SIGNIFICANCE_LEVEL
+from associations import get_association_matrix
+from bitmap_index import get_bitmap_index
+from uncertainty import get_answer_intervals, bootstrap_count_intervals
+from result_store import get_code_version, read_result, save_result
+from http_cache import get_catalogue_hash
+
+QUEUE_PATH = os.environ.get("JOB_QUEUE_PATH", os.path.join(os.path.dirname(__file__), "job-queue.sqlite3"))
+BUSY_TIMEOUT = 30
+# Worker processes started by a dashboard worker that submits a job
+WORKERS = 2
+# Seconds between queue polls of an idle worker, and until it exits
+POLL_INTERVAL = 0.5
+WORKER_IDLE = 60
+# A worker without a heartbeat for this long is dead, its running job is queued again
+WORKER_TIMEOUT = 120
+# Cramér's V from which a question pair counts as strongly associated
+STRONG_ASSOCIATION = 0.3
+# Width of a bootstrap share interval from which a question counts as uncertain
+WIDE_INTERVAL = 0.1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    args TEXT NOT NULL,
+    status TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    worker INTEGER,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    pid INTEGER PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+"""
+
+# Job name -> function(report, *args)
+jobs = {}
+# Connection of every thread, opened on first use
+connections = threading.local()
+# Worker processes started by this process, kept to reap them when they exit
+processes = []
+
+
+class JobCancelled(Exception):
+    """Raised by report() in the worker when the job was cancelled"""
+
+
+def job(name: str):
+    """Registers a job function. It is called as func(report, *args), report(done, total, message) updates the progress
+    and raises JobCancelled once the job is cancelled. The result must be picklable
+
+    Args:
+        name (str): job name shown in the dashboard
+    """
+    def register(func):
+        jobs[name] = func
+        return func
+    return register
+
+
+def get_connection() -> sqlite3.Connection:
+    """Connection of the current thread
+
+    Returns:
+        sqlite3.Connection: connection in autocommit mode
+    """
+    connection = getattr(connections, "connection", None)
+    if connection is None or connections.pid != os.getpid():
+        connection = sqlite3.connect(QUEUE_PATH, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        connections.connection, connections.pid = connection, os.getpid()
+    return connection
+
+
+def get_job_id(name: str, args: tuple) -> str:
+    """Id of a job. Jobs read every month file, so a new or changed file is a new job
+
+    Args:
+        name (str): job name
+        args (tuple): JSON serializable arguments
+
+    Returns:
+        str: hex digest, also the result store key of the result
+    """
+    call = json.dumps([name, args, get_code_version(), get_catalogue_hash()], sort_keys=True, default=str)
+    return hashlib.sha256(call.encode()).hexdigest()
+
+
+def submit_job(name: str, *args) -> str:
+    """Queues a job unless the same job is queued, running or done, and makes sure workers are running for a queued job
+
+    Args:
+        name (str): registered job name
+        *args: JSON serializable arguments of the job function
+
+    Returns:
+        str: job id
+    """
+    if name not in jobs:
+        raise KeyError(f"Unknown job {name}")
+    job_id = get_job_id(name, args)
+    now = time.time()
+    connection = get_connection()
+    # Failed and cancelled jobs are started again
+    connection.execute(
+        """INSERT INTO jobs (id, name, args, status, created, updated) VALUES (?, ?, ?, 'queued', ?, ?)
+        ON CONFLICT (id) DO UPDATE SET status = 'queued', done = 0, total = 0, message = '', worker = NULL, updated = excluded.updated
+        WHERE status IN ('failed', 'cancelled')""",
+        (job_id, name, json.dumps(args), now, now),
+    )
+    status = get_job(job_id)["status"]
+    if status == "done" and not read_result(job_id)[0]:
+        # The result is gone from the result store (deleted, unreadable), so the job is run again
+        connection.execute(
+            "UPDATE jobs SET status = 'queued', done = 0, total = 0, message = '', worker = NULL, updated = ? WHERE id = ? AND status = 'done'",
+            (now, job_id),
+        )
+        status = get_job(job_id)["status"]
+    if status == "queued":
+        ensure_workers()
+    return job_id
+
+
+def get_job(job_id: str) -> dict:
+    """Status and progress of a job
+
+    Args:
+        job_id (str): job id
+
+    Returns:
+        dict: "id", "name", "status", "done", "total" and "message", None for an unknown job
+    """
+    row = get_connection().execute("SELECT id, name, status, done, total, message FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+
+def get_job_result(job_id: str):
+    """Result of a finished job from the result store
+
+    Args:
+        job_id (str): job id
+
+    Returns:
+        object: result, None if the job is not done
+    """
+    return read_result(job_id)[1]
+
+
+def cancel_job(job_id: str):
+    """Cancels a job. A queued job never starts, a running job stops at its next progress report.
+    Identical submissions share the job, so it is cancelled for all of them
+
+    Args:
+        job_id (str): job id
+    """
+    get_connection().execute(
+        "UPDATE jobs SET status = CASE status WHEN 'queued' THEN 'cancelled' ELSE 'cancelling' END, updated = ? WHERE id = ? AND status IN ('queued', 'running')",
+        (time.time(), job_id),
+    )
+
+
+def ensure_workers():
+    """Starts worker processes until WORKERS of them are alive. Workers register in the same transaction, so concurrent callers
+    don't start more than WORKERS
+    """
+    processes[:] = [process for process in processes if process.poll() is None]
+    connection = get_connection()
+    now = time.time()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        connection.execute("DELETE FROM workers WHERE heartbeat < ?", (now - WORKER_TIMEOUT,))
+        alive = connection.execute("SELECT COUNT(*) FROM workers").fetchone()[0]
+        for _ in range(WORKERS - alive):
+            process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "worker"], cwd=os.path.dirname(os.path.abspath(__file__)), start_new_session=True)
+            processes.append(process)
+            connection.execute("INSERT OR REPLACE INTO workers (pid, heartbeat) VALUES (?, ?)", (process.pid, now))
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def claim_job() -> sqlite3.Row:
+    """Takes the oldest queued job. Jobs of dead workers are queued again first
+
+    Returns:
+        sqlite3.Row: job, None if the queue is empty
+    """
+    connection = get_connection()
+    now = time.time()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        connection.execute("UPDATE workers SET heartbeat = ? WHERE pid = ?", (now, os.getpid()))
+        dead = "worker NOT IN (SELECT pid FROM workers WHERE heartbeat >= ?)"
+        connection.execute(f"UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND {dead}", (now - WORKER_TIMEOUT,))
+        connection.execute(f"UPDATE jobs SET status = 'cancelled' WHERE status = 'cancelling' AND {dead}", (now - WORKER_TIMEOUT,))
+        row = connection.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+        if row is not None:
+            connection.execute("UPDATE jobs SET status = 'running', worker = ?, updated = ? WHERE id = ?", (os.getpid(), now, row["id"]))
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    return row
+
+
+def run_job(row: sqlite3.Row):
+    """Runs a claimed job and saves its result in the result store
+
+    Args:
+        row (sqlite3.Row): job from claim_job
+    """
+    connection = get_connection()
+    job_id = row["id"]
+
+    def report(done: int, total: int, message: str = ""):
+        now = time.time()
+        connection.execute("UPDATE workers SET heartbeat = ? WHERE pid = ?", (now, os.getpid()))
+        connection.execute("UPDATE jobs SET done = ?, total = ?, message = ?, updated = ? WHERE id = ?", (done, total, message, now, job_id))
+        if connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()[0] != "running":
+            raise JobCancelled(job_id)
+
+    try:
+        value = jobs[row["name"]](report, *json.loads(row["args"]))
+        # Workers run this module as __main__
+        save_result(f"job_queue.{row['name']}", job_id, value)
+        if not read_result(job_id)[0]:
+            # save_result ignores store errors, a job without a readable result is not done
+            raise RuntimeError("The result could not be saved in the result store")
+        connection.execute("UPDATE jobs SET status = 'done', updated = ? WHERE id = ?", (time.time(), job_id))
+    except JobCancelled:
+        connection.execute("UPDATE jobs SET status = 'cancelled', updated = ? WHERE id = ?", (time.time(), job_id))
+    except Exception as error:
+        connection.execute("UPDATE jobs SET status = 'failed', message = ?, updated = ? WHERE id = ?", (f"{type(error).__name__}: {error}", time.time(), job_id))
+
+
+def run_worker():
+    """Runs queued jobs until the queue was empty for WORKER_IDLE seconds"""
+    connection = get_connection()
+    connection.execute("INSERT OR REPLACE INTO workers (pid, heartbeat) VALUES (?, ?)", (os.getpid(), time.time()))
+    idle = time.monotonic()
+    try:
+        while time.monotonic() - idle < WORKER_IDLE:
+            row = claim_job()
+            if row is None:
+                time.sleep(POLL_INTERVAL)
+                continue
+            run_job(row)
+            idle = time.monotonic()
+    finally:
+        connection.execute("DELETE FROM workers WHERE pid = ?", (os.getpid(),))
+
+
+########
+# Jobs #
+########
+@job("Month over month scan")
+def scan_month_shifts(report) -> pd.DataFrame:
+    """Significance test of every pair of consecutive month files
+
+    Returns:
+        pd.DataFrame: "Months", "Shared questions" and "Shifted questions" of every pair
+    """
+    files = list_month_files()
+    report(0, len(files), "Building the answer cube")
+    load_catalogue_counts()
+    rows = []
+    for i, (baseline, compared) in enumerate(zip(files, files[1:])):
+        report(i + 1, len(files), f"Comparing {baseline} and {compared}")
+        result = compare_months(baseline, compared)
+        rows.append({
+            "Months": f"{os.path.splitext(baseline)[0]} -> {os.path.splitext(compared)[0]}",
+            "Shared questions": len(result),
+            "Shifted questions": int((result["Adjusted p-value"] < SIGNIFICANCE_LEVEL).sum()) if len(result) else 0,
+        })
+    report(len(files), len(files), "Done")
+    return pd.DataFrame(rows)
+
+
+@job("Association scan")
+def scan_associations(report) -> pd.DataFrame:
+    """Association matrix of every month file, reduced to the number of strongly associated question pairs
+
+    Returns:
+        pd.DataFrame: "Month", "Question pairs" and "Strong pairs" of every file
+    """
+    files = list_month_files()
+    rows = []
+    for i, input_file in enumerate(files):
+        report(i, len(files), f"Associations of {input_file}")
+        cramers_v = get_association_matrix(input_file).cramers_v
+        pairs = cramers_v[np.triu_indices(len(cramers_v), k=1)]
+        rows.append({
+            "Month": os.path.splitext(input_file)[0],
+            "Question pairs": len(pairs),
+            "Strong pairs": int((pairs >= STRONG_ASSOCIATION).sum()),
+        })
+    report(len(files), len(files), "Done")
+    return pd.DataFrame(rows)
+
+
+@job("Bootstrap intervals")
+def scan_bootstrap_intervals(report) -> pd.DataFrame:
+    """Bootstrap of the answer counts of every single-answer question of every month file,
+    reduced to the number of questions with an answer share interval wider than WIDE_INTERVAL
+
+    Returns:
+        pd.DataFrame: "Month", "Questions" and "Wide intervals" of every file
+    """
+    files = list_month_files()
+    rows = []
+    for i, input_file in enumerate(files):
+        report(i, len(files), f"Bootstrap of {input_file}")
+        counts = get_answer_intervals(input_file)["Count"]
+        multi_answer = get_bitmap_index(input_file).multi_answer
+        questions = [question for question in counts.index.unique("Question") if question not in multi_answer]
+        wide = 0
+        for question in questions:
+            table = counts.loc[question].to_frame().T
+            low, high = bootstrap_count_intervals(table)
+            total = table.to_numpy().sum()
+            wide += bool(total and ((high - low).to_numpy() / total).max() > WIDE_INTERVAL)
+        rows.append({
+            "Month": os.path.splitext(input_file)[0],
+            "Questions": len(questions),
+            "Wide intervals": wide,
+        })
+    report(len(files), len(files), "Done")
+    return pd.DataFrame(rows)
+
+
+def main():
+    if sys.argv[1:] == ["worker"]:
+        run_worker()
+        return
+    rows = get_connection().execute("SELECT name, status, done, total, message, created FROM jobs ORDER BY created DESC").fetchall()
+    print(f"## {QUEUE_PATH}")
+    print("| Job | Status | Progress | Message | Created |")
+    print("|---|---|---|---|---|")
+    for row in rows:
+        print(f"| {row['name']} | {row['status']} | {row['done']}/{row['total']} | {row['message']} | {time.strftime('%Y-%m-%d %H:%M', time.localtime(row['created']))} |")
+
+
+if __name__ == "__main__":
+    main()
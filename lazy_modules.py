@@ -0,0 +1,31 @@
+import importlib
+
+
+class LazyModule:
+    """Stand-in for a heavy module (pandas, plotly.express) that is imported on first attribute access.
+    Lets modules keep the usual `pd.` / `px.` call style without paying the import cost at startup
+
+    Args:
+        name (str): full module name, e.g. "plotly.express"
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
+px = LazyModule("plotly.express")
@@ -0,0 +1,351 @@
+"""Load test of the dashboard under gunicorn.
+Every configuration of CONFIGURATIONS starts `gunicorn app:server` on a free local port with an empty Flask cache and result store,
+then CLIENTS virtual users replay SESSIONS interaction sequences each: a page load (every initial callback, chained callbacks included),
+MONTH_SWITCHES month dropdown changes and TOGGLES changes of the other dropdowns (war configurations, fronts, metrics). Callbacks are built
+from /_dash-dependencies and /_dash-layout the way the browser builds them. Throughput, latency percentiles of _dash-update-component
+and the peak memory of the gunicorn processes are reported per configuration and saved to load-test-results/<label>.json.
+Usage: python load_test.py [label] - runs the sweep, python load_test.py compare <before label> <after label> - compares two saved runs
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+import http.client
+import importlib.util
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "load-test-results")
+UPDATE_PATH = "/_dash-update-component"
+# (worker class, workers, threads). gthread is what gunicorn uses for threads > 1
+CONFIGURATIONS = [
+    ("sync", 1, 1),
+    ("sync", 2, 1),
+    ("sync", 4, 1),
+    ("gthread", 2, 4),
+    ("gthread", 4, 4),
+    ("gevent", 4, 1),
+]
+CLIENTS = 8
+SESSIONS = 3
+MONTH_SWITCHES = 3
+TOGGLES = 3
+# Seconds to wait for gunicorn to answer after the start
+STARTUP_TIMEOUT = 60
+MEMORY_SAMPLE_INTERVAL = 0.25
+PERCENTILES = (50, 95, 99)
+SEED = 0
+
+
+def get_free_port() -> int:
+    """Port nothing listens on right now"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get_rss(pid: int) -> int:
+    """Resident memory of a process and all of its children in bytes, 0 if it is gone. Linux only
+
+    Args:
+        pid (int): process id
+
+    Returns:
+        int: bytes
+    """
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as file:
+                    # The process name can contain spaces, the parent pid is the second field after it
+                    children.setdefault(int(file.read().rsplit(")", 1)[1].split()[1]), []).append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as file:
+                total += next(int(line.split()[1]) * 1024 for line in file if line.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            continue
+        pending.extend(children.get(current, []))
+    return total
+
+
+def get_callback_outputs(output: str) -> list:
+    """"..a.figure...b.figure.." -> [{"id": "a", "property": "figure"}, {"id": "b", "property": "figure"}]"""
+    return [dict(zip(("id", "property"), item.rsplit(".", 1))) for item in output.strip(".").split("...")]
+
+
+def walk_layout(component):
+    """Props of every component of the /_dash-layout JSON that has an id"""
+    if isinstance(component, list):
+        for child in component:
+            yield from walk_layout(child)
+    elif isinstance(component, dict) and "props" in component:
+        if isinstance(component["props"].get("id"), str):
+            yield component["type"], component["props"]
+        yield from walk_layout(component["props"].get("children"))
+
+
+class Client:
+    """One virtual user with its own keep-alive connection and page state
+
+    Args:
+        port (int): gunicorn port
+        seed (int): random seed of the interaction sequence
+    """
+
+    def __init__(self, port: int, seed: int):
+        self.port = port
+        self.random = random.Random(seed)
+        self.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+        self.latencies = []
+        self.errors = 0
+
+    def request(self, method: str, path: str, body: dict = None) -> object:
+        """Sends a request, reconnecting once if a sync worker closed the connection
+
+        Returns:
+            object: decoded JSON response, None for other responses and errors
+        """
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        for attempt in range(2):
+            try:
+                start = time.perf_counter()
+                self.connection.request(method, path, body=data, headers=headers)
+                response = self.connection.getresponse()
+                payload = response.read()
+                elapsed = time.perf_counter() - start
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self.connection.close()
+                if attempt:
+                    self.errors += 1
+                    return None
+        if path == UPDATE_PATH:
+            self.latencies.append(elapsed)
+        if response.status != 200:
+            self.errors += response.status >= 400
+            return None
+        return json.loads(payload) if response.getheader("Content-Type", "").startswith("application/json") else None
+
+    def load_page(self):
+        """GETs the page, layout and dependencies and fires every initial callback like the browser"""
+        self.request("GET", "/")
+        layout = self.request("GET", "/_dash-layout")
+        # Pattern-matching callbacks (facet panel) need wildcard payloads, the facet filters stay empty
+        self.dependencies = [
+            dependency for dependency in self.request("GET", "/_dash-dependencies")
+            if "{" not in dependency["output"] and not any(item["id"].startswith("{") for item in dependency["inputs"] + dependency["state"])
+        ]
+        components = list(walk_layout(layout))
+        self.state = {(props["id"], prop): value for _, props in components for prop, value in props.items() if prop != "children" or isinstance(value, str)}
+        dropdowns = {props["id"]: props["options"] for component_type, props in components if component_type == "Dropdown" and props.get("options")}
+        get_value = lambda option: option["value"] if isinstance(option, dict) else option
+        self.month_dropdowns = {key: [get_value(option) for option in options] for key, options in dropdowns.items() if all(str(get_value(option)).endswith(".csv") for option in options)}
+        self.toggle_dropdowns = {key: [get_value(option) for option in options] for key, options in dropdowns.items() if key not in self.month_dropdowns and len(options) > 1}
+        self.fire([dependency for dependency in self.dependencies if not dependency["prevent_initial_call"]], [])
+
+    def fire(self, dependencies: list, changed: list):
+        """Calls the callbacks and then every callback whose input they changed, until nothing changes
+
+        Args:
+            dependencies (list): callbacks from /_dash-dependencies
+            changed (list): "id.property" that triggered them
+        """
+        while dependencies:
+            updated = {}
+            for dependency in dependencies:
+                outputs = get_callback_outputs(dependency["output"])
+                body = {
+                    "output": dependency["output"],
+                    "outputs": outputs if len(outputs) > 1 else outputs[0],
+                    "inputs": [dict(item, value=self.state.get((item["id"], item["property"]))) for item in dependency["inputs"]],
+                    "changedPropIds": changed,
+                    "state": [dict(item, value=self.state.get((item["id"], item["property"]))) for item in dependency["state"]],
+                }
+                response = self.request("POST", UPDATE_PATH, body)
+                for component, props in ((response or {}).get("response") or {}).items():
+                    for prop, value in props.items():
+                        # Figures are never inputs, they are not kept
+                        if prop != "figure" and self.state.get((component, prop)) != value:
+                            updated[component, prop] = value
+            self.state.update(updated)
+            changed = [f"{component}.{prop}" for component, prop in updated]
+            dependencies = [dependency for dependency in self.dependencies if any(f"{item['id']}.{item['property']}" in changed for item in dependency["inputs"])]
+
+    def change(self, component: str, value):
+        """Sets a dropdown value and fires the callbacks that depend on it"""
+        self.state[component, "value"] = value
+        changed = f"{component}.value"
+        self.fire([dependency for dependency in self.dependencies if any(f"{item['id']}.{item['property']}" == changed for item in dependency["inputs"])], [changed])
+
+    def run_session(self):
+        """Page load, month switches and toggles"""
+        self.load_page()
+        for _ in range(MONTH_SWITCHES):
+            if self.month_dropdowns:
+                component = self.random.choice(sorted(self.month_dropdowns))
+                self.change(component, self.random.choice(self.month_dropdowns[component]))
+        for _ in range(TOGGLES):
+            if self.toggle_dropdowns:
+                component = self.random.choice(sorted(self.toggle_dropdowns))
+                self.change(component, self.random.choice(self.toggle_dropdowns[component]))
+
+
+def start_server(worker_class: str, workers: int, threads: int, store_path: str) -> tuple:
+    """Starts gunicorn with an empty Flask cache and result store and waits until it answers
+
+    Returns:
+        tuple: gunicorn process and its port
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    shutil.rmtree(os.path.join(root, "cache-directory"), ignore_errors=True)
+    port = get_free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app:server", "--bind", f"127.0.0.1:{port}", "--chdir", root,
+         "--workers", str(workers), "--threads", str(threads), "--worker-class", worker_class, "--timeout", "300", "--log-level", "warning"],
+        env=dict(os.environ, RESULT_STORE_PATH=store_path, SINGLE_FLIGHT_LOCK_PATH=f"{store_path}.lock"),
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/")
+            connection.getresponse().read()
+            return process, port
+        except (ConnectionError, http.client.HTTPException, OSError):
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not answer within {STARTUP_TIMEOUT} s")
+
+
+def get_percentile(values: list, percentile: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(percentile / 100 * len(values) + 0.5)) - 1))] if values else None
+
+
+def run_configuration(worker_class: str, workers: int, threads: int) -> dict:
+    """Load test of one gunicorn configuration
+
+    Returns:
+        dict: configuration, "Requests", "Errors", "Throughput (req/s)", latency percentiles in ms, "Peak memory (MB)"
+        and "First page load (s)" - a single page load on the cold caches before the clients start
+    """
+    store_folder = tempfile.mkdtemp(prefix="load-test-")
+    process, port = start_server(worker_class, workers, threads, os.path.join(store_folder, "result-store.sqlite3"))
+    peak_memory, sampling = [get_rss(process.pid)], threading.Event()
+
+    def sample_memory():
+        while not sampling.wait(MEMORY_SAMPLE_INTERVAL):
+            peak_memory.append(max(peak_memory[-1], get_rss(process.pid)))
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    try:
+        start = time.perf_counter()
+        Client(port, SEED).load_page()
+        first_load = time.perf_counter() - start
+
+        clients = [Client(port, SEED + i + 1) for i in range(CLIENTS)]
+        sessions = [threading.Thread(target=lambda client=client: [client.run_session() for _ in range(SESSIONS)]) for client in clients]
+        start = time.perf_counter()
+        for thread in sessions:
+            thread.start()
+        for thread in sessions:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        sampling.set()
+        sampler.join()
+        process.terminate()
+        process.wait()
+        shutil.rmtree(store_folder, ignore_errors=True)
+
+    latencies = [latency for client in clients for latency in client.latencies]
+    result = {
+        "Configuration": f"{worker_class} {workers}x{threads}",
+        "Worker class": worker_class,
+        "Workers": workers,
+        "Threads": threads,
+        "Requests": len(latencies),
+        "Errors": sum(client.errors for client in clients),
+        "Throughput (req/s)": round(len(latencies) / elapsed, 1),
+    }
+    for percentile in PERCENTILES:
+        result[f"p{percentile} (ms)"] = round(get_percentile(latencies, percentile) * 1000, 1) if latencies else None
+    result["Peak memory (MB)"] = round(max(peak_memory) / 1024 ** 2, 1)
+    result["First page load (s)"] = round(first_load, 2)
+    return result
+
+
+def print_results(results: list):
+    columns = ["Configuration", "Requests", "Errors", "Throughput (req/s)"] + [f"p{percentile} (ms)" for percentile in PERCENTILES] + ["Peak memory (MB)", "First page load (s)"]
+    print(f"| {' | '.join(columns)} |")
+    print(f"|{'---|' * len(columns)}")
+    for result in results:
+        print(f"| {' | '.join(str(result[column]) for column in columns)} |")
+
+
+def run_sweep(label: str) -> list:
+    """Runs every configuration whose worker class is installed and saves the results
+
+    Args:
+        label (str): name of the results file, e.g. "before" or a commit id
+
+    Returns:
+        list: run_configuration results
+    """
+    results = []
+    for worker_class, workers, threads in CONFIGURATIONS:
+        if worker_class in ("gevent", "eventlet") and importlib.util.find_spec(worker_class) is None:
+            print(f"- *{worker_class}* is not installed, skipped", file=sys.stderr)
+            continue
+        results.append(run_configuration(worker_class, workers, threads))
+        print(f"- *{results[-1]['Configuration']}*: {results[-1]['Throughput (req/s)']} req/s", file=sys.stderr)
+    os.makedirs(RESULTS_FOLDER, exist_ok=True)
+    with open(os.path.join(RESULTS_FOLDER, f"{label}.json"), "w", encoding="UTF-8") as file:
+        json.dump({"Label": label, "Created": time.strftime("%Y-%m-%d %H:%M"), "Clients": CLIENTS, "Sessions": SESSIONS, "Results": results}, file, indent=2)
+    return results
+
+
+def load_results(label: str) -> dict:
+    with open(os.path.join(RESULTS_FOLDER, f"{label}.json"), encoding="UTF-8") as file:
+        return {result["Configuration"]: result for result in json.load(file)["Results"]}
+
+
+def compare_results(before: str, after: str):
+    """Prints the change of throughput, p95 and memory between two saved runs for every configuration they share"""
+    results_before, results_after = load_results(before), load_results(after)
+    print(f"## {before} -> {after}")
+    print("| Configuration | Throughput (req/s) | p95 (ms) | Peak memory (MB) |")
+    print("|---|---|---|---|")
+    for configuration in (configuration for configuration in results_after if configuration in results_before):
+        a, b = results_before[configuration], results_after[configuration]
+        cells = [f"{a[column]} -> {b[column]} ({(b[column] - a[column]) / a[column]:+.0%})" if a[column] else f"{a[column]} -> {b[column]}" for column in ("Throughput (req/s)", "p95 (ms)", "Peak memory (MB)")]
+        print(f"| {configuration} | {' | '.join(cells)} |")
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "compare":
+        compare_results(sys.argv[2], sys.argv[3])
+        return
+    label = sys.argv[1] if len(sys.argv) > 1 else time.strftime("%Y%m%d-%H%M%S")
+    results = run_sweep(label)
+    print(f"## Load test {label} - {CLIENTS} clients x {SESSIONS} sessions")
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 import os
 import glob
-import pandas as pd
-from collections import Counter
+
+from data_loader import list_month_files, read_csv_file as read_month_file
+from vocabulary import find_unmapped_values
+from cube import get_answer_counts
 
 questions_list = [
     '## Europe',
@@ -17,39 +19,41 @@ questions_list = [
     'Who was the victor of the League War?',
     'How far did Japan push into China (if they attacked)?',
     'Who controls most of the Indian subcontinent?',
+    '## Africa and Middle East',
+    'What tags revolted from National France over the course of the game? Check all that apply',
+    'Which tags revolted against the Ottomans during the course of the game? Check all that apply.',
 ]
 
 
-def read_csv_file() -> pd.DataFrame:
+def get_input_file() -> str:
     dirname = os.path.dirname(__file__)
     filepath = os.path.join(dirname, "input//")
     for filename in glob.iglob(filepath + '**/*.csv', recursive=True):
         print(filename)
-        return pd.read_csv(filename)
+        return os.path.basename(filename)
 
 
-def extract_question_data(question_name: str, df: pd.DataFrame):
-    # Convert dataframe to series that includes answers to only one question
-    series = df[question_name]
-    # Convert series to list
-    data_list = series.tolist()
-    # Dict with counted values
-    data_dict = dict(Counter(data_list))
-    sorted_dict = dict(sorted(data_dict.items(), key=lambda x:x[1], reverse=True))
-    return sorted_dict
-        
+def extract_question_data(question_name: str, input_file: str):
+    # Counts are a slice of the month's answer cube, "check all that apply" answers ("NGR;CHA") are counted per tag, not per combination
+    return get_answer_counts(input_file, question_name).to_dict()
 
 
 def main():
-    csv_df = read_csv_file()
+    input_file = get_input_file()
     for q in questions_list:
         ## Is header
         if "##" in q:
             print(q)
         ## Is a normal question
         else:
-            dict_as_str = str(extract_question_data(q, csv_df))[1:-1].replace("'", "")
+            dict_as_str = str(extract_question_data(q, input_file))[1:-1].replace("'", "")
             print(f'- *{q}*\n{dict_as_str}')
+    # Answers that are neither in the vocabulary nor aliased - new answers or spellings to add to vocabulary.py
+    print('## Unmapped answers')
+    for input_file in list_month_files():
+        unmapped = find_unmapped_values(read_month_file(input_file))
+        for _, row in unmapped.iterrows():
+            print(f'- {os.path.splitext(input_file)[0]}: *{row["Question"]}* {row["Answer"]} ({row["Runs"]} runs)')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from lazy_modules import pd, np
+from data_loader import cached_per_append, read_csv_file, load_csv_frame, read_appended_rows
+
+# "Check all that apply" answers are stored as one string joined with this separator, e.g. "NGR;CHA"
+MULTI_ANSWER_SEPARATOR = ";"
+# Column is treated as multi-answer if its title says so or at least this share of its answers contain the separator
+MULTI_ANSWER_SHARE = 0.2
+MULTI_ANSWER_MARKER = "check all that apply"
+
+
+def count_separated(series) -> tuple:
+    """Number of answers of the column and of answers that contain the separator
+
+    Args:
+        series (pd.Series): raw answers
+
+    Returns:
+        tuple: (answers, separated answers)
+    """
+    answers = series.dropna()
+    if answers.dtype != object:
+        return len(answers), 0
+    return len(answers), int(answers.astype(str).str.contains(MULTI_ANSWER_SEPARATOR, regex=False).sum())
+
+
+def is_multi_answer_column(column: str, counts: tuple) -> bool:
+    """Detects "check all that apply" questions
+
+    Args:
+        column (str): question
+        counts (tuple): count_separated of its answers
+
+    Returns:
+        bool: True if answers are separator-joined lists
+    """
+    if MULTI_ANSWER_MARKER in str(column).lower():
+        return True
+    answers, separated = counts
+    return bool(answers) and separated / answers >= MULTI_ANSWER_SHARE
+
+
+def explode_multi_answers(series) -> pd.DataFrame:
+    """Explodes separator-joined answers into a multi-hot matrix in one vectorized pass
+
+    Args:
+        series (pd.Series): raw answers
+
+    Returns:
+        pd.DataFrame: bool (rows x tags) matrix with the index of the series, unanswered rows are all False
+    """
+    multi_hot = series.str.strip().str.get_dummies(sep=MULTI_ANSWER_SEPARATOR).astype(bool)
+    multi_hot.columns = multi_hot.columns.str.strip()
+    # Same tag written with stray spaces ("NGR; CHA") is merged into one column
+    return multi_hot.groupby(level=0, axis=1).any() if multi_hot.columns.has_duplicates else multi_hot
+
+
+class MultiAnswers(dict):
+    """Multi-hot matrices of every "check all that apply" question, column name -> bool pd.DataFrame (rows x tags) indexed by
+    row number. Also keeps count_separated of every column, so appended rows are classified without scanning the file
+
+    Args:
+        answers (dict): multi-hot matrices
+        counts (dict): column name -> count_separated, for every answer column
+    """
+
+    def __init__(self, answers: dict, counts: dict):
+        super().__init__(answers)
+        self.counts = counts
+
+
+def extend_multi_answers(multi_answers: MultiAnswers, input_file: str, previous) -> MultiAnswers:
+    """Explodes only the appended rows. A column whose appended answers change it from or to a multi-answer question is exploded again"""
+    tail = read_appended_rows(input_file, previous)
+    if not len(tail):
+        return multi_answers
+    answers, counts = {}, {}
+    for column in tail.columns[1:]:
+        counts[column] = tuple(map(sum, zip(multi_answers.counts[column], count_separated(tail[column]))))
+        if not is_multi_answer_column(column, counts[column]):
+            continue
+        if column in multi_answers:
+            multi_hot = pd.concat([multi_answers[column], explode_multi_answers(tail[column])])
+            # Tags first picked in the appended rows are False before, columns stay sorted like str.get_dummies
+            answers[column] = multi_hot.reindex(columns=sorted(multi_hot.columns)).fillna(False).astype(bool)
+        else:
+            answers[column] = explode_multi_answers(load_csv_frame(input_file)[column])
+    return MultiAnswers(answers, counts)
+
+
+@cached_per_append(extend_multi_answers)
+def get_multi_answers(input_file: str) -> MultiAnswers:
+    """Multi-hot matrices of every "check all that apply" question of the month file. Computed once per file and cached,
+    appended rows are exploded on their own
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        MultiAnswers: column name -> bool pd.DataFrame (rows x tags), indexed by row number
+    """
+    csv_df = read_csv_file(input_file)
+    counts = {column: count_separated(csv_df[column]) for column in csv_df.columns[1:]}
+    return MultiAnswers({column: explode_multi_answers(csv_df[column]) for column in csv_df.columns[1:] if is_multi_answer_column(column, counts[column])}, counts)
+
+
+def tag_frequencies(multi_hot) -> pd.Series:
+    """Number of runs in which every tag was picked
+
+    Args:
+        multi_hot (pd.DataFrame): bool (rows x tags) matrix
+
+    Returns:
+        pd.Series: tag -> count, most frequent first
+    """
+    return multi_hot.sum(axis=0).sort_values(ascending=False)
+
+
+def tag_cooccurrence(multi_hot) -> pd.DataFrame:
+    """Number of runs in which every pair of tags was picked together. Diagonal holds tag frequencies
+
+    Args:
+        multi_hot (pd.DataFrame): bool (rows x tags) matrix
+
+    Returns:
+        pd.DataFrame: (tags x tags) counts
+    """
+    matrix = multi_hot.to_numpy(dtype=np.int64)
+    return pd.DataFrame(matrix.T @ matrix, index=multi_hot.columns, columns=multi_hot.columns)
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from lazy_modules import pd, np
+from data_loader import cached_per_file, cached_per_catalogue, read_csv_file, get_file_columns, list_month_files, month_sort_key, MONTHS
+from date_answers import get_front_outcomes, FIRST_YEAR
+
+# Question columns are matched by prefix - their full text differs slightly between months
+PLAYER_COLUMN_PREFIX = "Who are you?"
+ROLE_COLUMN_PREFIX = "What is the highest role"
+PLAYED_TO_COLUMN_PREFIX = "When did you play to?"
+# A run counts towards the minimum only if it was played until the end of the Weltkrieg (its Franco-German front)
+VALID_GAME_FRONT = "Germany-France"
+MIN_GAMES_PER_MONTH = 2
+# Facet names of the normalized player and role columns in the bitmap index
+PLAYER_FACET = "Player"
+ROLE_FACET = "Role"
+
+
+def find_column(input_file: str, prefix: str) -> str:
+    """Full name of the column starting with the prefix
+
+    Args:
+        input_file (str): file name
+        prefix (str): start of the question
+
+    Returns:
+        str: column name, None if the file doesn't have it
+    """
+    return next((column for column in get_file_columns(input_file) if column.startswith(prefix)), None)
+
+
+def normalize_player_names(series) -> pd.Series:
+    """Vectorized player key: stripped, single-spaced and case-folded, so "the alpha dog " and "The Alpha Dog" are one player
+
+    Args:
+        series (pd.Series): raw names
+
+    Returns:
+        pd.Series: player keys, missing names stay missing
+    """
+    return series.astype("string").str.strip().str.replace(r"\s+", " ", regex=True).str.casefold().astype(object)
+
+
+@cached_per_file
+def get_player_rows(input_file: str) -> pd.DataFrame:
+    """Player, role and validity of every row of the month file. Only the three meta columns are parsed. Cached per file
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        pd.DataFrame: "Player" (key), "Name" (as written), "Role" and "Valid" (counts towards the monthly minimum) indexed by row number.
+        Empty if the file has no player column
+    """
+    player_column = find_column(input_file, PLAYER_COLUMN_PREFIX)
+    if player_column is None:
+        return pd.DataFrame(columns=["Player", "Name", "Role", "Valid"])
+    role_column = find_column(input_file, ROLE_COLUMN_PREFIX)
+    played_to_column = find_column(input_file, PLAYED_TO_COLUMN_PREFIX)
+    csv_df = read_csv_file(input_file, columns=[column for column in (player_column, role_column, played_to_column) if column])
+
+    # Column is read as float if nobody answered it
+    names = csv_df[player_column].astype("string").str.strip().astype(object)
+    played_to = pd.to_numeric(csv_df[played_to_column], errors="coerce") if played_to_column else pd.Series(np.nan, index=csv_df.index)
+    outcomes = get_front_outcomes(input_file, VALID_GAME_FRONT)
+    if outcomes is None:
+        # No Weltkrieg questions in the file - every answered run counts
+        valid = played_to.notna()
+    else:
+        end_year = FIRST_YEAR + outcomes["Ordinal"].to_numpy(dtype="float64", na_value=np.nan) // 4
+        valid = pd.Series(played_to.to_numpy() >= end_year, index=csv_df.index)
+    return pd.DataFrame({
+        "Player": normalize_player_names(names),
+        "Name": names,
+        "Role": csv_df[role_column] if role_column else None,
+        "Valid": valid,
+    })
+
+
+def get_month_label(input_file: str) -> str:
+    """Calendar month of the file, half-month files share one label, e.g. "July II 2022.csv" -> "July 2022"
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        str: month label
+    """
+    year, month, part = month_sort_key(input_file)
+    return f"{MONTHS[month - 1]} {year}" if month else input_file
+
+
+class PlayerIndex:
+    """Player, role and validity of every row of every month file, built once from the per-file player rows.
+    The facet filters read the rows of one file from get_player_rows
+
+    Args:
+        files (list): month files in chronological order
+    """
+
+    def __init__(self, files: list):
+        self.files = files
+        entries = []
+        for input_file in files:
+            rows = get_player_rows(input_file)
+            entries.append(pd.DataFrame({"File": input_file, "Row": rows.index.to_numpy(dtype=np.int32), "Player": rows["Player"], "Name": rows["Name"], "Role": rows["Role"], "Valid": rows["Valid"].astype(bool)}))
+        self.entries = pd.concat(entries, ignore_index=True) if entries else pd.DataFrame(columns=["File", "Row", "Player", "Name", "Role", "Valid"])
+        self.entries = self.entries.dropna(subset=["Player"])
+        # Player key -> the spelling used most often
+        self.names = self.entries.groupby("Player")["Name"].agg(lambda names: names.value_counts().index[0]).to_dict()
+
+    def get_participation(self) -> pd.DataFrame:
+        """Valid games of every player per calendar month
+
+        Returns:
+            pd.DataFrame: (players x months) counts, months in chronological order, "Months OK" (months with at least
+            MIN_GAMES_PER_MONTH valid games) and "Valid games" columns, most active players first
+        """
+        entries = self.entries.assign(Month=self.entries["File"].map(get_month_label), Name=self.entries["Player"].map(self.names))
+        months = list(dict.fromkeys(get_month_label(input_file) for input_file in self.files if input_file in set(entries["File"])))
+        table = pd.crosstab(entries["Name"], entries["Month"], values=entries["Valid"], aggfunc="sum").reindex(columns=months).fillna(0).astype(int)
+        table["Months OK"] = (table[months] >= MIN_GAMES_PER_MONTH).sum(axis=1)
+        table["Valid games"] = table[months].sum(axis=1)
+        return table.sort_values(["Months OK", "Valid games"], ascending=False)
+
+
+@cached_per_catalogue
+def get_player_index() -> PlayerIndex:
+    """Player index over all month files in /input and /backup. Rebuilt only if a file was added, removed or changed
+
+    Returns:
+        PlayerIndex: cached index
+    """
+    return PlayerIndex(list_month_files())
@@ -0,0 +1,64 @@
+"""Per-file data quality report.
+Log columns are validated in bulk and quarantined rows are counted by reason, answer columns are checked against
+the answer vocabulary and the timeline.
+Usage: python quality_report.py [month.csv ...] - without arguments every month file is checked
+"""
+from __future__ import annotations
+
+import os
+import sys
+
+from lazy_modules import pd
+from data_loader import read_csv_file, get_file_columns, get_blob_quarantine, list_month_files, BLOB_COLUMNS, TIMELINE
+from vocabulary import find_unmapped_values
+from players import find_column, PLAYED_TO_COLUMN_PREFIX
+
+# Quarantined rows printed per log column
+REPORT_ROWS = 3
+
+
+def get_file_quality(input_file: str) -> pd.DataFrame:
+    """Failed checks of the month file
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        pd.DataFrame: "Column", "Check" and "Rows" (number of rows that failed it) columns, empty if the file is clean
+    """
+    issues = []
+    for column in BLOB_COLUMNS:
+        reasons = get_blob_quarantine(input_file, column)["Reason"].value_counts()
+        issues.extend((column, reason, rows) for reason, rows in reasons.items())
+
+    csv_df = read_csv_file(input_file)
+    for _, row in find_unmapped_values(csv_df).iterrows():
+        issues.append((row["Question"], f"unmapped answer \"{row['Answer']}\"", row["Runs"]))
+    played_to_column = find_column(input_file, PLAYED_TO_COLUMN_PREFIX)
+    if played_to_column:
+        answers = csv_df[played_to_column].dropna()
+        years = pd.to_numeric(answers, errors="coerce")
+        outside = (~years.between(int(TIMELINE[0][:4]), int(TIMELINE[-1][:4]))).sum()
+        if outside:
+            issues.append((played_to_column, "year outside the timeline", int(outside)))
+    return pd.DataFrame(issues, columns=["Column", "Check", "Rows"])
+
+
+def main():
+    files = sys.argv[1:] or list_month_files()
+    for input_file in files:
+        print(f"## {os.path.splitext(input_file)[0]}")
+        quality = get_file_quality(input_file)
+        if quality.empty:
+            print("No issues found")
+        for _, row in quality.iterrows():
+            print(f"- *{row['Column']}*: {row['Check']} ({row['Rows']} rows)")
+        for column in BLOB_COLUMNS:
+            if column not in get_file_columns(input_file):
+                continue
+            for row_number, row in get_blob_quarantine(input_file, column).head(REPORT_ROWS).iterrows():
+                print(f"  - row {row_number}, {column}: `{row['Value']}`")
+
+
+if __name__ == "__main__":
+    main()
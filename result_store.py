@@ -0,0 +1,216 @@
+"""Persistent result store.
+Aggregates and figures of a month file only depend on the file content and on the code that computed them, so they are kept in a local
+SQLite database keyed by (function, arguments, file content hash, code version). Unlike cache-directory the store survives restarts and
+deploys with the same code, and every worker can read it at the same time - the database runs in WAL mode, so readers never wait for a writer.
+Usage: python result_store.py - prints stored results, size and hit rate per function
+"""
+from __future__ import annotations
+
+import os
+import sys
+import glob
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import functools
+import threading
+import collections
+from importlib import metadata
+
+from data_loader import get_file_path, get_file_hash
+from single_flight import single_flight, coalesced
+
+STORE_PATH = os.environ.get("RESULT_STORE_PATH", os.path.join(os.path.dirname(__file__), "result-store.sqlite3"))
+# Seconds a worker waits for the write lock of another worker before the result is not stored
+BUSY_TIMEOUT = 30
+# Results are pickled with these packages - a new version of any of them is a new code version
+CODE_PACKAGES = ("pandas", "numpy", "plotly", "dash")
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    function TEXT NOT NULL,
+    code_version TEXT NOT NULL,
+    created REAL NOT NULL,
+    value BLOB NOT NULL
+)
+"""
+
+# Connection of every thread, opened on first use. Workers forked by gunicorn open their own
+connections = threading.local()
+# Processes that already deleted the results of older code versions
+pruned = set()
+# (function, "hits" | "misses") -> number of lookups in this process
+lookups = collections.Counter()
+
+
+@functools.lru_cache(maxsize=None)
+def get_code_version() -> str:
+    """Hash of the source of every module of the dashboard, the Python version and the versions of CODE_PACKAGES
+
+    Returns:
+        str: hex digest, results stored by other code are never read
+    """
+    digest = hashlib.sha256(sys.version.encode())
+    for package in CODE_PACKAGES:
+        digest.update(f"{package}=={metadata.version(package)}".encode())
+    for filename in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+        with open(filename, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def get_connection() -> sqlite3.Connection:
+    """Connection of the current thread. Results of older code versions are deleted when a process opens the store for the first time
+
+    Returns:
+        sqlite3.Connection: connection in autocommit mode
+    """
+    connection = getattr(connections, "connection", None)
+    if connection is None or connections.pid != os.getpid():
+        connection = sqlite3.connect(STORE_PATH, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WAL keeps the store consistent on a crash with NORMAL, only the last results can be lost
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(SCHEMA)
+        if os.getpid() not in pruned:
+            connection.execute("DELETE FROM results WHERE code_version != ?", (get_code_version(),))
+            pruned.add(os.getpid())
+        connections.connection, connections.pid = connection, os.getpid()
+    return connection
+
+
+def get_result_key(function: str, input_file: str, args: tuple) -> str:
+    """Store key of one call. The file is identified by its content, so a re-deployed copy of the same month hits the stored results
+
+    Args:
+        function (str): qualified function name
+        input_file (str): file name
+        args (tuple): other arguments, must be JSON serializable (dropdown values, facet filters)
+
+    Returns:
+        str: hex digest
+    """
+    call = json.dumps([function, input_file, get_file_hash(input_file), args, get_code_version()], sort_keys=True, default=str)
+    return hashlib.sha256(call.encode()).hexdigest()
+
+
+def read_result(key: str) -> tuple:
+    """Reads a stored result. A store that can't be read (locked for too long, corrupted entry) is a miss
+
+    Args:
+        key (str): store key
+
+    Returns:
+        tuple: True and the result if found, False and None otherwise
+    """
+    try:
+        row = get_connection().execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            return True, pickle.loads(row[0])
+    except (sqlite3.Error, pickle.UnpicklingError, EOFError):
+        pass
+    return False, None
+
+
+def load_result(function: str, key: str) -> tuple:
+    """read_result counted in the hit rate of the function
+
+    Args:
+        function (str): qualified function name
+        key (str): store key
+
+    Returns:
+        tuple: True and the result if found, False and None otherwise
+    """
+    found, value = read_result(key)
+    lookups[function, "hits" if found else "misses"] += 1
+    return found, value
+
+
+def save_result(function: str, key: str, value):
+    """Stores a result. Errors are ignored - the result is computed again next time
+
+    Args:
+        function (str): qualified function name
+        key (str): store key
+        value (object): picklable result
+    """
+    try:
+        get_connection().execute(
+            "INSERT OR REPLACE INTO results (key, function, code_version, created, value) VALUES (?, ?, ?, ?, ?)",
+            (key, function, get_code_version(), time.time(), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+        )
+    except (sqlite3.Error, pickle.PicklingError):
+        pass
+
+
+def stored_per_file(func):
+    """Persists func(input_file, *args) in the result store. Goes under cached_per_file or cache.memoize,
+    so the store is only read when the result is not cached in the process yet. Identical concurrent misses are computed once (see single_flight).
+    Stored values are shared - callers must not mutate them
+    """
+    function = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(input_file, *args):
+        # Callbacks can fire before a dropdown has a value
+        if not isinstance(input_file, str) or not os.path.isfile(get_file_path(input_file)):
+            return func(input_file, *args)
+        key = get_result_key(function, input_file, args)
+        found, value = load_result(function, key)
+        if found:
+            return value
+
+        def compute():
+            value = func(input_file, *args)
+            save_result(function, key, value)
+            return value
+
+        return single_flight(function, key, compute, lambda: read_result(key))
+
+    return wrapper
+
+
+def get_store_stats() -> list:
+    """Stored results, lookups and coalesced calls of this process per function
+
+    Returns:
+        list: dicts with "Function", "Results", "Size (KB)", "Hits", "Misses", "Hit rate" and "Coalesced"
+        (computations saved by waiting for an identical call), biggest first
+    """
+    rows = get_connection().execute(
+        "SELECT function, COUNT(*), SUM(LENGTH(value)) FROM results GROUP BY function ORDER BY SUM(LENGTH(value)) DESC"
+    ).fetchall()
+    functions = [row[0] for row in rows] + sorted(({function for function, _ in lookups} | set(coalesced)) - {row[0] for row in rows})
+    sizes = {row[0]: row[1:] for row in rows}
+    stats = []
+    for function in functions:
+        results, size = sizes.get(function, (0, 0))
+        hits, misses = lookups[function, "hits"], lookups[function, "misses"]
+        stats.append({
+            "Function": function,
+            "Results": results,
+            "Size (KB)": round(size / 1024, 1),
+            "Hits": hits,
+            "Misses": misses,
+            "Hit rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "Coalesced": coalesced[function],
+        })
+    return stats
+
+
+def main():
+    stats = get_store_stats()
+    print(f"## {STORE_PATH}")
+    print(f"- *Code version*: {get_code_version()[:12]}")
+    print(f"- *File size*: {os.path.getsize(STORE_PATH) / 1024:.1f} KB")
+    print("| Function | Results | Size (KB) |")
+    print("|---|---|---|")
+    for row in stats:
+        print(f"| {row['Function']} | {row['Results']} | {row['Size (KB)']} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Month-over-month significance scan.
+Every question shared by two month files is tested with a chi-square test of the (month x answer) table. Counts of every month
+are one (month, question, answer) slice of the merged answer cube.
+Usage: python significance.py [baseline.csv compared.csv] - without arguments every month is compared with the previous one
+"""
+from __future__ import annotations
+
+import os
+import sys
+import math
+import time
+
+from lazy_modules import pd, np
+from data_loader import cached_per_catalogue, list_month_files
+from cube import get_answer_cube
+
+SIGNIFICANCE_LEVEL = 0.05
+# Questions printed per month pair in the markdown report
+REPORT_QUESTIONS = 10
+# Questions about the session, not about the game - they always "shift" between months
+META_QUESTION_PREFIXES = (
+    "When in real life did you start",
+    "If you weren't on master",
+    "When did you play to?",
+)
+
+
+@cached_per_catalogue
+def load_catalogue_counts() -> pd.Series:
+    """Answer counts of every indexed game question of every month, sliced from the merged answer cube.
+    "Check all that apply" questions are left out - the chi-square test needs exactly one answer per run
+
+    Returns:
+        pd.Series: count indexed by (month, question, answer)
+    """
+    cube = get_answer_cube()
+    counts = cube.get_counts(("Month", "Question", "Answer"))
+    questions = counts.index.get_level_values("Question")
+    multi_answer = pd.MultiIndex.from_tuples(sorted(cube.multi_answer), names=["Month", "Question"]) if cube.multi_answer else []
+    return counts[~questions.str.startswith(META_QUESTION_PREFIXES) & ~counts.index.droplevel("Answer").isin(multi_answer)]
+
+
+def load_month_counts(input_file: str) -> pd.Series:
+    """Slice of load_catalogue_counts for one month
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        pd.Series: count indexed by (question, answer), empty if the file is not in the catalogue
+    """
+    counts = load_catalogue_counts()
+    return counts[counts.index.get_level_values("Month") == input_file].droplevel("Month")
+
+
+def chi_square_sf(statistic: float, dof: int) -> float:
+    """Chi-square survival function (p-value) as the regularized upper incomplete gamma Q(dof / 2, statistic / 2)
+
+    Args:
+        statistic (float): chi-square statistic
+        dof (int): degrees of freedom
+
+    Returns:
+        float: p-value
+    """
+    if dof <= 0 or not statistic > 0:
+        return 1.0
+    a, x = dof / 2, statistic / 2
+    log_prefactor = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Series of the lower incomplete gamma
+        term = total = 1 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1 - total * math.exp(log_prefactor))
+    # Continued fraction of the upper incomplete gamma (modified Lentz)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    fraction = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        fraction *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return min(1.0, math.exp(log_prefactor) * fraction)
+
+
+def adjust_p_values(p_values) -> np.ndarray:
+    """Benjamini-Hochberg adjusted p-values - controls false discoveries when ~80 questions are tested at once
+
+    Args:
+        p_values (np.ndarray): raw p-values
+
+    Returns:
+        np.ndarray: adjusted p-values, same order
+    """
+    p_values = np.asarray(p_values, dtype=np.float64)
+    if not len(p_values):
+        return p_values
+    order = np.argsort(p_values)
+    ranked = p_values[order] * len(p_values) / np.arange(1, len(p_values) + 1)
+    adjusted = np.minimum.accumulate(ranked[::-1])[::-1]
+    result = np.empty_like(adjusted)
+    result[order] = np.minimum(adjusted, 1)
+    return result
+
+
+def compare_counts(baseline, compared) -> pd.DataFrame:
+    """Tests every question answered in both months. Statistics of all questions are computed with grouped vectorized sums
+
+    Args:
+        baseline (pd.Series): counts indexed by (question, answer) of the earlier month
+        compared (pd.Series): counts indexed by (question, answer) of the later month
+
+    Returns:
+        pd.DataFrame: one row per question sorted from the most to the least significant shift. "Runs A", "Runs B", "Chi-square",
+        "DoF", "p-value", "Adjusted p-value", "Shift" (total variation distance of the answer shares) and "Biggest change"
+    """
+    table = pd.concat([baseline.rename("A"), compared.rename("B")], axis=1).fillna(0)
+    totals = table.groupby(level=0).transform("sum")
+    table = table[(totals["A"] > 0) & (totals["B"] > 0)]
+    totals = totals.loc[table.index]
+    if table.empty:
+        return pd.DataFrame(columns=["Runs A", "Runs B", "Chi-square", "DoF", "p-value", "Adjusted p-value", "Shift", "Biggest change"])
+
+    answer_totals = table["A"] + table["B"]
+    runs = totals["A"] + totals["B"]
+    expected_a = totals["A"] * answer_totals / runs
+    expected_b = totals["B"] * answer_totals / runs
+    chi_terms = (table["A"] - expected_a) ** 2 / expected_a + (table["B"] - expected_b) ** 2 / expected_b
+    share_change = table["B"] / totals["B"] - table["A"] / totals["A"]
+
+    grouped = pd.DataFrame({"Chi": chi_terms, "Seen": answer_totals > 0, "Abs": share_change.abs()}).groupby(level=0)
+    result = pd.DataFrame({
+        "Runs A": totals["A"].groupby(level=0).first().astype(int),
+        "Runs B": totals["B"].groupby(level=0).first().astype(int),
+        "Chi-square": grouped["Chi"].sum(),
+        "DoF": grouped["Seen"].sum().astype(int) - 1,
+        "Shift": grouped["Abs"].sum() / 2,
+    })
+    biggest = share_change.loc[grouped["Abs"].idxmax()]
+    result["Biggest change"] = pd.Series([f"{answer} {change:+.1%}" for (question, answer), change in biggest.items()], index=biggest.index.get_level_values(0))
+    result["p-value"] = [chi_square_sf(statistic, dof) for statistic, dof in zip(result["Chi-square"], result["DoF"])]
+    result["Adjusted p-value"] = adjust_p_values(result["p-value"])
+    result.index.name = "Question"
+    return result.sort_values(["p-value", "Shift"], ascending=[True, False])[["Runs A", "Runs B", "Chi-square", "DoF", "p-value", "Adjusted p-value", "Shift", "Biggest change"]]
+
+
+def compare_months(baseline_file: str, compared_file: str) -> pd.DataFrame:
+    """compare_counts of two month files using the cached counts of the catalogue
+
+    Args:
+        baseline_file (str): earlier month file name
+        compared_file (str): later month file name
+
+    Returns:
+        pd.DataFrame: see compare_counts
+    """
+    return compare_counts(load_month_counts(baseline_file), load_month_counts(compared_file))
+
+
+def scan_months(pairs: list) -> dict:
+    """Compares every (baseline, compared) pair. Counts of all months are read from the merged answer cube at once
+
+    Args:
+        pairs (list): list of (baseline file, compared file)
+
+    Returns:
+        dict: (baseline file, compared file) -> compare_counts result
+    """
+    return {(baseline, compared): compare_months(baseline, compared) for baseline, compared in pairs}
+
+
+def main():
+    if len(sys.argv) == 3:
+        pairs = [(sys.argv[1], sys.argv[2])]
+    else:
+        files = list_month_files()
+        pairs = list(zip(files, files[1:]))
+
+    start = time.perf_counter()
+    results = scan_months(pairs)
+    elapsed = time.perf_counter() - start
+
+    for (baseline, compared), result in results.items():
+        print(f"## {os.path.splitext(baseline)[0]} -> {os.path.splitext(compared)[0]}")
+        if result.empty:
+            print("No shared questions")
+            continue
+        significant = result[result["Adjusted p-value"] < SIGNIFICANCE_LEVEL]
+        print(f"{len(significant)} of {len(result)} shared questions shifted significantly (adjusted p < {SIGNIFICANCE_LEVEL})")
+        for question, row in result.head(REPORT_QUESTIONS).iterrows():
+            print(f"- *{question}*\nshift {row['Shift']:.1%}, p {row['p-value']:.2g}, adjusted p {row['Adjusted p-value']:.2g}, {row['Biggest change']} ({row['Runs A']} -> {row['Runs B']} runs)")
+    print(f"Scanned {len(pairs)} month pairs in {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
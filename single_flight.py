@@ -0,0 +1,105 @@
+"""Single-flight request coalescing.
+When a new month lands, every worker misses the caches at once and renders the same figures in parallel. With single_flight only the
+first caller of a key computes it, identical calls wait for its result - threads of the same worker on an event, other workers on a
+byte-range lock of a shared lock file, after which they read the result the first worker stored.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import collections
+
+try:
+    import fcntl
+except ImportError:
+    # No POSIX locks on Windows - calls are only coalesced within a worker
+    fcntl = None
+
+LOCK_PATH = os.environ.get("SINGLE_FLIGHT_LOCK_PATH", os.path.join(tempfile.gettempdir(), "kaiserreich-single-flight.lock"))
+# Every key locks one byte of the lock file at an offset taken from its hash. Workers with different keys never wait for each other
+LOCK_OFFSETS = 2 ** 31
+
+# Key -> Flight of the call being computed in this worker
+flights = {}
+flights_lock = threading.Lock()
+# Lock file of this worker, opened on first use. POSIX locks belong to the process, so the file is never closed
+lock_files = {}
+# Function -> computations saved in this worker by waiting for another caller
+coalesced = collections.Counter()
+
+
+class Flight:
+    """Result of a call shared with the callers that wait for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def get_lock_file() -> int:
+    """File descriptor of the lock file in the current process
+
+    Returns:
+        int: descriptor opened by this process, workers forked by gunicorn open their own
+    """
+    if os.getpid() not in lock_files:
+        lock_files[os.getpid()] = os.open(LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o666)
+    return lock_files[os.getpid()]
+
+
+def lock_key(key: str, lock: bool = True):
+    """Locks or unlocks the byte of the key in the lock file, waits while another worker holds it
+
+    Args:
+        key (str): hex digest
+        lock (bool, optional): False to unlock
+    """
+    if fcntl is None:
+        return
+    fcntl.lockf(get_lock_file(), fcntl.LOCK_EX if lock else fcntl.LOCK_UN, 1, int(key[:16], 16) % LOCK_OFFSETS, os.SEEK_SET)
+
+
+def single_flight(function: str, key: str, compute, lookup):
+    """Runs compute() once for all identical concurrent calls
+
+    Args:
+        function (str): qualified function name, for the coalesced call counter
+        key (str): hex digest of the call, e.g. the result store key
+        compute (callable): computes and stores the result
+        lookup (callable): returns True and the result if another worker already stored it, False and None otherwise
+
+    Returns:
+        object: result of the call, computed here or by the caller that came first
+    """
+    with flights_lock:
+        flight = flights.get(key)
+        first = flight is None
+        if first:
+            flight = flights[key] = Flight()
+    if not first:
+        flight.done.wait()
+        coalesced[function] += 1
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    try:
+        lock_key(key)
+        try:
+            found, flight.value = lookup()
+            if found:
+                coalesced[function] += 1
+            else:
+                flight.value = compute()
+        finally:
+            lock_key(key, lock=False)
+        return flight.value
+    except Exception as error:
+        flight.error = error
+        raise
+    finally:
+        with flights_lock:
+            del flights[key]
+        flight.done.set()
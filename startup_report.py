@@ -0,0 +1,78 @@
+"""Cold start report for the dashboard.
+Must be started as a fresh process (python startup_report.py) - every phase is measured on an empty module cache
+"""
+import sys
+import time
+import importlib
+
+HEAVY_MODULES = ("pandas", "numpy", "plotly.express")
+
+# Time to first byte budget for a freshly booted worker: framework import + app import + layout + first response
+TTFB_TARGET = 0.75
+
+
+def measure_startup() -> tuple:
+    """Boots the app in the current process and times every startup phase
+
+    Returns:
+        tuple: list of (phase name, seconds) in the order they happened, list of heavy modules imported before the first callback
+    """
+    phases = []
+
+    start = time.perf_counter()
+    importlib.import_module("dash")
+    importlib.import_module("flask")
+    importlib.import_module("flask_caching")
+    phases.append(("Framework import (dash, flask, flask_caching)", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    app_module = importlib.import_module("app")
+    phases.append(("App module import", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    layout = app_module.serve_layout()
+    phases.append(("Layout build", time.perf_counter() - start))
+
+    client = app_module.server.test_client()
+    start = time.perf_counter()
+    client.get("/")
+    phases.append(("First response (GET /)", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    client.get("/_dash-layout")
+    phases.append(("Layout fetch (GET /_dash-layout)", time.perf_counter() - start))
+    eager_modules = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    input_file = layout["scw-winrate-data-source"].value
+    payload = {
+        "output": "scw-winrate-pie.figure",
+        "outputs": {"id": "scw-winrate-pie", "property": "figure"},
+        "inputs": [
+            {"id": "scw-winrate-data-source", "property": "value", "value": input_file},
+            {"id": "facet-store", "property": "data", "value": []},
+        ],
+        "changedPropIds": ["scw-winrate-data-source.value"],
+    }
+    start = time.perf_counter()
+    client.post("/_dash-update-component", json=payload)
+    phases.append(("First callback (lazy pandas/plotly import + figure)", time.perf_counter() - start))
+    return phases, eager_modules
+
+
+def main():
+    if "app" in sys.modules:
+        print("startup_report.py must run in a fresh interpreter")
+        return
+    phases, eager_modules = measure_startup()
+    ttfb = sum(seconds for name, seconds in phases[:4])
+
+    print("## Startup phases")
+    for name, seconds in phases:
+        print(f"- *{name}*: {seconds * 1000:.0f} ms")
+    print("## Time to first byte")
+    print(f"- *Import + layout + first response*: {ttfb * 1000:.0f} ms (target {TTFB_TARGET * 1000:.0f} ms) - {'OK' if ttfb <= TTFB_TARGET else 'OVER TARGET'}")
+    print(f"- *Heavy modules imported before the first callback*: {', '.join(eager_modules) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Static export of the dashboard.
+Outside of a month upload the dashboard only shows a fixed set of figures - every month file times every dropdown value. The export
+renders all of them in a process pool and writes a static site: index.html with the sections and dropdowns of the layout, one JSON file
+per figure, manifest.json and a small switcher script (export_template/switcher.js). Any static host or CDN can serve it with zero server compute.
+Figures are exported without facet filters, inputs that are not dropdowns keep their initial value.
+Usage: python static_export.py [output folder] - defaults to static-site
+"""
+from __future__ import annotations
+
+import os
+import sys
+import html
+import json
+import time
+import shutil
+import hashlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from dash import html as dash_html, dcc
+import plotly
+import plotly.io
+
+import app
+
+EXPORT_FOLDER = "static-site"
+TEMPLATE_FOLDER = os.path.join(os.path.dirname(__file__), "export_template")
+# Layout parts that only make sense with a server behind them - the facet filters
+SKIPPED_COMPONENTS = ("facet-section", "facet-panel")
+
+
+def walk_layout(component):
+    """Components of the layout in document order, skipping SKIPPED_COMPONENTS and everything inside them
+
+    Args:
+        component (object): Dash component, list of components or text
+
+    Yields:
+        object: Dash component
+    """
+    if isinstance(component, (list, tuple)):
+        for child in component:
+            yield from walk_layout(child)
+        return
+    if not hasattr(component, "to_plotly_json"):
+        return
+    if getattr(component, "id", None) in SKIPPED_COMPONENTS or getattr(component, "className", None) in SKIPPED_COMPONENTS:
+        return
+    yield component
+    yield from walk_layout(getattr(component, "children", None))
+
+
+def get_option_values(options) -> list:
+    """Values of dropdown options given as ["a", ...] or [{"label": ..., "value": ...}, ...]"""
+    return [option["value"] if isinstance(option, dict) else option for option in options or []]
+
+
+def get_figure_key(values) -> str:
+    """Key of one dropdown combination, the same JSON as JSON.stringify in switcher.js"""
+    return json.dumps(list(values), separators=(",", ":"), ensure_ascii=False)
+
+
+def get_callback_function(callback: str):
+    """Undecorated callback of a callback_map key. The Flask cache is skipped, the result store is kept
+
+    Args:
+        callback (str): key of app.callback_map, e.g. "scw-winrate-pie.figure"
+
+    Returns:
+        function: callback taking the input values
+    """
+    function = app.app.callback_map[callback]["callback"].__wrapped__
+    return getattr(function, "uncached", function)
+
+
+def get_callback_outputs(callback: str) -> list:
+    """"..a.figure...b.figure.." -> ["a.figure", "b.figure"]"""
+    return callback.strip(".").split("...")
+
+
+class ExportPlan:
+    """Every figure callback of the app with every combination of its dropdown values
+
+    Args:
+        layout (object): page layout
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.dropdowns = {
+            component.id: component for component in walk_layout(layout)
+            if isinstance(component, dcc.Dropdown) and isinstance(component.id, str)
+        }
+        graphs = {component.id for component in walk_layout(layout) if isinstance(component, dcc.Graph)}
+        # Dropdowns whose options are set by a callback -> that callback
+        self.option_callbacks = {
+            output[:-len(".options")]: callback
+            for callback in app.app.callback_map for output in get_callback_outputs(callback) if output.endswith(".options")
+        }
+        self.callbacks = []
+        for callback, spec in app.app.callback_map.items():
+            outputs = get_callback_outputs(callback)
+            if all(output.endswith(".figure") and output[:-len(".figure")] in graphs for output in outputs):
+                self.callbacks.append((callback, [output[:-len(".figure")] for output in outputs], [item["id"] for item in spec["inputs"]]))
+
+    def get_input_values(self, input_id, values: dict) -> list:
+        """Values an input takes in the export
+
+        Args:
+            input_id (str | dict): input component id
+            values (dict): values of the inputs already chosen, for dropdowns with options set by a callback
+
+        Returns:
+            list: every option of a dropdown, [None] for other inputs
+        """
+        if input_id in self.option_callbacks:
+            callback = self.option_callbacks[input_id]
+            inputs = [item["id"] for item in app.app.callback_map[callback]["inputs"]]
+            result = get_callback_function(callback)(*(values.get(item) for item in inputs))
+            outputs = get_callback_outputs(callback)
+            return get_option_values(result[outputs.index(f"{input_id}.options")] if len(outputs) > 1 else result)
+        if input_id in self.dropdowns and self.dropdowns[input_id].options:
+            return get_option_values(self.dropdowns[input_id].options)
+        return [None]
+
+    def get_combinations(self, inputs: list) -> list:
+        """Every combination of the input values, inputs are chosen in order so dependent dropdowns see their source value"""
+        combinations = [{}]
+        for input_id in inputs:
+            key = input_id if isinstance(input_id, str) else json.dumps(input_id)
+            combinations = [dict(values, **{key: value}) for values in combinations for value in self.get_input_values(input_id, values)]
+        return [[values[input_id if isinstance(input_id, str) else json.dumps(input_id)] for input_id in inputs] for values in combinations]
+
+    def get_jobs(self) -> list:
+        """(callback, outputs, input values) of every figure set to render"""
+        return [(callback, outputs, values) for callback, outputs, inputs in self.callbacks for values in self.get_combinations(inputs)]
+
+
+def get_figure_path(output: str, values) -> str:
+    """Path of a figure file inside the site"""
+    return f"figures/{output}/{hashlib.sha1(get_figure_key(values).encode()).hexdigest()[:16]}.json"
+
+
+def render_figures(job: tuple, folder: str) -> tuple:
+    """Renders one callback call and writes its figures. Top-level so worker processes can run it
+
+    Args:
+        job (tuple): callback, outputs and input values
+        folder (str): site folder
+
+    Returns:
+        tuple: job, seconds spent and bytes written, None if the callback failed
+    """
+    callback, outputs, values = job
+    start = time.perf_counter()
+    try:
+        result = get_callback_function(callback)(*values)
+    except Exception as error:
+        print(f"- *{callback}* {values}: {type(error).__name__} {error}", file=sys.stderr)
+        return job, time.perf_counter() - start, None
+    figures = result if len(outputs) > 1 else [result]
+    size = 0
+    for output, figure in zip(outputs, figures):
+        path = os.path.join(folder, get_figure_path(output, values))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="UTF-8") as file:
+            size += file.write(plotly.io.to_json(figure))
+    return job, time.perf_counter() - start, size
+
+
+def render_index(plan: ExportPlan) -> str:
+    """index.html with the labels, dropdowns and graphs of the layout in their order. Dropdowns start at their layout value"""
+    exported_inputs = {input_id for _, _, inputs in plan.callbacks for input_id in inputs if isinstance(input_id, str)}
+    exported_graphs = {output for _, outputs, _ in plan.callbacks for output in outputs}
+    # Options set by a callback are the union over all source values
+    option_values = {}
+    for callback, _, inputs in plan.callbacks:
+        for values in plan.get_combinations(inputs):
+            for input_id, value in zip(inputs, values):
+                if isinstance(input_id, str) and value is not None and value not in option_values.setdefault(input_id, []):
+                    option_values[input_id].append(value)
+
+    lines = []
+    for component in walk_layout(plan.layout.children):
+        component_id = getattr(component, "id", None)
+        if isinstance(component, dash_html.Label):
+            lines.append(f'<label id="{html.escape(str(component_id or ""))}">{html.escape(str(component.children))}</label>')
+        elif isinstance(component, dash_html.A):
+            lines.append(f'<a href="{html.escape(component.href)}" class="contents-link">{html.escape(str(component.children))}</a>')
+        elif isinstance(component, dash_html.Br):
+            lines.append("<br>")
+        elif isinstance(component, dcc.Dropdown) and component_id in exported_inputs:
+            selected = getattr(component, "value", None)
+            options = "".join(
+                f'<option value="{html.escape(value)}"{" selected" if value == selected else ""}>{html.escape(value)}</option>'
+                for value in option_values.get(component_id, [])
+            )
+            lines.append(f'<select id="{html.escape(component_id)}" class="dash-dropdown">{options}</select>')
+        elif isinstance(component, dcc.Graph) and component_id in exported_graphs:
+            lines.append(f'<div id="{html.escape(component_id)}" class="static-graph"></div>')
+    body = "\n".join(lines)
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="UTF-8">
+<title>{html.escape(app.app.title)}</title>
+<link rel="stylesheet" href="style.css">
+<script src="plotly.min.js"></script>
+</head>
+<body>
+<div style="background-color: {app.colors['background']}; padding: 10px;">
+{body}
+</div>
+<script src="switcher.js"></script>
+</body>
+</html>
+"""
+
+
+def export_site(folder: str = EXPORT_FOLDER) -> dict:
+    """Renders every figure in a process pool and writes the site
+
+    Args:
+        folder (str, optional): output folder, replaced if it exists
+
+    Returns:
+        dict: "Figures", "Failed", "Size (MB)" and "Seconds" of the export and the (calls, seconds) of every callback
+    """
+    start = time.perf_counter()
+    plan = ExportPlan(app.serve_layout())
+    jobs = plan.get_jobs()
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+
+    manifest = {callback: {"outputs": outputs, "inputs": inputs, "figures": {}} for callback, outputs, inputs in plan.callbacks}
+    callbacks = {}
+    figures, failed, size = 0, 0, 0
+    with ProcessPoolExecutor() as pool:
+        for (callback, outputs, values), seconds, written in pool.map(render_figures, jobs, itertools.repeat(folder), chunksize=4):
+            calls, total = callbacks.get(callback, (0, 0.0))
+            callbacks[callback] = (calls + 1, total + seconds)
+            if written is None:
+                failed += 1
+                continue
+            manifest[callback]["figures"][get_figure_key(values)] = [get_figure_path(output, values) for output in outputs]
+            figures += len(outputs)
+            size += written
+
+    with open(os.path.join(folder, "manifest.json"), "w", encoding="UTF-8") as file:
+        json.dump({"callbacks": [dict(spec, inputs=[item if isinstance(item, str) else json.dumps(item) for item in spec["inputs"]]) for spec in manifest.values()]}, file, ensure_ascii=False)
+    with open(os.path.join(folder, "index.html"), "w", encoding="UTF-8") as file:
+        file.write(render_index(plan))
+    shutil.copy(os.path.join(TEMPLATE_FOLDER, "switcher.js"), folder)
+    shutil.copy(os.path.join(os.path.dirname(__file__), "assets", "style.css"), folder)
+    shutil.copy(os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js"), folder)
+    site_size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(folder) for name in names)
+    return {
+        "Figures": figures,
+        "Failed": failed,
+        "Size (MB)": site_size / 1024 ** 2,
+        "Figure size (MB)": size / 1024 ** 2,
+        "Seconds": time.perf_counter() - start,
+        "Callbacks": callbacks,
+    }
+
+
+def main():
+    folder = sys.argv[1] if len(sys.argv) > 1 else EXPORT_FOLDER
+    report = export_site(folder)
+    print(f"## Static export - {folder}")
+    print(f"- *Figures*: {report['Figures']} ({report['Failed']} calls failed)")
+    print(f"- *Size*: {report['Size (MB)']:.1f} MB, figures {report['Figure size (MB)']:.1f} MB")
+    print(f"- *Export time*: {report['Seconds']:.1f} s")
+    print("| Callback | Calls | Render time (s) |")
+    print("|---|---|---|")
+    for callback, (calls, seconds) in sorted(report["Callbacks"].items(), key=lambda item: -item[1][1]):
+        print(f"| {callback} | {calls} | {seconds:.1f} |")
+
+
+if __name__ == "__main__":
+    main()
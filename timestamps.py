@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from lazy_modules import pd, np
+from data_loader import cached_per_file, cached_per_catalogue, read_csv_file, get_file_columns, list_month_files
+
+# Google Forms export names the first column in the language of the form owner
+TIMESTAMP_COLUMNS = ("Метка часу", "Отметка времени")
+# "2023/06/05 10:11:49 AM GMT+4" - local time, then the offset of the form owner
+TIMESTAMP_FORMAT = "%Y/%m/%d %I:%M:%S %p"
+OFFSET_SEPARATOR = " GMT"
+# Facet name of the submission date range in the facet store
+SUBMITTED_FACET = "Submitted"
+
+
+def parse_gmt_offset(offset: str):
+    """Parses one distinct offset, e.g. "+4", "-3:30", "" (GMT)
+
+    Args:
+        offset (str): text after "GMT"
+
+    Returns:
+        pd.Timedelta: offset from UTC, NaT if it can't be parsed
+    """
+    sign = -1 if offset.startswith("-") else 1
+    hours, _, minutes = offset.lstrip("+-").partition(":")
+    if not (hours or "0").isdigit() or not (minutes or "0").isdigit():
+        return pd.NaT
+    return sign * pd.Timedelta(hours=int(hours or 0), minutes=int(minutes or 0))
+
+
+def parse_timestamps(series) -> pd.Series:
+    """Parses submission timestamps to UTC with one fixed-format vectorized pass. Offsets are parsed once per distinct value
+
+    Args:
+        series (pd.Series): raw timestamps
+
+    Returns:
+        pd.Series: UTC datetimes (datetime64[ns, UTC]), NaT where the value can't be parsed
+    """
+    parts = series.astype("string").str.rpartition(OFFSET_SEPARATOR)
+    # Values without " GMT" end up in the last part
+    local = parts[0].where(parts[1] == OFFSET_SEPARATOR, parts[2])
+    offset = parts[2].where(parts[1] == OFFSET_SEPARATOR, "")
+    codes, uniques = pd.factorize(offset)
+    offsets = pd.to_timedelta(pd.Series([parse_gmt_offset(value) for value in uniques] + [pd.NaT], dtype="timedelta64[ns]")).to_numpy()
+    parsed = pd.to_datetime(local, format=TIMESTAMP_FORMAT, errors="coerce").to_numpy()
+    return pd.Series(parsed - offsets[codes], index=series.index).dt.tz_localize("UTC")
+
+
+@cached_per_file
+def get_submission_times(input_file: str) -> pd.Series:
+    """Parsed submission time of every row of the month file. Only the first column is read. Cached per file
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        pd.Series: UTC datetimes indexed by row number, empty if the file has no timestamp column
+    """
+    column = next((column for column in get_file_columns(input_file) if column in TIMESTAMP_COLUMNS), None)
+    if column is None:
+        return pd.Series(dtype="datetime64[ns, UTC]")
+    return parse_timestamps(read_csv_file(input_file, columns=[column])[column])
+
+
+class SubmissionIndex:
+    """Submissions of all month files sorted by time. Date ranges are found with a binary search
+
+    Args:
+        files (list): month files
+    """
+
+    def __init__(self, files: list):
+        self.files = files
+        times, file_codes, rows = [], [], []
+        for code, input_file in enumerate(files):
+            submitted = get_submission_times(input_file).dropna()
+            times.append(submitted.to_numpy(dtype="datetime64[ns]").view(np.int64))
+            file_codes.append(np.full(len(submitted), code, dtype=np.int16))
+            rows.append(submitted.index.to_numpy(dtype=np.int32))
+        times = np.concatenate(times) if times else np.zeros(0, dtype=np.int64)
+        order = np.argsort(times, kind="stable")
+        self.times = times[order]
+        self.file_codes = (np.concatenate(file_codes) if file_codes else np.zeros(0, dtype=np.int16))[order]
+        self.rows = (np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32))[order]
+
+    def get_slice(self, start=None, end=None) -> slice:
+        """Positions of the submissions in [start, end)
+
+        Args:
+            start (str | pd.Timestamp, optional): first moment, UTC if no timezone is given. Open if None
+            end (str | pd.Timestamp, optional): moment after the last one. Open if None
+
+        Returns:
+            slice: positions in the sorted arrays
+        """
+        low = 0 if start is None else np.searchsorted(self.times, to_utc_nanoseconds(start), side="left")
+        high = len(self.times) if end is None else np.searchsorted(self.times, to_utc_nanoseconds(end), side="left")
+        return slice(low, high)
+
+    def get_rows(self, input_file: str, start=None, end=None) -> np.ndarray:
+        """Rows of the file submitted in [start, end)
+
+        Args:
+            input_file (str): file name
+            start (str | pd.Timestamp, optional): first moment
+            end (str | pd.Timestamp, optional): moment after the last one
+
+        Returns:
+            np.ndarray: row numbers in submission order
+        """
+        if input_file not in self.files:
+            return np.zeros(0, dtype=np.int32)
+        window = self.get_slice(start, end)
+        return self.rows[window][self.file_codes[window] == self.files.index(input_file)]
+
+    def get_daily_counts(self, start=None, end=None) -> pd.DataFrame:
+        """Number of submissions per UTC day and month file
+
+        Args:
+            start (str | pd.Timestamp, optional): first moment
+            end (str | pd.Timestamp, optional): moment after the last one
+
+        Returns:
+            pd.DataFrame: "Day", "File" and "Submissions" columns
+        """
+        window = self.get_slice(start, end)
+        days = self.times[window].astype("datetime64[ns]").astype("datetime64[D]")
+        counts = pd.DataFrame({"Day": days, "File": np.array(self.files, dtype=object)[self.file_codes[window]]}).value_counts(sort=False)
+        return counts.rename("Submissions").reset_index()
+
+
+def to_utc_nanoseconds(moment) -> int:
+    """Nanoseconds since epoch of a date or timestamp, naive values are treated as UTC
+
+    Args:
+        moment (str | pd.Timestamp): e.g. "2023-06-05"
+
+    Returns:
+        int: nanoseconds
+    """
+    moment = pd.Timestamp(moment)
+    return (moment.tz_localize("UTC") if moment.tzinfo is None else moment.tz_convert("UTC")).value
+
+
+@cached_per_catalogue
+def get_submission_index() -> SubmissionIndex:
+    """Submission index over all month files in /input and /backup. Rebuilt only if a file was added, removed or changed
+
+    Returns:
+        SubmissionIndex: cached index
+    """
+    return SubmissionIndex(list_month_files())
+
+
+def get_time_range(facets) -> tuple:
+    """Submission date range of the facet filter
+
+    Args:
+        facets (list): facet filter from the facet panel
+
+    Returns:
+        tuple: (start, end) with end exclusive, None if the filter has no date range
+    """
+    facet = next((facet for facet in facets or [] if facet.get("question") == SUBMITTED_FACET), None)
+    if facet is None or not (facet.get("start") or facet.get("end")):
+        return None
+    end = facet.get("end")
+    # Date picker end date is inclusive
+    return facet.get("start"), pd.Timestamp(end) + pd.Timedelta(days=1) if end else None
+
+
+def get_time_mask(input_file: str, facets, rows: int) -> np.ndarray:
+    """Rows of the file submitted within the date range of the facet filter
+
+    Args:
+        input_file (str): file name
+        facets (list): facet filter from the facet panel
+        rows (int): number of rows in the file
+
+    Returns:
+        np.ndarray: bool mask over all rows of the file, None if the filter has no date range or the file has no timestamps
+    """
+    time_range = get_time_range(facets)
+    if time_range is None or get_submission_times(input_file).empty:
+        return None
+    mask = np.zeros(rows, dtype=bool)
+    mask[get_submission_index().get_rows(input_file, *time_range)] = True
+    return mask
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from lazy_modules import pd, np
+from data_loader import cached_per_file, get_file_signature
+from bitmap_index import get_bitmap_index, get_popcount_table, get_row_mask
+
+# Two-sided 95% intervals
+CONFIDENCE_LEVEL = 0.95
+Z_SCORE = 1.959964
+# Resamples are drawn in one (resamples x cells) multinomial call, 2000 resamples of a 20 cell table is ~40k numbers
+BOOTSTRAP_RESAMPLES = 2000
+# Fixed seed, so the same file always shows the same error bars
+BOOTSTRAP_SEED = 0
+
+# (file, question) -> file signature, unfiltered count table and its bootstrap intervals
+count_intervals = {}
+
+
+def wilson_interval(counts, totals, z: float = Z_SCORE) -> tuple:
+    """Wilson score interval of a share, vectorized over any number of (count, total) pairs
+
+    Args:
+        counts (np.ndarray): number of runs with the answer
+        totals (np.ndarray): number of runs that answered the question
+        z (float, optional): normal quantile of the confidence level
+
+    Returns:
+        tuple: low and high share arrays, NaN where the total is 0
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    totals = np.asarray(totals, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = counts / totals
+        denominator = 1 + z ** 2 / totals
+        center = (share + z ** 2 / (2 * totals)) / denominator
+        margin = z * np.sqrt(share * (1 - share) / totals + z ** 2 / (4 * totals ** 2)) / denominator
+    return np.clip(center - margin, 0, 1), np.clip(center + margin, 0, 1)
+
+
+def share_intervals(counts) -> pd.DataFrame:
+    """Shares of one question's answers with their Wilson intervals
+
+    Args:
+        counts (pd.Series): answer -> number of runs, e.g. value_counts() of a column
+
+    Returns:
+        pd.DataFrame: "Count", "Share", "Low" and "High" columns indexed by answer
+    """
+    total = counts.sum()
+    low, high = wilson_interval(counts.to_numpy(), np.full(len(counts), total))
+    return pd.DataFrame({"Count": counts.to_numpy(), "Share": counts.to_numpy() / total if total else np.nan, "Low": low, "High": high}, index=counts.index)
+
+
+@cached_per_file
+def get_answer_intervals(input_file: str) -> pd.DataFrame:
+    """Wilson intervals for every answer of every indexed question of the month file.
+    Answer counts come from popcounts of the bitmap index and all questions go through one wilson_interval call. Cached per file.
+    Total is the number of rows that answered the question, so shares of "check all that apply" answers can add up to more than 1
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        pd.DataFrame: "Count", "Total", "Share", "Low" and "High" columns indexed by (question, answer)
+    """
+    index = get_bitmap_index(input_file)
+    popcount = get_popcount_table()
+    keys, counts, totals = [], [], []
+    for question, (answers, bitsets) in index.columns.items():
+        answer_counts = popcount[bitsets].sum(axis=1)
+        keys.extend((question, answer) for answer in answers)
+        counts.append(answer_counts)
+        totals.append(np.full(len(answers), index.count(np.bitwise_or.reduce(bitsets, axis=0))))
+    counts = np.concatenate(counts) if counts else np.zeros(0)
+    totals = np.concatenate(totals) if totals else np.zeros(0)
+    low, high = wilson_interval(counts, totals)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = counts / totals
+    return pd.DataFrame(
+        {"Count": counts, "Total": totals, "Share": share, "Low": low, "High": high},
+        index=pd.MultiIndex.from_tuples(keys, names=["Question", "Answer"]),
+    )
+
+
+def get_share_intervals(input_file: str, column: str, counts, facets=None) -> pd.DataFrame:
+    """Intervals for a pie of one question. Unfiltered pies read the per-file cache, filtered pies are computed from their counts
+
+    Args:
+        input_file (str): file name
+        column (str): question
+        counts (pd.Series): answer -> number of runs shown on the pie
+        facets (list, optional): facet filter from the facet panel
+
+    Returns:
+        pd.DataFrame: "Count", "Share", "Low" and "High" columns indexed by answer
+    """
+    if get_row_mask(input_file, facets) is None:
+        answer_intervals = get_answer_intervals(input_file)
+        if column in answer_intervals.index.get_level_values("Question"):
+            cached = answer_intervals.loc[column].reindex(counts.index.astype(str))
+            if cached["Count"].notna().all():
+                return cached.set_axis(counts.index)[["Count", "Share", "Low", "High"]]
+    return share_intervals(counts)
+
+
+def bootstrap_count_intervals(table, resamples: int = BOOTSTRAP_RESAMPLES, level: float = CONFIDENCE_LEVEL, seed: int = BOOTSTRAP_SEED) -> tuple:
+    """Multinomial bootstrap of a count table, e.g. runs per (end date, winner).
+    The whole table is one sample of its total number of runs, all resamples are drawn as one array operation
+
+    Args:
+        table (pd.DataFrame): non-negative counts
+        resamples (int, optional): number of bootstrap resamples
+        level (float, optional): confidence level
+        seed (int, optional): random seed
+
+    Returns:
+        tuple: low and high count DataFrames shaped like the table
+    """
+    values = table.to_numpy(dtype=np.float64).ravel()
+    total = int(values.sum())
+    if not total:
+        return table * 0, table * 0
+    rng = np.random.default_rng(seed)
+    samples = rng.multinomial(total, values / total, size=resamples)
+    low, high = np.quantile(samples, [(1 - level) / 2, (1 + level) / 2], axis=0)
+    return (
+        pd.DataFrame(low.reshape(table.shape), index=table.index, columns=table.columns),
+        pd.DataFrame(high.reshape(table.shape), index=table.index, columns=table.columns),
+    )
+
+
+def get_count_intervals(input_file: str, question: str, table, facets=None) -> tuple:
+    """Bootstrap intervals for a winrate graph of one question. Intervals of the unfiltered table are cached per file and question
+    until the file changes, filtered tables are bootstrapped on every call
+
+    Args:
+        input_file (str): file name
+        question (str): question or front the table counts
+        table (pd.DataFrame): non-negative counts shown on the graph
+        facets (list, optional): facet filter from the facet panel
+
+    Returns:
+        tuple: low and high count DataFrames shaped like the table
+    """
+    if get_row_mask(input_file, facets) is not None:
+        return bootstrap_count_intervals(table)
+    signature = get_file_signature(input_file)
+    hit = count_intervals.get((input_file, question))
+    if hit is not None and hit[0] == signature and hit[1].equals(table):
+        return hit[2]
+    intervals = bootstrap_count_intervals(table)
+    count_intervals[input_file, question] = (signature, table, intervals)
+    return intervals
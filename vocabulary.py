@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import functools
+
+from lazy_modules import pd, np
+
+# Older forms appended the answering instruction to the question title
+QUESTION_SUFFIXES = (
+    " If one side is close to winning put them down.",
+)
+# Question title variant -> title used by the current form. Applied after the suffixes are removed
+QUESTION_ALIASES = {
+    "Who won the French-German part of the 2nd Weltkrieg?": "Who won the Franco-German part of the 2nd Weltkrieg?",
+    "Who won the Indochinese civil war?": "Who won the Indochinese War?",
+}
+# Question -> {answer variant -> canonical answer}. Date questions are canonicalized by date_answers instead
+ANSWER_ALIASES = {
+    "Who won the Spanish Civil War?": {
+        "Carlistis": "Carlists",
+    },
+    # One month split the socialist answer by INT involvement, other months don't
+    "Who controls most of the Italian peninsula?": {
+        "Socialist Republic of Italy, on its own": "Socialist Republic of Italy",
+        "Socialist Republic of Italy, with INT aid": "Socialist Republic of Italy",
+    },
+}
+# Question -> every answer the dashboard has colours and labels for. Other answers are reported as unmapped
+ANSWER_VOCABULARY = {
+    "Who won the Franco-German part of the 2nd Weltkrieg?": ("Reichspakt", "Internationale", "Nobody"),
+    "Who won the Russo-German part of the 2nd Weltkrieg?": ("Reichspakt", "Russia", "Socialist Russia", "Nobody"),
+    "Who won the Spanish Civil War?": ("CNT-FAI", "Kingdom of Spain", "Carlists", "Nobody"),
+    "Who controls most of the Italian peninsula?": (
+        "Socialist Republic of Italy", "Italian Republic/Federation", "ANI Italy", "Sardinia", "Two Sicilies", "Split between starting nations",
+    ),
+    "Did the Entente collapse?": ("No", "Yes, before WK2", "Yes, during or after WK2"),
+    "Who won the American Civil War?": ("USA", "CSA", "TEX", "PSA", "NEE", "Nobody"),
+    "If the American Civil War was a two-way, who won it?": ("USA", "CSA", "TEX", "PSA", "NEE", "Nobody"),
+    "If the American Civil War was a three-way, who won it?": ("USA", "CSA", "TEX", "PSA", "NEE", "Nobody"),
+    "If MacArthur retreated EAST, who won the ACW?": ("USA", "CSA", "TEX", "PSA", "NEE", "Nobody"),
+    "If MacArthur retreated WEST, who won the ACW?": ("USA", "CSA", "TEX", "PSA", "NEE", "Nobody"),
+    "If MacArthur did NOT retreat, who won the ACW?": ("USA", "CSA", "TEX", "PSA", "NEE", "Nobody"),
+    "Who won the Argentinian-Chilean war?": ("Argentina", "Chile", "Peaceful Reunification", "Nobody"),
+    "Who was the victor of the League War?": ("Nanjing Clique", "Left Kuomintang", "Anqing Clique", "Shandong Clique", "Nobody"),
+    "Who controls most of the Indian subcontinent?": (
+        "Bharatiya Commune", "Dominion of India", "Princely Federation/Hyderabad", "Puppeted by a foreign power", "Split between starting nations",
+    ),
+}
+# Log tags -> ISO codes used by the "adm0_a3" property of map.geojson
+LOG_TAG_MAP_CODES = {"ENG": "GBR", "GER": "DEU", "JAP": "JPN", "NFA": "ALG", "AUS": "AUT"}
+
+
+@functools.lru_cache(maxsize=None)
+def canonical_question(column: str) -> str:
+    """Canonical title of a question column, e.g. "Who won the French-German part of the 2nd Weltkrieg? If one side is close
+    to winning put them down." -> "Who won the Franco-German part of the 2nd Weltkrieg?"
+
+    Args:
+        column (str): column name as written in the file header
+
+    Returns:
+        str: canonical column name
+    """
+    column = column.strip()
+    for suffix in QUESTION_SUFFIXES:
+        if column.endswith(suffix):
+            column = column[:-len(suffix)]
+    return QUESTION_ALIASES.get(column, column)
+
+
+def canonicalize_series(series, question: str) -> pd.Series:
+    """Maps answers of one question to their canonical spelling. Rows are factorized once and aliases are applied
+    to the distinct values only, rows are then remapped by their codes
+
+    Args:
+        series (pd.Series): raw answers
+        question (str): canonical question
+
+    Returns:
+        pd.Series: canonical answers with the index and name of the series. Non-text columns are returned as they are
+    """
+    if series.dtype != object:
+        return series
+    aliases = ANSWER_ALIASES.get(question, {})
+    codes, uniques = pd.factorize(series)
+    canonical = [aliases.get(value.strip(), value.strip()) if isinstance(value, str) else value for value in uniques]
+    if canonical == list(uniques):
+        return series
+    # Different spellings of the same answer share one code
+    remap, categories = pd.factorize(pd.Index(canonical, dtype=object))
+    remap = np.append(remap, -1)
+    return pd.Series(pd.Categorical.from_codes(remap[codes], categories=categories).astype(object), index=series.index, name=series.name)
+
+
+def canonicalize_frame(csv_df: pd.DataFrame, exclude=()) -> pd.DataFrame:
+    """Renames question columns to their canonical titles and canonicalizes the answers of every text column
+
+    Args:
+        csv_df (pd.DataFrame): dataframe as read from the file
+        exclude (iterable, optional): columns whose values are kept as they are, e.g. the log columns
+
+    Returns:
+        pd.DataFrame: dataframe with canonical labels
+    """
+    csv_df = csv_df.rename(columns=canonical_question)
+    if csv_df.columns.has_duplicates:
+        # Both spellings of a question in one file - keep the first answer of every row
+        csv_df = csv_df.groupby(level=0, axis=1, sort=False).first()
+    for column in csv_df.columns.difference(exclude, sort=False):
+        csv_df[column] = canonicalize_series(csv_df[column], column)
+    return csv_df
+
+
+def find_unmapped_values(csv_df: pd.DataFrame) -> pd.DataFrame:
+    """Answers of the questions in ANSWER_VOCABULARY that are neither known nor aliased
+
+    Args:
+        csv_df (pd.DataFrame): canonicalized dataframe
+
+    Returns:
+        pd.DataFrame: "Question", "Answer" and "Runs" columns, most frequent first
+    """
+    unmapped = []
+    for question, known in ANSWER_VOCABULARY.items():
+        if question not in csv_df.columns:
+            continue
+        counts = csv_df[question].value_counts()
+        counts = counts[~counts.index.isin(known)]
+        unmapped.append(pd.DataFrame({"Question": question, "Answer": counts.index, "Runs": counts.to_numpy()}))
+    if not unmapped:
+        return pd.DataFrame(columns=["Question", "Answer", "Runs"])
+    return pd.concat(unmapped, ignore_index=True).sort_values("Runs", ascending=False, kind="stable")
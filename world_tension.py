@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from lazy_modules import pd, np
+from data_loader import cached_per_append, read_blob_tail, get_valid_blobs, iter_log_column, get_file_columns, create_log_buffer, fill_wt_array, TIMELINE
+from date_answers import get_date_answers, date_sort_key, FIRST_YEAR
+
+# WT levels whose first crossing is derived for every run. 75% is the one the Weltkrieg colour groups use
+WT_THRESHOLDS = (0.5, 0.75, 1.0)
+REPORTED_START_COLUMN = "When did the 2nd Weltkrieg start?"
+# Label of runs that never reached the threshold
+NOT_CROSSED = "Never"
+# Quarter label of every TIMELINE month, same format as the normalized date answers ("1939, quarter 2")
+QUARTER_LABELS = tuple(f"{FIRST_YEAR + i // 12}, quarter {i % 12 // 3 + 1}" for i in range(len(TIMELINE)))
+
+
+def get_threshold_column(threshold: float) -> str:
+    """Name of the derived column, e.g. 0.75 -> "When did WT reach 75%?"
+
+    Args:
+        threshold (float): WT level from 0 to 1
+
+    Returns:
+        str: column name
+    """
+    return f"When did WT reach {threshold:.0%}?"
+
+
+def decode_wt_frame(series) -> pd.DataFrame:
+    """WT matrix of valid raw log cells"""
+    return pd.DataFrame(fill_wt_array(series, create_log_buffer("WT Data", len(series))), index=series.index, columns=TIMELINE)
+
+
+def extend_wt_matrix(matrix: pd.DataFrame, input_file: str, previous) -> pd.DataFrame:
+    """Decodes only the runs appended to the month file and adds them to the cached matrix"""
+    if matrix is None:
+        return None
+    series = read_blob_tail(input_file, previous, "WT Data")
+    if not len(series):
+        return matrix
+    return pd.concat([matrix, decode_wt_frame(series)])
+
+
+@cached_per_append(extend_wt_matrix)
+def get_wt_matrix(input_file: str) -> pd.DataFrame:
+    """WT of every valid run on the monthly TIMELINE, decoded once per file. Quarantined rows are left out,
+    appended runs are decoded on their own
+
+    Args:
+        input_file (str): file name
+
+    Returns:
+        pd.DataFrame: float32 (runs x TIMELINE) values indexed by row number, NaN where the month was not logged. None if the file has no WT logs
+    """
+    if "WT Data" not in get_file_columns(input_file):
+        return None
+    # Large files are decoded chunk by chunk, only the float32 matrix is kept
+    frames = [decode_wt_frame(get_valid_blobs(series, "WT Data")) for series in iter_log_column(input_file, "WT Data")]
+    return frames[0] if len(frames) == 1 else pd.concat(frames)
+
+
+def first_crossings(matrix, thresholds=WT_THRESHOLDS) -> np.ndarray:
+    """First month at or above every threshold for every run, found with one argmax over a (runs x thresholds x TIMELINE) comparison
+
+    Args:
+        matrix (np.ndarray): (runs x TIMELINE) WT values, NaN where not logged
+        thresholds (tuple, optional): WT levels
+
+    Returns:
+        np.ndarray: (runs x thresholds) index in TIMELINE, -1 where the run never reached the threshold
+    """
+    with np.errstate(invalid="ignore"):
+        above = matrix[:, None, :] >= np.asarray(thresholds, dtype=matrix.dtype)[None, :, None]
+    return np.where(above.any(axis=2), above.argmax(axis=2), -1)
+
+
+def get_event_labels(matrix: pd.DataFrame, thresholds: tuple) -> pd.DataFrame:
+    """"When did WT reach X?" labels of every run of a WT matrix"""
+    crossings = first_crossings(matrix.to_numpy(), thresholds)
+    # -1 picks the NOT_CROSSED label at the end
+    labels = np.array(QUARTER_LABELS + (NOT_CROSSED,), dtype=object)[crossings]
+    return pd.DataFrame(labels, index=matrix.index, columns=[get_threshold_column(threshold) for threshold in thresholds])
+
+
+def extend_wt_events(events: pd.DataFrame, input_file: str, previous, thresholds: tuple = WT_THRESHOLDS) -> pd.DataFrame:
+    """Labels only the runs appended to the month file"""
+    if events is None:
+        return None
+    matrix = get_wt_matrix(input_file)
+    return pd.concat([events, get_event_labels(matrix.loc[previous.rows:], thresholds)])
+
+
+@cached_per_append(extend_wt_events)
+def get_wt_events(input_file: str, thresholds: tuple = WT_THRESHOLDS) -> pd.DataFrame:
+    """Derived "When did WT reach X?" answer columns. Labels are quarters, so they can be compared with the date questions,
+    filtered in the facet panel and plotted without decoding WT logs again. Cached per file, appended runs are labelled on their own
+
+    Args:
+        input_file (str): file name
+        thresholds (tuple, optional): WT levels
+
+    Returns:
+        pd.DataFrame: one label column per threshold (NOT_CROSSED if never reached) indexed by row number. None if the file has no WT logs
+    """
+    matrix = get_wt_matrix(input_file)
+    if matrix is None:
+        return None
+    return get_event_labels(matrix, thresholds)
+
+
+def compare_with_reported_start(input_file: str, threshold: float = 0.75) -> pd.DataFrame:
+    """Derived crossing vs the self-reported Weltkrieg start of every run that has both
+
+    Args:
+        input_file (str): file name
+        threshold (float, optional): one of WT_THRESHOLDS
+
+    Returns:
+        pd.DataFrame: "Reported" and "Derived" labels and "Difference" (quarters, derived minus reported, missing if either is not a date)
+        indexed by row number. None if the file doesn't have both
+    """
+    events = get_wt_events(input_file)
+    reported = get_date_answers(input_file).get(REPORTED_START_COLUMN)
+    if events is None or reported is None:
+        return None
+    derived = events[get_threshold_column(threshold)]
+    reported = reported.reindex(derived.index)
+    return pd.DataFrame({
+        "Reported": reported["label"].astype(object),
+        "Derived": derived,
+        "Difference": (date_sort_key(derived) - reported["ordinal"].astype("float64")).astype("Int16"),
+    })